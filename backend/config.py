@@ -1,10 +1,18 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from typing import List, Union
+from typing import List, Optional, Union
 from pydantic import field_validator
 
 class Settings(BaseSettings):
     # OpenAI
     openai_api_key: str
+    openai_base_url: Optional[str] = None  # e.g. a local mock server for benchmarks
+    openai_max_connections: int = 50
+    openai_max_keepalive: int = 20
+    openai_keepalive_expiry: float = 30.0  # seconds an idle connection stays pooled
+    openai_connect_timeout: float = 3.0
+    openai_read_timeout: float = 30.0
+    openai_warmup: bool = True  # open a pooled connection at startup
+    openai_prompt_cache_key: str = "earbud-answer"  # groups answer requests for prompt caching; empty omits it
     
     # Server
     backend_host: str = "0.0.0.0"
@@ -25,14 +33,126 @@ class Settings(BaseSettings):
     sample_rate: int = 16000
     channels: int = 1
     chunk_size: int = 1024
+    max_utterance_seconds: float = 15.0
+    
+    # Transcription executor
+    transcription_executor: str = "thread"  # "thread" or "process"
+    transcription_workers: int = 4
+    transcription_queue_size: int = 64
+    transcription_client_queue_size: int = 8
+    
+    # Voice activity detection
+    vad_frame_ms: int = 20
+    vad_energy_ratio: float = 3.0
+    vad_min_energy: float = 1e-5
+    vad_start_ms: int = 60
+    vad_hangover_ms: int = 500
+    vad_preroll_ms: int = 200
+    
+    # Streaming STT
+    stt_engine: str = "google"  # "google", "whisper", "vosk" or "scripted" (local stand-in)
+    stt_partial_interval_ms: int = 300
+    scripted_stt_transcript: str = "what time is the meeting tomorrow"
+    scripted_stt_latency_ms: float = 0  # simulated recognition time
+    scripted_stt_cpu_ms: float = 0  # simulated recognition CPU time (busy loop, holds the GIL)
+    stt_warmup: bool = True  # load and exercise local models at startup
+    stt_language: str = "en"
+    stt_batch_size: int = 4  # concurrent utterances per local inference (<= transcription_workers)
+    stt_batch_window_ms: float = 10
+    whisper_model: str = "base.en"
+    vosk_model_path: str = "models/vosk-model-small-en-us-0.15"
     
     # Question Detection
     confidence_threshold: float = 0.75
     min_question_length: int = 3
     
+    # Batch detection (/api/detect/batch)
+    batch_chunk_size: int = 2000
+    batch_process_threshold: int = 5000  # lines before switching to the process pool
+    batch_workers: Optional[int] = None  # default: CPU count
+    batch_max_bytes: int = 100 * 1024 * 1024
+    
     # Response
     max_response_words: int = 15
-    response_timeout: int = 5
+    response_timeout: float = 5.0  # seconds from end of speech to the first token (streamed) or the whole answer
+    stream_responses: bool = True  # send ai_response_delta messages as tokens arrive
+    
+    # Deadlines and failure handling (see /api/resilience)
+    deadline_stt_share: float = 0.3  # share of response_timeout for transcription
+    deadline_retrieval_share: float = 0.05  # for context retrieval; the model gets the rest
+    deadline_llm_floor: float = 1.0  # seconds the model always gets, even after a slow transcription
+    hedge_percentile: float = 0.9  # re-send a call still pending past this recent latency percentile; 0 disables
+    retry_budget_ratio: float = 0.1  # hedges and fallbacks allowed per request
+    circuit_failure_threshold: int = 5  # consecutive failed answers before OpenAI calls are skipped
+    circuit_reset_timeout: float = 10.0  # seconds before a trial call is let through again
+    
+    # Model routing (fastest tier first, see /api/models)
+    model_tiers: Union[str, List[str]] = ["gpt-4o-mini", "gpt-4"]
+    escalate_question_types: Union[str, List[str]] = ["opinion_q", "request_phrase_q"]
+    escalate_keywords: Union[str, List[str]] = ["why", "how", "explain", "compare", "difference"]
+    escalate_prompt_tokens: int = 400  # prompts this large move up a tier
+    escalated_budget: float = 0.6  # share of the model's deadline a slower tier gets before falling back
+    router_window: int = 50  # recent latencies per tier used for routing
+    
+    @field_validator("model_tiers", "escalate_question_types", "escalate_keywords", mode="before")
+    @classmethod
+    def parse_lists(cls, v):
+        if isinstance(v, str):
+            return [x.strip() for x in v.split(",") if x.strip()]
+        return v
+    
+    # Per-connection WebSocket pipeline
+    ws_audio_queue_size: int = 250  # frames (~5s of 20ms audio) before dropping
+    ws_transcript_queue_size: int = 8
+    ws_outbox_size: int = 256
+    cancel_superseded_answers: bool = True  # a newer question cancels the answer in flight
+    
+    # Speculative answers (started on confident partial transcripts)
+    speculative_responses: bool = False  # spends tokens on guesses that get cancelled
+    speculation_min_confidence: float = 0.85
+    speculation_max_extra_words: int = 0  # words the final may add to the speculated text
+    
+    # Context store
+    context_token_budget: int = 400  # prompt tokens spent on uploaded context
+    context_top_k: int = 8
+    context_passage_words: int = 60
+    max_context_bytes: int = 20 * 1024 * 1024
+    context_read_chunk_bytes: int = 64 * 1024
+    
+    # Sessions (per client_id history and context)
+    session_idle_timeout: int = 1800  # seconds without activity before eviction
+    session_max_count: int = 1000
+    session_max_bytes: int = 32 * 1024 * 1024
+    session_total_max_bytes: int = 512 * 1024 * 1024
+    session_max_history: int = 20
+    session_sweep_interval: int = 60
+    
+    # Conversation memory (what of the history goes into prompts)
+    memory_recent_turns: int = 2  # latest exchanges quoted verbatim
+    memory_summary_words: int = 60  # rolling summary of everything older
+    memory_summarize_every: int = 1  # exchanges out of the verbatim window before an update
+    memory_summary_timeout: float = 10.0  # seconds per background summary call
+    
+    # Shared state (sessions and connection events across workers)
+    state_backend: str = "memory"  # "memory" (one worker) or "redis" (any RESP server, e.g. benchmarks/mock_redis.py)
+    state_url: str = "redis://127.0.0.1:6379/0"
+    state_key_prefix: str = "earbud:"
+    state_session_ttl: float = 86400  # seconds a session survives in the store after its last change
+    worker_id: Optional[str] = None  # default: hostname:pid
+    
+    # Conversation log (persistent history behind /api/history)
+    conversation_log_path: str = "data/conversations.db"  # SQLite file; empty disables the log
+    conversation_log_batch_size: int = 100  # rows per write transaction
+    conversation_log_flush_ms: float = 50  # longest a row waits before being written
+    
+    # Tracing (/api/metrics, /api/traces)
+    tracing_enabled: bool = True
+    trace_history_size: int = 200
+    
+    # Response cache
+    response_cache_size: int = 512
+    response_cache_ttl: int = 3600  # seconds
+    response_cache_fuzzy_threshold: float = 0.8
     
     model_config = SettingsConfigDict(env_file=".env", case_sensitive=False, extra="ignore")
 
@@ -1,25 +1,33 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException
-from typing import List
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Query, Request
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from typing import List, Optional
 from datetime import datetime
 from ..models import AIResponse, SystemStatus, ListeningStatus
-from ..services.openai_service import OpenAIService
-from ..services.context_manager import ContextManager
-from ..services.question_detector import QuestionDetector
-from ..services.speech_processor import SpeechProcessor
+from ..services.batch_detector import iter_lines
+from ..services.container import ServiceContainer, get_services
+from ..services.conversation_log import InvalidCursor
+from ..services.transcription_executor import TranscriptionQueueFull
+from ..utils.audio_framing import is_frame_stream
+from ..utils.audio_processor import pcm_to_wav
+from ..utils.frame_decoder import decode_frame_stream
 from ..config import settings
+import logging
+import json
 import time
 import io
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
-# Services
-openai_service = OpenAIService(api_key=settings.openai_api_key)
-context_manager = ContextManager()
-question_detector = QuestionDetector()
-speech_processor = SpeechProcessor()
+# Session used by REST callers that don't pass a client_id
+DEFAULT_SESSION = "rest"
 
 @router.post("/api/question", response_model=AIResponse)
-async def process_question(question: str):
+async def process_question(
+    question: str,
+    client_id: Optional[str] = None,
+    services: ServiceContainer = Depends(get_services)
+):
     """
     Process a direct question (for testing/debugging).
     In passive mode, this endpoint is rarely used.
@@ -27,7 +35,7 @@ async def process_question(question: str):
     start_time = time.time()
     
     # Check if it's actually a question
-    is_question, confidence, q_type = question_detector.detect(question)
+    is_question, confidence, q_type = services.question_detector.detect(question)
     
     if not is_question:
         return AIResponse(
@@ -39,8 +47,9 @@ async def process_question(question: str):
         )
     
     # Get context and generate response
-    context = context_manager.get_relevant_context(question)
-    answer = await openai_service.generate_short_response(question, context)
+    session = await services.sessions.load(client_id or DEFAULT_SESSION)
+    context = session.context.get_relevant_context(question)
+    answer = await services.openai_service.generate_short_response(question, context, question_type=q_type)
     
     processing_time = time.time() - start_time
     
@@ -52,27 +61,100 @@ async def process_question(question: str):
         spoken=False
     )
 
+@router.post("/api/detect/batch")
+async def detect_batch(
+    request: Request,
+    threshold: Optional[float] = None,
+    services: ServiceContainer = Depends(get_services)
+):
+    """
+    Score many transcripts at once for offline tuning.
+    Body is JSONL ({"text": ..., "id": ...}) or one transcript per line.
+    Streams one NDJSON result per line, then a summary with per-type counts.
+    """
+    # The body has to be read before responding: once the StreamingResponse
+    # starts, its disconnect listener owns receive()
+    chunks = []
+    total = 0
+    async for chunk in request.stream():
+        total += len(chunk)
+        if total > settings.batch_max_bytes:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Batch exceeds {settings.batch_max_bytes} bytes"
+            )
+        chunks.append(chunk)
+    
+    async def body():
+        for chunk in chunks:
+            yield chunk
+    
+    async def results():
+        async for result in services.batch_detector.stream(iter_lines(body()), threshold):
+            yield json.dumps(result) + "\n"
+    
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
 @router.post("/api/voice")
-async def process_voice(file: UploadFile = File(...)):
+async def process_voice(
+    request: Request,
+    file: UploadFile = File(...),
+    client_id: Optional[str] = None,
+    services: ServiceContainer = Depends(get_services)
+):
     """
     Process audio recording, transcribe, and detect questions.
+    Accepts a WAV file or a length-prefixed stream of binary audio frames
+    (e.g. Opus packets, see FRAME_STREAM_MEDIA_TYPE).
     """
     start_time = time.time()
+    trace = services.tracer.trace(client_id or DEFAULT_SESSION)
+    deadline = services.stage_budget.start(trace.started)
     try:
-        audio_content = await file.read()
+        with trace.span('receive'):
+            audio_content = await file.read()
+        
+        if is_frame_stream(audio_content):
+            try:
+                with trace.span('decode'):
+                    samples = decode_frame_stream(audio_content, settings.sample_rate)
+                    audio_content = pcm_to_wav(samples, settings.sample_rate)
+            except (ValueError, RuntimeError) as e:
+                raise HTTPException(status_code=415, detail=str(e))
+        
+        # Skip STT entirely for silence
+        with trace.span('vad'):
+            has_speech = services.speech_processor.wav_has_speech(audio_content)
+        if not has_speech:
+            return {"status": "no_speech", "message": "No speech detected"}
         
-        # Transcribe
-        text, confidence = speech_processor.process_audio_chunk(audio_content)
+        # Transcribe on the shared worker pool (bounded, fair across callers)
+        client_key = f"rest:{request.client.host if request.client else 'unknown'}"
+        try:
+            stt_start = time.perf_counter()
+            text, confidence = await services.transcription_executor.transcribe(client_key, audio_content)
+            trace.record('stt', stt_start, time.perf_counter(), observe=False)
+            # A slow transcript is still answered; the overrun is only counted
+            deadline.finish('stt')
+        except TranscriptionQueueFull as e:
+            raise HTTPException(
+                status_code=503,
+                detail=str(e),
+                headers={"Retry-After": "1"}
+            )
         
         if not text:
             return {"status": "no_speech", "message": "No speech detected"}
             
         # Filter noise
-        if question_detector.filter_context_noise(text):
+        with trace.span('noise_filter'):
+            is_noise = services.question_detector.filter_context_noise(text)
+        if is_noise:
             return {"status": "noise", "transcription": text}
             
         # Detect question
-        is_question, q_confidence, q_type = question_detector.detect(text)
+        with trace.span('detection'):
+            is_question, q_confidence, q_type = services.question_detector.detect(text)
         
         if not is_question:
             return {
@@ -82,11 +164,22 @@ async def process_voice(file: UploadFile = File(...)):
             }
             
         # It's a question! Extract and respond
-        actual_question = question_detector.extract_question(text)
-        context = context_manager.get_relevant_context(actual_question)
-        answer = await openai_service.generate_short_response(actual_question, context)
+        actual_question = services.question_detector.extract_question(text)
+        session = await services.sessions.load(client_id or DEFAULT_SESSION)
+        with trace.span('context'):
+            context = session.context.get_relevant_context(actual_question)
+        deadline.finish('retrieval')
+        with trace.span('llm_complete'):
+            answer = await services.openai_service.generate_short_response(
+                actual_question,
+                context,
+                question_type=q_type,
+                deadline=deadline.stage('llm', floor=settings.deadline_llm_floor)
+            )
+        deadline.finish('llm')
         
         processing_time = time.time() - start_time
+        trace.finish()
         
         return {
             "status": "question_detected",
@@ -97,54 +190,194 @@ async def process_voice(file: UploadFile = File(...)):
             "timestamp": datetime.now().isoformat()
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Voice processing error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/api/context")
-async def upload_context(file: UploadFile = File(...)):
-    """Upload context file for better AI responses"""
+async def upload_context(
+    file: UploadFile = File(...),
+    client_id: Optional[str] = None,
+    services: ServiceContainer = Depends(get_services)
+):
+    """Upload context file for better AI responses (into the client's session)"""
+    async def read_chunks():
+        # Read and decode in pieces instead of holding the whole upload twice
+        total = 0
+        while True:
+            chunk = await file.read(settings.context_read_chunk_bytes)
+            if not chunk:
+                break
+            total += len(chunk)
+            if total > settings.max_context_bytes:
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"Context file exceeds {settings.max_context_bytes} bytes"
+                )
+            yield chunk
+    
     try:
-        content = await file.read()
-        text_content = content.decode('utf-8')
-        
-        context_manager.add_context(
-            content=text_content,
+        session = await services.sessions.load(client_id or DEFAULT_SESSION)
+        entry = await session.context.add_context_stream(
+            read_chunks(),
             source=file.filename,
-            metadata={'size': len(text_content)}
+            metadata={'content_type': file.content_type}
         )
         
         return {
             "status": "success",
             "filename": file.filename,
-            "size": len(text_content),
-            "summary": context_manager.get_summary()
+            "size": entry['size'],
+            "passages": entry['passage_count'],
+            "summary": session.context.get_summary()
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/api/context")
-async def get_context_summary():
+async def get_context_summary(
+    client_id: Optional[str] = None,
+    services: ServiceContainer = Depends(get_services)
+):
     """Get summary of uploaded contexts"""
-    return context_manager.get_summary()
+    session = await services.sessions.load(client_id or DEFAULT_SESSION)
+    return session.context.get_summary()
 
 @router.delete("/api/context")
-async def clear_contexts():
+async def clear_contexts(
+    client_id: Optional[str] = None,
+    services: ServiceContainer = Depends(get_services)
+):
     """Clear all uploaded contexts"""
-    context_manager.clear_all()
+    session = await services.sessions.load(client_id or DEFAULT_SESSION)
+    session.context.clear_all()
     return {"status": "success", "message": "All contexts cleared"}
 
 @router.get("/api/history")
-async def get_conversation_history():
-    """Get conversation history"""
-    return openai_service.conversation_context
+async def get_conversation_history(
+    client_id: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    since: Optional[float] = None,
+    until: Optional[float] = None,
+    services: ServiceContainer = Depends(get_services)
+):
+    """
+    Get conversation history, newest page first.
+    Pass next_cursor back as cursor for the page before; since/until
+    (epoch seconds) bound the exchange time.
+    """
+    client_id = client_id or DEFAULT_SESSION
+    if services.conversation_log is None:
+        # No persistent log: the session's recent history is the only page
+        session = await services.sessions.load(client_id)
+        items = [
+            entry for entry in session.history
+            if (since is None or entry['timestamp'] >= since) and (until is None or entry['timestamp'] < until)
+        ]
+        return {'items': items[-limit:], 'next_cursor': None}
+    try:
+        return await services.conversation_log.page(client_id, cursor, limit, since, until)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @router.delete("/api/history")
-async def clear_history():
+async def clear_history(
+    client_id: Optional[str] = None,
+    services: ServiceContainer = Depends(get_services)
+):
     """Clear conversation history"""
-    openai_service.clear_context()
+    session = await services.sessions.load(client_id or DEFAULT_SESSION)
+    session.clear_history()
     return {"status": "success", "message": "History cleared"}
 
+@router.get("/api/sessions")
+async def get_sessions(details: bool = True, services: ServiceContainer = Depends(get_services)):
+    """Per-client session counts and memory use"""
+    return services.sessions.get_stats(include_sessions=details)
+
+@router.delete("/api/sessions/{client_id}")
+async def delete_session(client_id: str, services: ServiceContainer = Depends(get_services)):
+    """Drop a client's history and context"""
+    if not await services.sessions.remove(client_id):
+        raise HTTPException(status_code=404, detail="Unknown session")
+    return {"status": "success", "message": f"Session {client_id} removed"}
+
+@router.get("/api/transcription/metrics")
+async def get_transcription_metrics(services: ServiceContainer = Depends(get_services)):
+    """Transcription pool queue depth and wait-time metrics, plus STT engine stats"""
+    return {
+        **services.transcription_executor.get_metrics(),
+        'engine': services.stt_engine.get_stats()
+    }
+
+@router.get("/api/speculation")
+async def get_speculation_stats(services: ServiceContainer = Depends(get_services)):
+    """Speculative answer hit rate, latency saved and tokens wasted"""
+    return services.speculator.get_stats()
+
+@router.get("/api/models")
+async def get_model_stats(services: ServiceContainer = Depends(get_services)):
+    """Per-tier routing counts, fallbacks and latency"""
+    return services.model_router.get_stats()
+
+@router.get("/api/memory")
+async def get_memory_stats(services: ServiceContainer = Depends(get_services)):
+    """Rolling conversation summary updates and failures"""
+    return services.memory.get_stats()
+
+@router.get("/api/coalescing")
+async def get_coalescing_stats(services: ServiceContainer = Depends(get_services)):
+    """Identical in-flight requests that shared one upstream call"""
+    return services.openai_service.coalescer.get_stats()
+
+@router.get("/api/resilience")
+async def get_resilience_stats(services: ServiceContainer = Depends(get_services)):
+    """Per-stage deadline misses, hedging, retry budget and circuit breaker state"""
+    router_stats = services.model_router.get_stats()
+    return {
+        'deadlines': services.stage_budget.get_stats(),
+        'hedges': sum(tier['hedges'] for tier in router_stats['tiers']),
+        'hedge_wins': sum(tier['hedge_wins'] for tier in router_stats['tiers']),
+        'fallbacks': router_stats['fallbacks'],
+        'retries': router_stats['retries'],
+        'retry_budget': router_stats['retry_budget'],
+        'circuit': services.openai_service.breaker.get_stats(),
+        'degraded_answers': services.openai_service.degraded,
+        'stale_answers': services.response_cache.stale_hits
+    }
+
+@router.get("/api/metrics")
+async def get_metrics(services: ServiceContainer = Depends(get_services)):
+    """Per-stage latency histograms in Prometheus text format"""
+    return PlainTextResponse(
+        services.tracer.render_prometheus(),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+@router.get("/api/traces")
+async def get_traces(limit: int = 20, services: ServiceContainer = Depends(get_services)):
+    """Stage latency percentiles and the most recent request traces"""
+    return {
+        'stages': services.tracer.get_stats(),
+        'recent': services.tracer.get_traces(limit)
+    }
+
+@router.get("/api/cache")
+async def get_cache_stats(services: ServiceContainer = Depends(get_services)):
+    """Answer cache hit/miss counters"""
+    return services.response_cache.get_stats()
+
+@router.delete("/api/cache")
+async def clear_cache(services: ServiceContainer = Depends(get_services)):
+    """Drop all cached answers"""
+    services.response_cache.invalidate()
+    return {"status": "success", "message": "Answer cache cleared"}
+
 @router.get("/api/status", response_model=SystemStatus)
 async def get_system_status():
     """Get current system status"""
@@ -1,54 +1,176 @@
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from fastapi import APIRouter, Depends, WebSocket, WebSocketDisconnect
 import json
 import logging
 import asyncio
+import base64
+import time
+from typing import AsyncIterator, Optional
 from datetime import datetime
-from ..services.openai_service import OpenAIService
-from ..services.question_detector import QuestionDetector
-from ..services.context_manager import ContextManager
-from ..services.speech_processor import SpeechProcessor
+from ..services.client_pipeline import ClientPipeline
+from ..services.container import ServiceContainer, get_services
+from ..services.resilience import Deadline
+from ..services.transcription_executor import TranscriptionQueueFull
+from ..services.streaming_transcriber import StreamingTranscriber
+from ..services.tracing import Trace
+from ..utils.audio_processor import VoiceActivityDetector
+from ..utils.audio_framing import CODEC_WAV, FrameError, parse_frame
+from ..utils.frame_decoder import FrameDecoder
 from ..config import settings
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
-# Initialize services
-openai_service = OpenAIService(api_key=settings.openai_api_key)
-question_detector = QuestionDetector()
-context_manager = ContextManager()
-speech_processor = SpeechProcessor()
+def create_vad(sample_rate: int) -> VoiceActivityDetector:
+    return VoiceActivityDetector(
+        sample_rate=sample_rate,
+        frame_ms=settings.vad_frame_ms,
+        energy_ratio=settings.vad_energy_ratio,
+        min_energy=settings.vad_min_energy,
+        start_ms=settings.vad_start_ms,
+        hangover_ms=settings.vad_hangover_ms,
+        preroll_ms=settings.vad_preroll_ms,
+        max_utterance_ms=int(settings.max_utterance_seconds * 1000)
+    )
 
 class ConnectionManager:
+    """
+    This worker's open WebSockets. A client_id has at most one connection
+    across all workers: connecting again (here or on another worker, via
+    the session registry's events) closes the older one.
+    """
+    
     def __init__(self):
         self.active_connections: dict = {}
     
-    async def connect(self, client_id: str, websocket: WebSocket):
+    async def connect(self, client_id: str, websocket: WebSocket, services: ServiceContainer):
         await websocket.accept()
+        if client_id in self.active_connections:
+            await self.close_connection(client_id, 'Reconnected')
+        services.sessions.on_remote_attach(self.handle_remote_attach)
+        pipeline = ClientPipeline(
+            client_id,
+            websocket.send_json,
+            tracer=services.tracer,
+            audio_queue_size=settings.ws_audio_queue_size,
+            transcript_queue_size=settings.ws_transcript_queue_size,
+            outbox_size=settings.ws_outbox_size,
+            cancel_superseded=settings.cancel_superseded_answers,
+            stage_budget=services.stage_budget,
+            on_answer_cancelled=lambda: services.speculator.cancel_kept(client_id)
+        )
         self.active_connections[client_id] = {
+            'services': services,
+            'session': await services.sessions.attach(client_id),
             'socket': websocket,
+            'pipeline': pipeline,
             'status': 'listening',
-            'last_activity': datetime.now()
+            'last_activity': datetime.now(),
+            'throttled': False,
+            'vad': create_vad(settings.sample_rate),
+            'decoder': FrameDecoder(settings.sample_rate),
+            'stream': StreamingTranscriber(
+                client_id,
+                services.stt_engine,
+                services.transcription_executor,
+                on_transcript=lambda text, confidence, is_final: handle_transcript(
+                    services, client_id, text, confidence, is_final
+                ),
+                sample_rate=settings.sample_rate,
+                max_seconds=settings.max_utterance_seconds,
+                partial_interval_ms=settings.stt_partial_interval_ms,
+                on_final_submitted=pipeline.put_transcription
+            )
         }
+        pipeline.start(
+            on_audio=lambda item: handle_audio_item(services, client_id, item),
+            on_final=lambda text, confidence, trace: handle_transcript(
+                services, client_id, text, confidence, True, trace
+            ),
+            on_detect=lambda text, confidence, trace: process_potential_question(
+                services, client_id, text, confidence, trace
+            )
+        )
         logger.info(f"Client {client_id} connected - passive listening started")
     
-    def disconnect(self, client_id: str):
-        if client_id in self.active_connections:
+    async def disconnect(self, client_id: str, websocket: Optional[WebSocket] = None):
+        """Tear down a connection (only if it is still websocket's, when given)"""
+        connection = self.active_connections.get(client_id)
+        if connection is not None and (websocket is None or connection['socket'] is websocket):
             del self.active_connections[client_id]
+            connection['stream'].close()
+            await connection['pipeline'].close()
+            services: ServiceContainer = connection['services']
+            services.sessions.detach(client_id)
+            services.transcription_executor.cancel_client(client_id)
+            services.speculator.cancel(client_id)
             logger.info(f"Client {client_id} disconnected")
     
-    async def send_message(self, client_id: str, message: dict):
+    async def close_connection(self, client_id: str, reason: str):
+        """Close a connection that has been replaced by a newer one"""
+        connection = self.active_connections.get(client_id)
+        if connection is None:
+            return
+        await self.disconnect(client_id)
+        try:
+            await connection['socket'].close(code=4001, reason=reason)
+        except Exception as e:
+            logger.debug(f"Closing replaced connection for {client_id} failed: {e}")
+        logger.info(f"Closed older connection for {client_id}: {reason}")
+    
+    def handle_remote_attach(self, client_id: str, worker_id: str):
         if client_id in self.active_connections:
-            await self.active_connections[client_id]['socket'].send_json(message)
+            asyncio.create_task(self.close_connection(client_id, f"Connected on {worker_id}"))
+    
+    async def send_message(self, client_id: str, message: dict):
+        """Queue a message on the client's outbox (sent in order, tagged with 'seq')"""
+        connection = self.active_connections.get(client_id)
+        if connection:
+            await connection['pipeline'].send(message)
+    
+    def get_stats(self) -> dict:
+        return {
+            client_id: connection['pipeline'].get_stats()
+            for client_id, connection in self.active_connections.items()
+        }
+    
+    async def set_throttled(self, client_id: str, throttled: bool, **details):
+        """Send a backpressure signal when the client's throttle state changes"""
+        connection = self.active_connections.get(client_id)
+        if not connection or connection['throttled'] == throttled:
+            return
+        connection['throttled'] = throttled
+        await self.send_message(client_id, {
+            'type': 'backpressure',
+            'status': 'queue_full' if throttled else 'resumed',
+            **details
+        })
 
 manager = ConnectionManager()
 
+@router.get("/api/connections")
+async def get_connections(services: ServiceContainer = Depends(get_services)):
+    """Pipeline queue depths, dropped audio and cancelled answers per open WebSocket"""
+    return {
+        'worker_id': services.worker_id,
+        'connections': len(manager.active_connections),
+        # Every worker's connections, as recorded in the state store
+        'cluster': await services.sessions.connected_clients(),
+        'per_connection': manager.get_stats()
+    }
+
 @router.websocket("/ws/{client_id}")
-async def websocket_endpoint(websocket: WebSocket, client_id: str):
+async def websocket_endpoint(
+    websocket: WebSocket,
+    client_id: str,
+    services: ServiceContainer = Depends(get_services)
+):
     """
     WebSocket endpoint for passive listening mode.
     AI remains silent, continuously monitoring for questions.
+    This loop only reads the socket; audio, transcription, detection and
+    answers run as the connection's pipeline tasks.
     """
-    await manager.connect(client_id, websocket)
+    await manager.connect(client_id, websocket, services)
     
     # Send initial status
     await manager.send_message(client_id, {
@@ -59,28 +181,29 @@ async def websocket_endpoint(websocket: WebSocket, client_id: str):
     
     try:
         while True:
-            # Receive audio/transcription from client
-            data = await websocket.receive_json()
+            # Binary messages carry audio frames, text messages carry JSON control
+            message = await websocket.receive()
+            received = time.perf_counter()
+            if message['type'] == 'websocket.disconnect':
+                raise WebSocketDisconnect(message.get('code', 1000))
+            
+            if message.get('bytes') is not None:
+                await queue_audio(client_id, ('frame', message['bytes'], received))
+                continue
+            
+            data = json.loads(message['text'])
             message_type = data.get('type')
+            trace = services.tracer.trace(client_id, started=received)
+            trace.record('receive', received, time.perf_counter())
             
             if message_type == 'audio_chunk':
-                # Process audio (in production, this would be continuous)
-                audio_data = data.get('audio')
-                
-                # Transcribe audio
-                text, confidence = speech_processor.process_audio_chunk(audio_data)
+                # Legacy path: base64 WAV embedded in JSON
+                with trace.span('decode'):
+                    audio_data = data.get('audio')
+                    if isinstance(audio_data, str):
+                        audio_data = base64.b64decode(audio_data)
                 
-                if text:
-                    # Send transcription to client (for display only) 
-                    await manager.send_message(client_id, {
-                        'type': 'transcription',
-                        'text': text,
-                        'confidence': confidence,
-                        'timestamp': datetime.now().isoformat()
-                    })
-                    
-                    # Check if it's a question
-                    await process_potential_question(client_id, text, confidence)
+                await queue_audio(client_id, ('wav', audio_data, trace))
             
             elif message_type == 'transcription':
                 # Direct transcription from client 
@@ -88,24 +211,26 @@ async def websocket_endpoint(websocket: WebSocket, client_id: str):
                 is_final = data.get('is_final', False)
                 
                 if is_final and text:
-                    await process_potential_question(client_id, text, 0.85)
+                    await manager.active_connections[client_id]['pipeline'].put_detection(text, 0.85, trace)
+                elif text and settings.speculative_responses:
+                    services.speculator.consider(client_id, text, services.sessions.get(client_id))
             
             elif message_type == 'context':
                 # User uploaded context data
                 content = data.get('content', '')
                 source = data.get('source', 'user_upload')
-                context_manager.add_context(content, source)
+                session = services.sessions.get(client_id)
+                session.context.add_context(content, source)
                 
                 await manager.send_message(client_id, {
                     'type': 'context_updated',
                     'message': 'Context added',
-                    'summary': context_manager.get_summary()
+                    'summary': session.context.get_summary()
                 })
             
             elif message_type == 'clear_history':
-                # Clear conversation history and context
-                openai_service.clear_context()
-                context_manager.clear_all()
+                # Clear this client's conversation history and context
+                services.sessions.get(client_id).clear()
                 
                 await manager.send_message(client_id, {
                     'type': 'history_cleared',
@@ -113,24 +238,172 @@ async def websocket_endpoint(websocket: WebSocket, client_id: str):
                 })
     
     except WebSocketDisconnect:
-        manager.disconnect(client_id)
+        await manager.disconnect(client_id, websocket)
     except Exception as e:
         logger.error(f"WebSocket error for {client_id}: {e}")
-        manager.disconnect(client_id)
+        await manager.disconnect(client_id, websocket)
+
+async def queue_audio(client_id: str, item: tuple):
+    """Hand audio to the pipeline without blocking the receive loop"""
+    if not manager.active_connections[client_id]['pipeline'].put_audio(item):
+        await manager.set_throttled(client_id, True, message='Audio queue full, audio dropped')
+
+async def handle_audio_item(services: ServiceContainer, client_id: str, item: tuple):
+    """Audio stage: binary frames and legacy WAV chunks, in arrival order"""
+    kind, data, extra = item
+    if kind == 'frame':
+        await handle_audio_frame(services, client_id, data, extra)
+    else:
+        await transcribe_and_process(services, client_id, data, extra)
+
+async def handle_audio_frame(
+    services: ServiceContainer,
+    client_id: str,
+    data: bytes,
+    received: Optional[float] = None
+):
+    """
+    Handle one binary audio frame.
+    PCM and Opus payloads are decoded per connection and stream into the
+    transcriber, which emits partial transcriptions as audio arrives and
+    a final one at the endpoint.
+    """
+    tracer = services.tracer
+    received = received or time.perf_counter()
+    try:
+        frame = parse_frame(data)
+    except FrameError as e:
+        await manager.send_message(client_id, {'type': 'error', 'message': str(e)})
+        return
+    parsed = time.perf_counter()
+    
+    if frame.codec == CODEC_WAV:
+        trace = tracer.trace(client_id, started=received)
+        trace.record('receive', received, parsed)
+        await transcribe_and_process(services, client_id, bytes(frame.payload), trace)
+        return
+    tracer.record('receive', parsed - received)
+    
+    connection = manager.active_connections[client_id]
+    vad: VoiceActivityDetector = connection['vad']
+    stream: StreamingTranscriber = connection['stream']
+    decoder: FrameDecoder = connection['decoder']
+    
+    lost = stream.track_sequence(frame.sequence)
+    
+    # PCM stays a view over the received message unless it needs downmixing
+    # or resampling; Opus decodes with per-connection state
+    try:
+        samples = decoder.decode(frame, lost)
+    except (ValueError, RuntimeError) as e:
+        await manager.send_message(client_id, {'type': 'error', 'message': str(e)})
+        return
+    decoded = time.perf_counter()
+    
+    # VAD drops silence and cuts utterances at pauses before anything reaches STT
+    segments = vad.process(samples)
+    if frame.end_of_utterance:
+        segments += vad.flush()
+    tracer.record('decode', decoded - parsed)
+    tracer.record('vad', time.perf_counter() - decoded)
+    
+    try:
+        for segment in segments:
+            await stream.feed(
+                segment.audio,
+                settings.sample_rate,
+                end_of_utterance=segment.end_of_utterance
+            )
+    except TranscriptionQueueFull as e:
+        await signal_queue_full(client_id, e)
+        return
+    await manager.set_throttled(client_id, False)
+
+async def signal_queue_full(client_id: str, error: TranscriptionQueueFull):
+    logger.warning(f"Dropped audio: {error}")
+    await manager.set_throttled(
+        client_id, True,
+        queue_depth=error.queue_depth,
+        client_depth=error.client_depth,
+        message='Transcription queue full, audio dropped'
+    )
 
-async def process_potential_question(client_id: str, text: str, confidence: float):
+async def transcribe_and_process(
+    services: ServiceContainer,
+    client_id: str,
+    audio_data: bytes,
+    trace: Optional[Trace] = None
+):
+    """Queue a complete WAV payload on the shared pool; the result goes to the transcription stage"""
+    trace = trace or services.tracer.trace(client_id)
+    with trace.span('vad'):
+        has_speech = services.speech_processor.wav_has_speech(audio_data)
+    if not has_speech:
+        logger.debug(f"Dropped silent audio chunk from {client_id}")
+        return
+    
+    try:
+        future = services.transcription_executor.submit_transcription(client_id, audio_data)
+    except TranscriptionQueueFull as e:
+        await signal_queue_full(client_id, e)
+        return
+    await manager.set_throttled(client_id, False)
+    
+    # The pool records stt_queue/stt histograms itself; the stage adds the span to the trace
+    await manager.active_connections[client_id]['pipeline'].put_transcription(future, trace)
+
+async def handle_transcript(
+    services: ServiceContainer,
+    client_id: str,
+    text: str,
+    confidence: float,
+    is_final: bool,
+    trace: Optional[Trace] = None
+):
+    """Send a partial or final transcription; finals are queued for question detection"""
+    # Send transcription to client (for display only) 
+    await manager.send_message(client_id, {
+        'type': 'transcription',
+        'text': text,
+        'confidence': confidence,
+        'is_final': is_final,
+        'timestamp': datetime.now().isoformat()
+    })
+    
+    if is_final:
+        # Check if it's a question (detection stage)
+        connection = manager.active_connections.get(client_id)
+        if connection:
+            await connection['pipeline'].put_detection(text, confidence, trace)
+    elif settings.speculative_responses:
+        # Start answering early if the partial already reads as a question
+        services.speculator.consider(client_id, text, services.sessions.get(client_id))
+
+async def process_potential_question(
+    services: ServiceContainer,
+    client_id: str,
+    text: str,
+    confidence: float,
+    trace: Optional[Trace] = None
+):
     """
     Process text to detect questions and generate responses
     Only responds when confident it's a direct question.
     """
+    trace = trace or services.tracer.trace(client_id)
     
     # Filter noise
-    if question_detector.filter_context_noise(text):
+    question_detector = services.question_detector
+    with trace.span('noise_filter'):
+        is_noise = question_detector.filter_context_noise(text)
+    if is_noise:
         logger.debug(f"Filtered noise: {text}")
+        services.speculator.cancel(client_id)
         return
     
     # Detect if it's a question
-    is_question, q_confidence, q_type = question_detector.detect(text)
+    with trace.span('detection'):
+        is_question, q_confidence, q_type = question_detector.detect(text)
     
     # Send detection result to client
     await manager.send_message(client_id, {
@@ -150,112 +423,126 @@ async def process_potential_question(client_id: str, text: str, confidence: floa
     
     if should_respond:
         logger.info(f"Question detected ({q_confidence:.2f}): {text}")
-        
-        # Notify client that AI is processing
-        await manager.send_message(client_id, {
-            'type': 'processing',
-            'message': 'Generating response...'
-        })
-        
-        # Get relevant context
-        context = context_manager.get_relevant_context(text, max_length=500)
-        
-        # Generate AI response
-        answer = await openai_service.generate_contextual_response(
-            question=text,
-            conversation_history=openai_service.conversation_context,
-            user_context=context
+        # Answer in its own task so the next utterance is detected meanwhile;
+        # a newer question cancels this answer if it is still running
+        await manager.active_connections[client_id]['pipeline'].start_answer(
+            lambda question_id: answer_question(services, client_id, text, q_confidence, q_type, question_id, trace)
         )
-        
-        # Store in conversation history
-        openai_service.add_to_conversation(text, answer)
-        
-        # Send response to client
-        await manager.send_message(client_id, {
-            'type': 'ai_response',
-            'question': text,
-            'answer': answer,
-            'confidence': q_confidence,
-            'timestamp': datetime.now().isoformat(),
-            'should_speak': True  # Trigger text-to-speech on client
-        })
-        
-        logger.info(f"Responded: {answer}")
     else:
+        services.speculator.cancel(client_id)
         logger.debug(f"No response needed for: {text}")
 
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-        
\ No newline at end of file
+async def answer_question(
+    services: ServiceContainer,
+    client_id: str,
+    text: str,
+    q_confidence: float,
+    q_type: str,
+    question_id: int,
+    trace: Trace
+):
+    """Generate, stream and store the answer to one detected question"""
+    # Notify client that AI is processing
+    await manager.send_message(client_id, {
+        'type': 'processing',
+        'question_id': question_id,
+        'message': 'Generating response...'
+    })
+    
+    session = services.sessions.get(client_id)
+    # What is left of response_timeout since the request started
+    deadline = services.stage_budget.start(trace.started)
+    
+    # Reuse the answer started on a partial transcript if it matches
+    speculation = services.speculator.take(client_id, text)
+    
+    # Generate AI response
+    if speculation is not None:
+        llm_start = time.perf_counter()
+        if settings.stream_responses:
+            answer = await stream_answer(client_id, text, speculation.stream(), trace, question_id, deadline)
+        else:
+            answer = await speculation.answer()
+            deadline.finish('llm')
+    else:
+        # Get relevant context from this client's session (always: it takes
+        # far less than a context-free answer costs); only the overrun is counted
+        with trace.span('context'):
+            context = session.context.get_relevant_context(text)
+        deadline.finish('retrieval')
+        llm_start = time.perf_counter()
+        llm_deadline = deadline.stage('llm', floor=settings.deadline_llm_floor)
+        if settings.stream_responses:
+            answer = await stream_answer(
+                client_id,
+                text,
+                services.openai_service.stream_contextual_response(
+                    question=text,
+                    conversation_history=session.history,
+                    user_context=context,
+                    question_type=q_type,
+                    summary=session.summary,
+                    deadline=llm_deadline
+                ),
+                trace,
+                question_id,
+                deadline
+            )
+        else:
+            answer = await services.openai_service.generate_contextual_response(
+                question=text,
+                conversation_history=session.history,
+                user_context=context,
+                question_type=q_type,
+                summary=session.summary,
+                deadline=llm_deadline
+            )
+            deadline.finish('llm')
+    trace.record('llm_complete', llm_start, time.perf_counter())
+    
+    # Store in conversation history
+    session.add_exchange(text, answer)
+    services.memory.schedule(session)
+    
+    # Send response to client
+    await manager.send_message(client_id, {
+        'type': 'ai_response',
+        'question_id': question_id,
+        'question': text,
+        'answer': answer,
+        'confidence': q_confidence,
+        'timestamp': datetime.now().isoformat(),
+        'streamed': settings.stream_responses,
+        'speculative': speculation is not None,
+        # Trigger text-to-speech on client (streamed answers are spoken from the deltas)
+        'should_speak': not settings.stream_responses
+    })
+    
+    trace.finish()
+    logger.info(f"Responded: {answer}")
+
+async def stream_answer(
+    client_id: str,
+    question: str,
+    deltas: AsyncIterator[str],
+    trace: Optional[Trace] = None,
+    question_id: Optional[int] = None,
+    deadline: Optional[Deadline] = None
+) -> str:
+    """Forward the answer to the client delta by delta; returns the full answer"""
+    parts = []
+    start = time.perf_counter()
+    async for delta in deltas:
+        if not parts and trace is not None:
+            trace.record('llm_first_token', start, time.perf_counter())
+        if not parts and deadline is not None:
+            deadline.finish('llm')
+        parts.append(delta)
+        await manager.send_message(client_id, {
+            'type': 'ai_response_delta',
+            'question_id': question_id,
+            'question': question,
+            'delta': delta,
+            'should_speak': True
+        })
+    return ''.join(parts)
@@ -0,0 +1,295 @@
+"""
+Offline question detection over recorded transcripts.
+
+Input is JSONL ({"text": ..., "id": ...} per line) or plain
+newline-delimited text; the two may be mixed. Results are one record per
+non-empty line followed by a summary record with per-type counts.
+
+    python -m backend.services.batch_detector transcripts.jsonl > scored.ndjson
+"""
+from collections import Counter
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import AsyncIterator, Dict, Iterable, Iterator, List, Optional, Tuple
+import asyncio
+import codecs
+import json
+import logging
+import os
+import time
+
+from .question_detector import QuestionDetector
+
+logger = logging.getLogger(__name__)
+
+# (line number, id, text)
+BatchRecord = Tuple[int, Optional[object], str]
+
+_worker_detector: Optional[QuestionDetector] = None
+
+
+def parse_line(line_number: int, line: str) -> Optional[BatchRecord]:
+    """Turn one input line into a record; None for blank lines"""
+    line = line.strip()
+    if not line:
+        return None
+    if line[0] == '{':
+        try:
+            data = json.loads(line)
+        except ValueError:
+            data = None
+        if isinstance(data, dict):
+            text = data.get('text', data.get('transcription', ''))
+            return line_number, data.get('id'), str(text or '')
+    return line_number, None, line
+
+
+def detect_records(
+    records: List[BatchRecord],
+    confidence_threshold: float = 0.75,
+    min_question_length: int = 3,
+    detector: Optional[QuestionDetector] = None
+) -> List[Dict]:
+    """Score a chunk of records (runs in pool workers as well as inline)"""
+    global _worker_detector
+    if detector is None:
+        if _worker_detector is None:
+            _worker_detector = QuestionDetector()
+        detector = _worker_detector
+
+    results = []
+    for line_number, record_id, text in records:
+        noise = detector.filter_context_noise(text) if text else False
+        is_question, confidence, q_type = detector.detect(text)
+        result = {
+            'line': line_number,
+            'text': text,
+            'is_question': is_question,
+            'confidence': confidence,
+            'question_type': q_type,
+            'noise': noise,
+            # Same gate the WebSocket uses before answering
+            'would_respond': (
+                is_question and not noise and
+                confidence >= confidence_threshold and
+                len(text.split()) >= min_question_length
+            )
+        }
+        if record_id is not None:
+            result['id'] = record_id
+        results.append(result)
+    return results
+
+
+class BatchSummary:
+    """Running per-type counts over a batch"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.total = 0
+        self.questions = 0
+        self.responded = 0
+        self.noise = 0
+        self.counts: Counter = Counter()
+
+    def add(self, result: Dict):
+        self.total += 1
+        self.questions += result['is_question']
+        self.responded += result['would_respond']
+        self.noise += result['noise']
+        self.counts[result['question_type']] += 1
+
+    def to_dict(self) -> Dict:
+        elapsed = time.perf_counter() - self.started
+        return {
+            'type': 'summary',
+            'total': self.total,
+            'questions': self.questions,
+            'would_respond': self.responded,
+            'noise': self.noise,
+            'counts': dict(self.counts),
+            'elapsed_ms': round(elapsed * 1000, 1),
+            'lines_per_second': round(self.total / elapsed, 1) if elapsed else 0.0
+        }
+
+
+class BatchDetector:
+    """
+    Streams detection results for a batch of transcript lines.
+    Records are scored in chunks of chunk_size, inline at first; once a
+    batch grows past process_threshold records the remaining chunks go to
+    a process pool (when more than one worker is available), with a
+    bounded number in flight and results yielded in input order.
+    """
+
+    def __init__(
+        self,
+        confidence_threshold: float = 0.75,
+        min_question_length: int = 3,
+        chunk_size: int = 2000,
+        process_threshold: int = 5000,
+        max_workers: Optional[int] = None,
+        executor: Optional[Executor] = None
+    ):
+        self.confidence_threshold = confidence_threshold
+        self.min_question_length = min_question_length
+        self.chunk_size = chunk_size
+        self.process_threshold = process_threshold
+        self.max_workers = max_workers or os.cpu_count() or 1
+        # A single worker process only adds pickling overhead
+        self.use_pool = executor is not None or self.max_workers > 1
+        self._executor = executor
+        self._detector = QuestionDetector()
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._executor
+
+    def _score_inline(self, records: List[BatchRecord], threshold: float) -> List[Dict]:
+        return detect_records(records, threshold, self.min_question_length, self._detector)
+
+    async def stream(
+        self,
+        lines: AsyncIterator[str],
+        confidence_threshold: Optional[float] = None
+    ) -> AsyncIterator[Dict]:
+        """Yield one result per record, then the summary"""
+        threshold = self.confidence_threshold if confidence_threshold is None else confidence_threshold
+        summary = BatchSummary()
+        loop = asyncio.get_running_loop()
+        pending: List[BatchRecord] = []
+        in_flight: Optional[List[asyncio.Future]] = None
+        max_in_flight = 1
+        line_number = 0
+
+        async for line in lines:
+            line_number += 1
+            record = parse_line(line_number, line)
+            if record is None:
+                continue
+            pending.append(record)
+            if len(pending) < self.chunk_size:
+                continue
+
+            if (in_flight is None and self.use_pool
+                    and summary.total + len(pending) > self.process_threshold):
+                # Large input: hand the rest to the process pool
+                executor = self._get_executor()
+                max_in_flight = 2 * (getattr(executor, '_max_workers', None) or 2)
+                in_flight = []
+                logger.info(f"Batch detection past {self.process_threshold} lines, using process pool")
+
+            if in_flight is None:
+                for result in self._score_inline(pending, threshold):
+                    summary.add(result)
+                    yield result
+            else:
+                in_flight.append(self._submit(loop, pending, threshold))
+                while len(in_flight) >= max_in_flight:
+                    for result in await in_flight.pop(0):
+                        summary.add(result)
+                        yield result
+            pending = []
+
+        for future in in_flight or ():
+            for result in await future:
+                summary.add(result)
+                yield result
+        for result in self._score_inline(pending, threshold):
+            summary.add(result)
+            yield result
+
+        yield summary.to_dict()
+
+    def _submit(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        records: List[BatchRecord],
+        threshold: float
+    ) -> asyncio.Future:
+        return loop.run_in_executor(
+            self._get_executor(), detect_records,
+            records, threshold, self.min_question_length
+        )
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+async def iter_lines(chunks: AsyncIterator[bytes], encoding: str = "utf-8") -> AsyncIterator[str]:
+    """Split a stream of raw bytes into text lines"""
+    decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+    partial = ""
+    async for chunk in chunks:
+        partial += decoder.decode(chunk)
+        *lines, partial = partial.split('\n')
+        for line in lines:
+            yield line
+    partial += decoder.decode(b"", final=True)
+    if partial:
+        yield partial
+
+
+async def _aiter(lines: Iterable[str]) -> AsyncIterator[str]:
+    for line in lines:
+        yield line
+
+
+def _read_files(paths: List[str]) -> Iterator[str]:
+    import sys
+    if not paths:
+        yield from sys.stdin
+        return
+    for path in paths:
+        with open(path, encoding='utf-8', errors='replace') as f:
+            yield from f
+
+
+def main(argv: Optional[List[str]] = None):
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(
+        description="Score transcripts with QuestionDetector and print NDJSON results"
+    )
+    parser.add_argument('files', nargs='*', help="JSONL or newline-delimited text (default: stdin)")
+    parser.add_argument('--threshold', type=float, default=None, help="confidence threshold (default: settings)")
+    parser.add_argument('--min-length', type=int, default=None, help="minimum words (default: settings)")
+    parser.add_argument('--chunk-size', type=int, default=2000)
+    parser.add_argument('--process-threshold', type=int, default=5000)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--summary-only', action='store_true')
+    args = parser.parse_args(argv)
+
+    threshold, min_length = args.threshold, args.min_length
+    if threshold is None or min_length is None:
+        # Only touch settings (which needs OPENAI_API_KEY) when a default is needed
+        from ..config import settings
+        threshold = settings.confidence_threshold if threshold is None else threshold
+        min_length = settings.min_question_length if min_length is None else min_length
+
+    detector = BatchDetector(
+        confidence_threshold=threshold,
+        min_question_length=min_length,
+        chunk_size=args.chunk_size,
+        process_threshold=args.process_threshold,
+        max_workers=args.workers
+    )
+
+    async def run():
+        out = sys.stdout
+        async for result in detector.stream(_aiter(_read_files(args.files))):
+            if args.summary_only and result.get('type') != 'summary':
+                continue
+            out.write(json.dumps(result) + '\n')
+
+    try:
+        asyncio.run(run())
+    finally:
+        detector.shutdown()
+
+
+if __name__ == '__main__':
+    main()
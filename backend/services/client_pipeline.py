@@ -0,0 +1,248 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+import logging
+import time
+
+from .resilience import StageBudget
+
+logger = logging.getLogger(__name__)
+
+# Stage handlers supplied by the WebSocket route
+AudioHandler = Callable[[Any], Awaitable[None]]
+TranscriptHandler = Callable[[str, float, Any], Awaitable[None]]
+AnswerFactory = Callable[[int], Awaitable[None]]
+# Called after the pipeline cancels the answer in flight
+CancelListener = Callable[[], None]
+
+
+class ClientPipeline:
+    """
+    Per-connection task pipeline:
+
+        receive -> [audio] -> decode/VAD/STT submit
+                -> [transcripts] -> final STT results, in utterance order
+                -> [detections] -> noise filter + question detection
+                -> answer task (one per question)
+                -> [outbox] -> socket, in order, each message tagged 'seq'
+
+    Each stage is its own task and the queues between them are bounded,
+    so a slow answer never stops the socket from being read. A newer
+    question cancels the answer still in flight (or, with
+    cancel_superseded=False, waits for it so answers stay in order).
+    on_answer_cancelled lets the caller stop work the cancelled answer
+    started outside its task (e.g. a kept speculation).
+    With a stage budget, a final transcription not ready within the
+    budget's 'stt' share of being queued is still awaited and answered
+    (the model keeps its minimum budget); the overrun is only counted and
+    traced.
+    """
+
+    def __init__(
+        self,
+        client_id: str,
+        send_json: Callable[[Dict], Awaitable[None]],
+        tracer=None,
+        audio_queue_size: int = 250,
+        transcript_queue_size: int = 8,
+        outbox_size: int = 256,
+        cancel_superseded: bool = True,
+        stage_budget: Optional[StageBudget] = None,
+        on_answer_cancelled: Optional[CancelListener] = None
+    ):
+        self.client_id = client_id
+        self.send_json = send_json
+        self.tracer = tracer
+        self.cancel_superseded = cancel_superseded
+        self.stt_timeout = stage_budget.share('stt') if stage_budget is not None else None
+        self.stage_budget = stage_budget
+        self.on_answer_cancelled = on_answer_cancelled
+
+        self.audio: asyncio.Queue = asyncio.Queue(audio_queue_size)
+        self.transcripts: asyncio.Queue = asyncio.Queue(transcript_queue_size)
+        self.detections: asyncio.Queue = asyncio.Queue(transcript_queue_size)
+        self.outbox: asyncio.Queue = asyncio.Queue(outbox_size)
+
+        self._tasks: List[asyncio.Task] = []
+        self._answer_task: Optional[asyncio.Task] = None
+        self._answer_id = 0
+        self.seq = 0
+        self.question_id = 0
+
+        # Metrics
+        self.audio_dropped = 0
+        self.answers_started = 0
+        self.answers_cancelled = 0
+        self.send_failures = 0
+        self.stt_overruns = 0
+
+    def start(
+        self,
+        on_audio: AudioHandler,
+        on_final: TranscriptHandler,
+        on_detect: TranscriptHandler
+    ):
+        """Start the stage tasks (must be called on the running loop)"""
+        self._tasks = [
+            asyncio.create_task(self._run_stage('audio', self.audio, on_audio)),
+            asyncio.create_task(self._run_transcripts(on_final)),
+            asyncio.create_task(self._run_stage('detection', self.detections, lambda item: on_detect(*item))),
+            asyncio.create_task(self._run_sender())
+        ]
+
+    # Producers
+
+    def put_audio(self, item) -> bool:
+        """Queue an audio item without blocking the receive loop; False if the queue is full"""
+        try:
+            self.audio.put_nowait(item)
+            return True
+        except asyncio.QueueFull:
+            self.audio_dropped += 1
+            return False
+
+    async def put_transcription(self, future: asyncio.Future, trace=None):
+        """Queue a pending final transcription; results are consumed in submission order"""
+        await self.transcripts.put((future, trace, time.perf_counter()))
+
+    async def put_detection(self, text: str, confidence: float, trace=None):
+        await self.detections.put((text, confidence, trace))
+
+    async def send(self, message: Dict):
+        """Queue a message for the client, stamped with the next sequence id"""
+        self.seq += 1
+        message['seq'] = self.seq
+        await self.outbox.put(message)
+
+    async def start_answer(self, factory: AnswerFactory) -> int:
+        """Run factory(question_id) as the current answer, superseding any in flight"""
+        self.question_id += 1
+        question_id = self.question_id
+        previous, previous_id = self._answer_task, self._answer_id
+
+        if previous is not None and not previous.done():
+            if self.cancel_superseded:
+                previous.cancel()
+                self._answer_cancelled()
+                self.answers_cancelled += 1
+                logger.info(f"Cancelled answer {previous_id} for {self.client_id}, superseded by {question_id}")
+                # Queued before anything the new answer sends
+                await self.send({
+                    'type': 'ai_response_cancelled',
+                    'question_id': previous_id,
+                    'superseded_by': question_id
+                })
+                coro = factory(question_id)
+            else:
+                coro = self._after(previous, factory, question_id)
+        else:
+            coro = factory(question_id)
+
+        self.answers_started += 1
+        self._answer_id = question_id
+        self._answer_task = asyncio.create_task(self._run_answer(coro, question_id))
+        return question_id
+
+    def _answer_cancelled(self):
+        if self.on_answer_cancelled is not None:
+            self.on_answer_cancelled()
+
+    async def _after(self, previous: asyncio.Task, factory: AnswerFactory, question_id: int):
+        await asyncio.wait({previous})
+        await factory(question_id)
+
+    # Stages
+
+    async def _run_stage(self, name: str, queue: asyncio.Queue, handler: Callable[[Any], Awaitable[None]]):
+        while True:
+            item = await queue.get()
+            try:
+                await handler(item)
+            except Exception as e:
+                logger.error(f"Pipeline {name} stage failed for {self.client_id}: {e}")
+
+    async def _run_transcripts(self, on_final: TranscriptHandler):
+        while True:
+            future, trace, submitted = await self.transcripts.get()
+            if trace is None and self.tracer is not None:
+                # Streamed audio: the request starts when its utterance was queued
+                trace = self.tracer.trace(self.client_id, started=submitted)
+            # wait() rather than await, so a cancelled job doesn't look like our own cancellation
+            await asyncio.wait({future})
+            finished = time.perf_counter()
+            if self.stt_timeout is not None and finished - submitted > self.stt_timeout:
+                self.stt_overruns += 1
+                self.stage_budget.miss('stt')
+                if trace is not None:
+                    trace.record('stt_overrun', submitted + self.stt_timeout, finished, observe=False)
+                logger.warning(
+                    f"Final transcription for {self.client_id} took {finished - submitted:.2f}s "
+                    f"(stage budget {self.stt_timeout:.2f}s)"
+                )
+            if future.cancelled():
+                continue
+            if future.exception() is not None:
+                logger.error(f"Final transcription failed for {self.client_id}: {future.exception()}")
+                continue
+            if trace is not None:
+                trace.record('stt', submitted, finished, observe=False)
+
+            text, confidence = future.result()
+            if not text:
+                continue
+            try:
+                await on_final(text, confidence, trace)
+            except Exception as e:
+                logger.error(f"Pipeline transcription stage failed for {self.client_id}: {e}")
+
+    async def _run_answer(self, coro: Awaitable[None], question_id: int):
+        try:
+            await coro
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Answer {question_id} failed for {self.client_id}: {e}")
+            await self.send({'type': 'error', 'question_id': question_id, 'message': 'Could not generate a response'})
+
+    async def _run_sender(self):
+        while True:
+            message = await self.outbox.get()
+            start = time.perf_counter()
+            try:
+                await self.send_json(message)
+            except Exception as e:
+                # The receive loop sees the disconnect and closes the pipeline
+                self.send_failures += 1
+                logger.debug(f"Send to {self.client_id} failed: {e}")
+                continue
+            if self.tracer is not None:
+                self.tracer.record('send', time.perf_counter() - start)
+
+    async def close(self):
+        """Cancel every stage and the answer in flight"""
+        tasks = list(self._tasks)
+        if self._answer_task is not None:
+            tasks.append(self._answer_task)
+        for task in tasks:
+            task.cancel()
+        if self._answer_task is not None and not self._answer_task.done():
+            self._answer_cancelled()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks = []
+        self._answer_task = None
+
+    def get_stats(self) -> Dict:
+        return {
+            'queues': {
+                'audio': self.audio.qsize(),
+                'transcripts': self.transcripts.qsize(),
+                'detections': self.detections.qsize(),
+                'outbox': self.outbox.qsize()
+            },
+            'audio_dropped': self.audio_dropped,
+            'messages_sent': self.seq - self.outbox.qsize(),
+            'answers_started': self.answers_started,
+            'answers_cancelled': self.answers_cancelled,
+            'answer_in_flight': self._answer_task is not None and not self._answer_task.done(),
+            'send_failures': self.send_failures,
+            'stt_overruns': self.stt_overruns
+        }
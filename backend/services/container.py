@@ -0,0 +1,183 @@
+from starlette.requests import HTTPConnection
+import httpx
+import asyncio
+import logging
+import openai
+import os
+import socket
+import time
+
+from ..config import Settings
+from .batch_detector import BatchDetector
+from .conversation_log import ConversationLog
+from .conversation_memory import ConversationMemory
+from .model_router import ModelRouter
+from .openai_service import OpenAIService
+from .question_detector import QuestionDetector
+from .resilience import CircuitBreaker, RetryBudget, StageBudget
+from .response_cache import ResponseCache
+from .session_manager import SessionRegistry
+from .speculation import SpeculativeResponder
+from .speech_processor import SpeechProcessor
+from .state_store import create_state_store
+from .stt_engines import create_stt_engine
+from .tracing import Tracer
+from .transcription_executor import TranscriptionExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class ServiceContainer:
+    """
+    The long-lived services shared by the REST and WebSocket routes.
+    Built once per app in main.py's lifespan handler: one HTTP connection
+    pool for OpenAI, one transcription pool, one session registry.
+    With several workers, each builds its own container; sessions and
+    connection events are shared through the state store.
+    """
+
+    def __init__(self, settings: Settings):
+        self.settings = settings
+        self.tracer = Tracer(enabled=settings.tracing_enabled, history_size=settings.trace_history_size)
+
+        # One keep-alive pool for every OpenAI call (keeps the SDK's own
+        # client defaults, only the pool limits and timeouts are tuned)
+        self.http_client = openai.DefaultAsyncHttpxClient(
+            limits=httpx.Limits(
+                max_connections=settings.openai_max_connections,
+                max_keepalive_connections=settings.openai_max_keepalive,
+                keepalive_expiry=settings.openai_keepalive_expiry
+            ),
+            timeout=openai.Timeout(
+                settings.openai_read_timeout,
+                connect=settings.openai_connect_timeout
+            )
+        )
+
+        self.response_cache = ResponseCache(
+            max_entries=settings.response_cache_size,
+            ttl_seconds=settings.response_cache_ttl,
+            fuzzy_threshold=settings.response_cache_fuzzy_threshold
+        )
+        self.model_router = ModelRouter(
+            settings.model_tiers,
+            deadline=settings.response_timeout,
+            escalate_types=settings.escalate_question_types,
+            escalate_keywords=settings.escalate_keywords,
+            escalate_prompt_tokens=settings.escalate_prompt_tokens,
+            escalated_budget=settings.escalated_budget,
+            window=settings.router_window,
+            hedge_percentile=settings.hedge_percentile or None,
+            retry_budget=RetryBudget(ratio=settings.retry_budget_ratio)
+        )
+        # response_timeout split across the stages of one answer
+        self.stage_budget = StageBudget(settings.response_timeout, {
+            'stt': settings.deadline_stt_share,
+            'retrieval': settings.deadline_retrieval_share,
+            'llm': 1.0 - settings.deadline_stt_share - settings.deadline_retrieval_share
+        })
+        self.openai_service = OpenAIService(
+            api_key=settings.openai_api_key,
+            base_url=settings.openai_base_url,
+            cache=self.response_cache,
+            http_client=self.http_client,
+            router=self.model_router,
+            recent_turns=settings.memory_recent_turns,
+            prompt_cache_key=settings.openai_prompt_cache_key or None,
+            breaker=CircuitBreaker(
+                'openai',
+                failure_threshold=settings.circuit_failure_threshold,
+                reset_timeout=settings.circuit_reset_timeout
+            )
+        )
+        self.memory = ConversationMemory(
+            self.openai_service,
+            max_words=settings.memory_summary_words,
+            min_turns=settings.memory_summarize_every,
+            timeout=settings.memory_summary_timeout
+        )
+        self.question_detector = QuestionDetector()
+        self.speculator = SpeculativeResponder(
+            self.openai_service,
+            self.question_detector,
+            min_confidence=settings.speculation_min_confidence,
+            min_words=settings.min_question_length,
+            max_extra_words=settings.speculation_max_extra_words,
+            timeout=settings.response_timeout
+        )
+        self.worker_id = settings.worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.state_store = create_state_store(settings.state_backend, settings.state_url, settings.state_key_prefix)
+        self.conversation_log = ConversationLog(
+            settings.conversation_log_path,
+            batch_size=settings.conversation_log_batch_size,
+            flush_interval_ms=settings.conversation_log_flush_ms
+        ) if settings.conversation_log_path else None
+        self.sessions = SessionRegistry(
+            idle_timeout=settings.session_idle_timeout,
+            max_sessions=settings.session_max_count,
+            max_session_bytes=settings.session_max_bytes,
+            max_total_bytes=settings.session_total_max_bytes,
+            max_history=settings.session_max_history,
+            sweep_interval=settings.session_sweep_interval,
+            passage_words=settings.context_passage_words,
+            top_k=settings.context_top_k,
+            token_budget=settings.context_token_budget,
+            store=self.state_store,
+            worker_id=self.worker_id,
+            store_ttl=settings.state_session_ttl,
+            log=self.conversation_log
+        )
+        self.speech_processor = SpeechProcessor()
+        # One engine (and one loaded model) shared by every connection
+        self.stt_engine = create_stt_engine(settings.stt_engine, self.speech_processor, settings)
+        self.transcription_executor = TranscriptionExecutor(
+            self.speech_processor,
+            stt_engine=self.stt_engine,
+            mode=settings.transcription_executor,
+            max_workers=settings.transcription_workers,
+            max_queue_size=settings.transcription_queue_size,
+            max_pending_per_client=settings.transcription_client_queue_size,
+            tracer=self.tracer
+        )
+        self.batch_detector = BatchDetector(
+            confidence_threshold=settings.confidence_threshold,
+            min_question_length=settings.min_question_length,
+            chunk_size=settings.batch_chunk_size,
+            process_threshold=settings.batch_process_threshold,
+            max_workers=settings.batch_workers
+        )
+
+    async def startup(self):
+        """Start worker pools and open the upstream connection before traffic arrives"""
+        start_time = time.time()
+        await self.state_store.connect()
+        if self.conversation_log is not None:
+            await self.conversation_log.open()
+        await self.sessions.start()
+        self.transcription_executor.start()
+        tasks = []
+        if self.settings.stt_warmup:
+            tasks.append(asyncio.get_running_loop().run_in_executor(None, self.stt_engine.warmup))
+        if self.settings.openai_warmup:
+            tasks.append(self.openai_service.warmup(timeout=self.settings.openai_connect_timeout))
+        await asyncio.gather(*tasks)
+        logger.info(f"Services ready in {time.time() - start_time:.2f}s")
+
+    async def shutdown(self):
+        """Release pools and connections"""
+        await self.transcription_executor.shutdown()
+        await self.memory.close()
+        await self.sessions.stop()
+        await self.state_store.close()
+        if self.conversation_log is not None:
+            await self.conversation_log.close()
+        self.stt_engine.close()
+        self.batch_detector.shutdown()
+        await self.openai_service.close()
+        await self.http_client.aclose()
+        logger.info("Services shut down")
+
+
+def get_services(connection: HTTPConnection) -> ServiceContainer:
+    """FastAPI dependency: the app's ServiceContainer (works for HTTP and WebSocket routes)"""
+    return connection.app.state.services
@@ -0,0 +1,281 @@
+from array import array
+from collections import Counter
+from typing import Dict, Iterable, List, Set, Tuple
+import heapq
+import logging
+import math
+import re
+
+logger = logging.getLogger(__name__)
+
+_token_pattern = re.compile(r"[a-z0-9]+")
+_sentence_pattern = re.compile(r"(?<=[.!?])\s+|\n{2,}")
+
+# Rough byte costs behind BM25Index.memory_estimate
+_POSTING_BYTES = 2 * array('I').itemsize  # passage id and term frequency
+_PASSAGE_BYTES = 2 * array('I').itemsize  # length and document id
+_VOCABULARY_ENTRY_BYTES = 60  # dict slot and str header, on top of the token
+_TOMBSTONE_BYTES = 40  # set slot and int, until compaction
+
+STOPWORDS = frozenset("""
+a an and are as at be by for from has have i in is it its of on or that the
+this to was were will with you your we they he she do does did what who
+when where why how which can could would should
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens with stopwords removed"""
+    return [t for t in _token_pattern.findall(text.lower()) if t not in STOPWORDS]
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough LLM token count (~4 characters per token)"""
+    return (len(text) + 3) // 4
+
+
+class PassageChunker:
+    """
+    Incrementally splits streamed text into sentence-aligned passages of
+    about max_words. feed() returns (start, end, text) for every passage
+    completed so far; offsets are absolute character positions.
+    """
+
+    def __init__(self, max_words: int = 60, max_pending_chars: int = 4096):
+        self.max_words = max_words
+        self.max_pending_chars = max_pending_chars
+        self._pending = ""
+        self._pending_start = 0
+        self._passage: List[Tuple[int, int]] = []
+        self._passage_words = 0
+        self._text_parts: List[str] = []
+        self.words = 0  # total so far
+
+    def feed(self, text: str) -> List[Tuple[int, int, str]]:
+        self._pending += text
+
+        last = None
+        for last in _sentence_pattern.finditer(self._pending):
+            pass
+
+        if last is not None:
+            cut = last.end()
+        elif len(self._pending) > self.max_pending_chars:
+            # No sentence boundary in a long run of text: cut at whitespace
+            cut = self._pending.rfind(' ') + 1 or len(self._pending)
+        else:
+            return []
+
+        complete, self._pending = self._pending[:cut], self._pending[cut:]
+        base = self._pending_start
+        self._pending_start += cut
+        return self._add_sentences(complete, base)
+
+    def finish(self) -> List[Tuple[int, int, str]]:
+        passages = self._add_sentences(self._pending, self._pending_start)
+        self._pending_start += len(self._pending)
+        self._pending = ""
+        return passages + self._close_passage()
+
+    def _add_sentences(self, text: str, base: int) -> List[Tuple[int, int, str]]:
+        passages = []
+        position = 0
+        for boundary in list(_sentence_pattern.finditer(text)) + [None]:
+            end = boundary.start() if boundary else len(text)
+            sentence = text[position:end]
+            stripped = sentence.strip()
+            if stripped:
+                start = base + position + (len(sentence) - len(sentence.lstrip()))
+                words = len(stripped.split())
+                if self._passage and self._passage_words + words > self.max_words:
+                    passages.extend(self._close_passage())
+                self._passage.append((start, start + len(stripped)))
+                self._text_parts.append(stripped)
+                self._passage_words += words
+                self.words += words
+            if boundary:
+                position = boundary.end()
+        return passages
+
+    def _close_passage(self) -> List[Tuple[int, int, str]]:
+        if not self._passage:
+            return []
+        passage = (self._passage[0][0], self._passage[-1][1], ' '.join(self._text_parts))
+        self._passage, self._text_parts, self._passage_words = [], [], 0
+        return [passage]
+
+
+def chunk_passages(text: str, max_words: int = 60) -> List[str]:
+    """Split text into passages of whole sentences, about max_words each"""
+    chunker = PassageChunker(max_words)
+    return [passage for _, _, passage in chunker.feed(text) + chunker.finish()]
+
+
+def prepare_passages(
+    text: str,
+    max_words: int = 60,
+    piece_chars: int = 65536
+) -> Tuple[List[Tuple[int, int, Counter, int]], int]:
+    """
+    Chunk and tokenize a whole document: (start, end, term counts, length)
+    per passage, ready for BM25Index.add_terms, and its word count.
+    Touches no shared state, so it can run in an executor; text is fed
+    in pieces so no single regex call holds the GIL for long.
+    """
+    chunker = PassageChunker(max_words)
+    passages = []
+    for offset in range(0, len(text), piece_chars):
+        passages.extend(chunker.feed(text[offset:offset + piece_chars]))
+    passages.extend(chunker.finish())
+
+    prepared = []
+    for start, end, passage in passages:
+        tokens = tokenize(passage)
+        prepared.append((start, end, Counter(tokens), len(tokens)))
+    return prepared, chunker.words
+
+
+class BM25Index:
+    """
+    Incremental inverted index over context passages with BM25 scoring.
+    Terms are interned to integer ids and postings are kept as parallel
+    arrays of passage ids and term frequencies. Removed passages are
+    tombstoned and compacted away once they make up half the index.
+    The memory estimate is kept up to date as passages come and go.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.clear()
+
+    def clear(self):
+        self.vocabulary: Dict[str, int] = {}
+        self.postings: Dict[int, Tuple[array, array]] = {}
+        self.passage_lengths = array('I')
+        self.passage_document = array('I')
+        self.document_passages: Dict[int, array] = {}
+        self._removed: Set[int] = set()
+        self._live_passages = 0
+        self._total_length = 0
+        self._bytes = 0
+
+    def __len__(self) -> int:
+        return self._live_passages
+
+    def _term_id(self, token: str) -> int:
+        term_id = self.vocabulary.get(token)
+        if term_id is None:
+            term_id = self.vocabulary[token] = len(self.vocabulary)
+        return term_id
+
+    def add_passage(self, doc_id: int, text: str) -> int:
+        """Index one passage of a document; returns its passage id"""
+        tokens = tokenize(text)
+        return self.add_terms(doc_id, Counter(tokens), len(tokens))
+
+    def add_terms(self, doc_id: int, counts: Dict[str, int], length: int) -> int:
+        """Index one already tokenized passage (see prepare_passages)"""
+        passage_id = len(self.passage_lengths)
+
+        vocabulary_size = len(self.vocabulary)
+        new_tokens = 0
+        for token, tf in counts.items():
+            term_id = self._term_id(token)
+            if term_id >= vocabulary_size:
+                new_tokens += len(token) + _VOCABULARY_ENTRY_BYTES
+            posting = self.postings.get(term_id)
+            if posting is None:
+                posting = self.postings[term_id] = (array('I'), array('I'))
+            posting[0].append(passage_id)
+            posting[1].append(tf)
+        self._bytes += len(counts) * _POSTING_BYTES + new_tokens + _PASSAGE_BYTES
+
+        self.passage_lengths.append(length)
+        self.passage_document.append(doc_id)
+        self.document_passages.setdefault(doc_id, array('I')).append(passage_id)
+        self._total_length += length
+        self._live_passages += 1
+        return passage_id
+
+    def add_document(self, doc_id: int, passages: Iterable[str]) -> List[int]:
+        """Index the passages of a document; returns their passage ids"""
+        return [self.add_passage(doc_id, passage) for passage in passages]
+
+    def remove_document(self, doc_id: int):
+        passage_ids = self.document_passages.pop(doc_id, None)
+        if not passage_ids:
+            return
+        for passage_id in passage_ids:
+            self._total_length -= self.passage_lengths[passage_id]
+        self._live_passages -= len(passage_ids)
+        self._removed.update(passage_ids)
+        self._bytes += len(passage_ids) * _TOMBSTONE_BYTES
+
+        if len(self._removed) * 2 > self._live_passages:
+            self._compact()
+
+    def _compact(self):
+        """Drop tombstoned passages from the postings (passage ids are kept)"""
+        removed = self._removed
+        dropped = 0
+        for term_id in list(self.postings):
+            ids, tfs = self.postings[term_id]
+            keep = [i for i, passage_id in enumerate(ids) if passage_id not in removed]
+            dropped += len(ids) - len(keep)
+            if not keep:
+                del self.postings[term_id]
+            elif len(keep) < len(ids):
+                self.postings[term_id] = (
+                    array('I', (ids[i] for i in keep)),
+                    array('I', (tfs[i] for i in keep))
+                )
+        for passage_id in removed:
+            self.passage_lengths[passage_id] = 0
+        self._bytes -= dropped * _POSTING_BYTES + len(removed) * _TOMBSTONE_BYTES
+        self._removed = set()
+
+    def search(self, query: str, top_k: int = 5) -> List[Tuple[int, float]]:
+        """Top-k (passage_id, score) pairs for a query, best first"""
+        count = len(self)
+        if count == 0:
+            return []
+
+        average_length = self._total_length / count or 1.0
+        k1, b = self.k1, self.b
+        lengths = self.passage_lengths
+        removed = self._removed
+        scores: Dict[int, float] = {}
+
+        for token in set(tokenize(query)):
+            term_id = self.vocabulary.get(token)
+            posting = self.postings.get(term_id) if term_id is not None else None
+            if not posting:
+                continue
+            ids, tfs = posting
+            df = len(ids)
+            idf = math.log(1 + (count - df + 0.5) / (df + 0.5))
+            for passage_id, tf in zip(ids, tfs):
+                if passage_id in removed:
+                    continue
+                norm = k1 * (1 - b + b * lengths[passage_id] / average_length)
+                scores[passage_id] = scores.get(passage_id, 0.0) + idf * tf * (k1 + 1) / (tf + norm)
+
+        return heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+
+    def documents_matching(self, terms: Iterable[str]) -> Set[int]:
+        """Ids of documents containing any of the terms"""
+        documents = set()
+        for term in terms:
+            for token in tokenize(term):
+                term_id = self.vocabulary.get(token)
+                if term_id is None or term_id not in self.postings:
+                    continue
+                for passage_id in self.postings[term_id][0]:
+                    if passage_id not in self._removed:
+                        documents.add(self.passage_document[passage_id])
+        return documents
+
+    def memory_estimate(self) -> int:
+        """Approximate bytes held by postings, passage tables, vocabulary and tombstones"""
+        return self._bytes
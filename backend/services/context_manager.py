@@ -1,120 +1,251 @@
-from typing import List, Dict, Optional
+from array import array
+from typing import AsyncIterator, Callable, List, Dict, Optional
 from datetime import datetime
+import asyncio
+import codecs
 import logging
 
+from .context_index import BM25Index, PassageChunker, estimate_tokens, prepare_passages
+
 logger = logging.getLogger(__name__)
 
+# Called with ('added' | 'removed', entry) or ('cleared', None) when stored context changes
+ContextListener = Callable[[str, Optional[Dict]], None]
+
+class ContextIngest:
+    """
+    In-progress upload. Text is fed in pieces; passages are indexed as
+    soon as they are complete, but only become searchable on finish().
+    """
+
+    def __init__(self, manager: "ContextManager", context_id: int, source: str, metadata: dict):
+        self.manager = manager
+        self.context_id = context_id
+        self.source = source
+        self.metadata = metadata
+        self._chunker = PassageChunker(manager.passage_words)
+        self._parts: List[str] = []
+        self.word_count: Optional[int] = None  # known up front for feed_document()
+
+    def feed(self, text: str):
+        if not text:
+            return
+        self._parts.append(text)
+        for start, end, passage in self._chunker.feed(text):
+            self.manager._index_passage(self.context_id, start, end, passage)
+
+    async def feed_document(self, text: str, batch: int = 500):
+        """
+        Feed a whole document at once without blocking the event loop:
+        passages are chunked and tokenized in the default executor, then
+        merged into the index batch passages at a time. Use instead of
+        feed(), not together with it.
+        """
+        loop = asyncio.get_running_loop()
+        passages, self.word_count = await loop.run_in_executor(
+            None, prepare_passages, text, self.manager.passage_words
+        )
+        self._parts.append(text)
+        for count, (start, end, counts, length) in enumerate(passages, 1):
+            self.manager.index.add_terms(self.context_id, counts, length)
+            self.manager.passage_starts.append(start)
+            self.manager.passage_ends.append(end)
+            if count % batch == 0:
+                await asyncio.sleep(0)
+
+    def finish(self) -> Dict:
+        for start, end, passage in self._chunker.finish():
+            self.manager._index_passage(self.context_id, start, end, passage)
+        content = ''.join(self._parts)
+        self._parts = []
+        return self.manager._commit(self, content)
+
+    def abort(self):
+        self._parts = []
+        self.manager.index.remove_document(self.context_id)
+
 class ContextManager:
     """
     Manages user-uploaded context for better AI responses.
-    Stores and retrieves relevant information.
+    Uploads are split into passages at ingest and indexed with BM25.
+    Each document's text is stored once; passages are offsets into it.
+    Retrieval picks the best-matching passages that fit a token budget.
     """
-    
-    def __init__(self):
+
+    def __init__(self, passage_words: int = 60, top_k: int = 8, token_budget: int = 400):
         self.contexts: List[Dict] = []
-        self.max_context_length = 2000  # characters
-        
-    def add_context(self, content: str, source: str = "upload", metadata: dict = None):
+        self.passage_words = passage_words
+        self.top_k = top_k
+        self.token_budget = token_budget
+        self.index = BM25Index()
+        self.documents: Dict[int, str] = {}
+        self._text_bytes = 0
+        # Passage offsets into their document, indexed by passage id
+        self.passage_starts = array('I')
+        self.passage_ends = array('I')
+        self._next_id = 0
+        self._listeners: List[ContextListener] = []
+
+    def on_change(self, callback: ContextListener):
+        """Register a callback fired whenever stored context changes"""
+        self._listeners.append(callback)
+
+    def _notify(self, kind: str, entry: Optional[Dict] = None):
+        for callback in self._listeners:
+            callback(kind, entry)
+
+    def begin_context(self, source: str = "upload", metadata: dict = None) -> ContextIngest:
+        """Start an incremental upload"""
+        context_id = self._next_id
+        self._next_id += 1
+        return ContextIngest(self, context_id, source, metadata or {})
+
+    def add_context(self, content: str, source: str = "upload", metadata: dict = None) -> Dict:
         """Add new context with metadata"""
+        ingest = self.begin_context(source, metadata)
+        ingest.feed(content)
+        return ingest.finish()
+
+    async def add_context_stream(
+        self,
+        chunks: AsyncIterator[bytes],
+        source: str = "upload",
+        metadata: dict = None,
+        encoding: str = "utf-8"
+    ) -> Dict:
+        """
+        Add context from a stream of raw bytes, decoding incrementally
+        so multi-megabyte uploads are never decoded in one piece.
+        """
+        ingest = self.begin_context(source, metadata)
+        decoder = codecs.getincrementaldecoder(encoding)()
+        try:
+            async for chunk in chunks:
+                ingest.feed(decoder.decode(chunk))
+            ingest.feed(decoder.decode(b"", final=True))
+        except BaseException:
+            ingest.abort()
+            raise
+        return ingest.finish()
+
+    def _index_passage(self, context_id: int, start: int, end: int, text: str):
+        self.index.add_passage(context_id, text)
+        self.passage_starts.append(start)
+        self.passage_ends.append(end)
+
+    def _commit(self, ingest: ContextIngest, content: str) -> Dict:
+        self.documents[ingest.context_id] = content
+        self._text_bytes += len(content)
         context_entry = {
-            'content': content[:self.max_context_length],
-            'source': source,
+            'id': ingest.context_id,
+            'source': ingest.source,
             'timestamp': datetime.now(),
-            'metadata': metadata or {},
-            'word_count': len(content.split())
+            'metadata': ingest.metadata,
+            'size': len(content),
+            'word_count': ingest.word_count if ingest.word_count is not None else len(content.split()),
+            'passage_count': len(self.index.document_passages.get(ingest.context_id, ()))
         }
-        
+
         self.contexts.append(context_entry)
-        logger.info(f"Added context from {source}: {len(content)} chars")
-        
+        self._notify('added', context_entry)
+        logger.info(
+            f"Added context from {ingest.source}: {len(content)} chars, "
+            f"{context_entry['passage_count']} passages"
+        )
+        return context_entry
+
+    def passage_text(self, passage_id: int) -> str:
+        document = self.documents[self.index.passage_document[passage_id]]
+        return document[self.passage_starts[passage_id]:self.passage_ends[passage_id]]
+
     def get_relevant_context(
         self,
         query: str = "",
-        max_length: int = 500
+        max_tokens: Optional[int] = None
     ) -> str:
         """
         Get relevant context for a query.
-        Returns concatenated context up to max_length.
+        Returns the best-matching passages (BM25) that fit the token budget,
+        in document order; falls back to the most recent context when
+        nothing matches.
         """
         if not self.contexts:
             return ""
-        
-        # Simple strategy: return most recent context
-        # In production, use semantic search (embeddings) for better relevance
-        
-        result = []
-        total_length = 0
-        
-        for ctx in reversed(self.contexts):
-            content = ctx['content']
-            if total_length + len(content) <= max_length:
-                result.insert(0, content)
-                total_length += len(content)
-            else:
-                # Add partial content
-                remaining = max_length - total_length
-                if remaining > 100:  # Only add if meaningful amount
-                    result.insert(0, content[:remaining])
-                break
-        
-        return "\n\n".join(result)
-    
+        budget = max_tokens or self.token_budget
+
+        candidates = []
+        if query:
+            candidates = [
+                passage_id for passage_id, _ in self.index.search(query, self.top_k)
+                if self.index.passage_document[passage_id] in self.documents
+            ]
+
+        if not candidates:
+            # No query or no matching passage: fall back to most recent context
+            latest = self.contexts[-1]['id']
+            candidates = list(self.index.document_passages.get(latest, ()))
+
+        chosen = []
+        used = 0
+        for passage_id in candidates:
+            cost = estimate_tokens(self.passage_text(passage_id))
+            if used + cost <= budget:
+                chosen.append(passage_id)
+                used += cost
+
+        if not chosen and candidates:
+            # Best passage alone is over budget: keep its head
+            return self.passage_text(candidates[0])[:budget * 4]
+
+        return "\n\n".join(self.passage_text(passage_id) for passage_id in sorted(chosen))
+
     def search_context(self, keywords: List[str]) -> List[Dict]:
         """Search contexts by keywords"""
-        results = []
-        
-        for ctx in self.contexts:
-            content_lower = ctx['content'].lower()
-            if any(keyword.lower() in content_lower for keyword in keywords):
-                results.append(ctx)
-        
-        return results
-    
+        matching = self.index.documents_matching(keywords)
+        return [
+            {**ctx, 'content': self.documents[ctx['id']]}
+            for ctx in self.contexts if ctx['id'] in matching
+        ]
+
+    def remove_context(self, context_id: int, notify: bool = True) -> Optional[Dict]:
+        """Remove one uploaded context; returns its entry"""
+        for position, ctx in enumerate(self.contexts):
+            if ctx['id'] == context_id:
+                break
+        else:
+            return None
+
+        del self.contexts[position]
+        self._text_bytes -= len(self.documents.pop(context_id, ''))
+        self.index.remove_document(context_id)
+        if notify:
+            self._notify('removed', ctx)
+        logger.info(f"Removed context {context_id} from {ctx['source']}")
+        return ctx
+
     def clear_all(self):
         """Clear all contexts"""
         self.contexts = []
+        self.documents.clear()
+        self._text_bytes = 0
+        self.index.clear()
+        self.passage_starts = array('I')
+        self.passage_ends = array('I')
+        self._notify('cleared')
         logger.info("Cleared all contexts")
-    
+
+    def memory_estimate(self) -> int:
+        """Approximate bytes held by stored text, passage offsets and the index"""
+        offsets = (len(self.passage_starts) + len(self.passage_ends)) * self.passage_starts.itemsize
+        return self._text_bytes + offsets + self.index.memory_estimate()
+
     def get_summary(self) -> Dict:
         """Get summary of stored contexts"""
         return {
             'total_contexts': len(self.contexts),
             'total_words': sum(ctx['word_count'] for ctx in self.contexts),
+            'total_chars': sum(ctx['size'] for ctx in self.contexts),
+            'total_passages': len(self.index),
+            'vocabulary_size': len(self.index.vocabulary),
             'sources': list(set(ctx['source'] for ctx in self.contexts))
         }
-    
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-    
\ No newline at end of file
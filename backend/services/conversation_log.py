@@ -0,0 +1,234 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import logging
+import os
+import sqlite3
+import time
+
+logger = logging.getLogger(__name__)
+
+KIND_EXCHANGE = 'exchange'
+KIND_CLEAR = 'clear'  # marks where a client's history was cleared
+
+_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS log (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        client_id TEXT NOT NULL,
+        ts REAL NOT NULL,
+        kind TEXT NOT NULL,
+        question TEXT,
+        answer TEXT
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS log_client_kind_id ON log (client_id, kind, id)",
+    "CREATE INDEX IF NOT EXISTS log_client_ts ON log (client_id, ts)",
+)
+
+# Rows after the client's latest clear marker
+_VISIBLE = (
+    "client_id = ? AND kind = 'exchange' AND id > COALESCE("
+    "(SELECT MAX(id) FROM log WHERE client_id = ? AND kind = 'clear'), 0)"
+)
+
+
+class InvalidCursor(ValueError):
+    """Raised for a history cursor this log did not issue."""
+
+
+class ConversationLog:
+    """
+    Append-only conversation log in SQLite (WAL mode), indexed by client
+    and time. Rows are never updated or deleted: clearing a client's
+    history appends a marker, and reads only return exchanges after the
+    latest one.
+    append() only queues the row; a background task writes queued rows in
+    one transaction every flush_interval_ms (or as soon as batch_size are
+    waiting), on a dedicated writer thread. Reads use their own connection
+    and thread, which WAL lets run alongside the writer. Readers first wait
+    for rows queued before them, so a page always includes earlier appends.
+    """
+
+    def __init__(self, path: str, batch_size: int = 100, flush_interval_ms: float = 50):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self._pending: List[Tuple] = []
+        self._full = asyncio.Event()
+        self._last_flush: Optional[asyncio.Future] = None
+        self._writer_task: Optional[asyncio.Task] = None
+        # One thread (and connection) each, since sqlite3 connections aren't shared
+        self._write_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='conversation-log-write')
+        self._read_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='conversation-log-read')
+        self._write_db: Optional[sqlite3.Connection] = None
+        self._read_db: Optional[sqlite3.Connection] = None
+
+        # Metrics
+        self.appended = 0
+        self.written = 0
+        self.batches = 0
+        self.write_errors = 0
+        self.write_seconds = 0.0
+
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self.path, timeout=5.0)
+        db.execute("PRAGMA journal_mode=WAL")
+        # WAL + NORMAL: a power cut can lose the last commits, never corrupt the file
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    def _open_writer(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._write_db = self._connect()
+        with self._write_db:
+            for statement in _SCHEMA:
+                self._write_db.execute(statement)
+
+    def _open_reader(self):
+        self._read_db = self._connect()
+        self._read_db.row_factory = sqlite3.Row
+
+    async def open(self):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._write_executor, self._open_writer)
+        await loop.run_in_executor(self._read_executor, self._open_reader)
+        self._writer_task = asyncio.create_task(self._run_writer())
+        logger.info(f"Conversation log at {self.path}")
+
+    async def close(self):
+        if self._writer_task is not None:
+            self._writer_task.cancel()
+            await asyncio.gather(self._writer_task, return_exceptions=True)
+            self._writer_task = None
+        await self.flush()
+        loop = asyncio.get_running_loop()
+        for executor, db in ((self._write_executor, self._write_db), (self._read_executor, self._read_db)):
+            if db is not None:
+                await loop.run_in_executor(executor, db.close)
+            executor.shutdown(wait=False)
+        self._write_db = self._read_db = None
+
+    # Writes
+
+    def append(self, client_id: str, question: str, answer: str, timestamp: Optional[float] = None):
+        """Queue one exchange (returns immediately)"""
+        self._queue((client_id, timestamp or time.time(), KIND_EXCHANGE, question, answer))
+
+    def append_clear(self, client_id: str, timestamp: Optional[float] = None):
+        """Queue a marker hiding every earlier exchange of this client"""
+        self._queue((client_id, timestamp or time.time(), KIND_CLEAR, None, None))
+
+    def _queue(self, row: Tuple):
+        self._pending.append(row)
+        self.appended += 1
+        if len(self._pending) >= self.batch_size:
+            self._full.set()
+
+    async def _run_writer(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._full.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._full.clear()
+            await self.flush()
+
+    async def flush(self):
+        """Write everything queued so far and wait until it is committed"""
+        if self._pending and self._write_db is not None:
+            batch, self._pending = self._pending, []
+            self._last_flush = asyncio.get_running_loop().run_in_executor(
+                self._write_executor, self._write_batch, batch
+            )
+        # Batches run in order on one thread, so the latest finishing means all have
+        if self._last_flush is not None:
+            await asyncio.shield(self._last_flush)
+
+    def _write_batch(self, batch: List[Tuple]):
+        start = time.perf_counter()
+        try:
+            with self._write_db:
+                self._write_db.executemany(
+                    "INSERT INTO log (client_id, ts, kind, question, answer) VALUES (?, ?, ?, ?, ?)",
+                    batch
+                )
+        except sqlite3.Error as e:
+            self.write_errors += 1
+            logger.error(f"Conversation log write of {len(batch)} rows failed: {e}")
+            return
+        self.written += len(batch)
+        self.batches += 1
+        self.write_seconds += time.perf_counter() - start
+
+    # Reads
+
+    async def page(
+        self,
+        client_id: str,
+        cursor: Optional[str] = None,
+        limit: int = 50,
+        since: Optional[float] = None,
+        until: Optional[float] = None
+    ) -> Dict:
+        """
+        One page of a client's exchanges, oldest first within the page.
+        The first page holds the newest exchanges; pass next_cursor back
+        to get the ones before them (None once there are no more).
+        since/until bound the exchange timestamps (epoch seconds).
+        """
+        try:
+            before = int(cursor) if cursor else None
+        except ValueError:
+            raise InvalidCursor(f"Invalid history cursor: {cursor}")
+        await self.flush()
+        return await asyncio.get_running_loop().run_in_executor(
+            self._read_executor, self._read_page, client_id, before, limit, since, until
+        )
+
+    def _read_page(self, client_id, before, limit, since, until) -> Dict:
+        query = f"SELECT id, ts, question, answer FROM log WHERE {_VISIBLE}"
+        params: list = [client_id, client_id]
+        for clause, value in (("id < ?", before), ("ts >= ?", since), ("ts < ?", until)):
+            if value is not None:
+                query += f" AND {clause}"
+                params.append(value)
+        # One extra row tells us whether there is another page
+        rows = self._read_db.execute(query + " ORDER BY id DESC LIMIT ?", params + [limit + 1]).fetchall()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        rows.reverse()
+        return {
+            'items': [
+                {'id': row['id'], 'question': row['question'], 'answer': row['answer'], 'timestamp': row['ts']}
+                for row in rows
+            ],
+            'next_cursor': str(rows[0]['id']) if has_more else None
+        }
+
+    async def recent(self, client_id: str, limit: int) -> List[Dict]:
+        """The client's newest exchanges in session-history form, oldest first"""
+        page = await self.page(client_id, limit=limit)
+        return [
+            {'question': item['question'], 'answer': item['answer'], 'timestamp': item['timestamp']}
+            for item in page['items']
+        ]
+
+    def get_stats(self) -> Dict:
+        try:
+            size = os.path.getsize(self.path) + os.path.getsize(self.path + '-wal')
+        except OSError:
+            size = 0
+        return {
+            'path': self.path,
+            'appended': self.appended,
+            'written': self.written,
+            'pending': len(self._pending),
+            'batches': self.batches,
+            'avg_batch_rows': round(self.written / self.batches, 1) if self.batches else 0.0,
+            'avg_batch_write_ms': round(self.write_seconds / self.batches * 1000, 2) if self.batches else 0.0,
+            'write_errors': self.write_errors,
+            'size_bytes': size
+        }
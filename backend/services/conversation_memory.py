@@ -0,0 +1,93 @@
+from typing import Dict, List
+import asyncio
+import logging
+import time
+
+from .openai_service import OpenAIService
+from .session_manager import Session
+
+logger = logging.getLogger(__name__)
+
+
+class ConversationMemory:
+    """
+    Keeps each session's prompt memory a constant size: the last
+    recent_turns exchanges go into prompts verbatim (see
+    OpenAIService.recent_turns) and everything older is folded into a
+    rolling summary of at most max_words, stored on the session.
+    The summary is updated in the background after an answer has been
+    sent, never on the answer path; one update runs per session at a
+    time and picks up whatever fell out of the verbatim window meanwhile.
+    A failed update leaves the old summary, and the turns it missed are
+    folded in with the next one.
+    """
+
+    def __init__(
+        self,
+        openai_service: OpenAIService,
+        max_words: int = 60,
+        min_turns: int = 1,
+        timeout: float = 10.0
+    ):
+        self.openai_service = openai_service
+        self.max_words = max_words
+        self.min_turns = min_turns
+        self.timeout = timeout
+        self._running: Dict[str, asyncio.Task] = {}
+
+        # Metrics
+        self.updates = 0
+        self.turns_folded = 0
+        self.failures = 0
+        self.update_seconds = 0.0
+
+    def pending(self, session: Session) -> List[Dict]:
+        """Exchanges older than the verbatim window that the summary doesn't cover yet"""
+        recent_turns = self.openai_service.recent_turns
+        older = session.history[:max(len(session.history) - recent_turns, 0)]
+        return [entry for entry in older if entry['timestamp'] > session.summary_through]
+
+    def schedule(self, session: Session):
+        """Fold older exchanges into the session's summary in the background"""
+        if session.client_id in self._running or len(self.pending(session)) < self.min_turns:
+            return
+        self._running[session.client_id] = asyncio.create_task(self._run(session))
+
+    async def _run(self, session: Session):
+        try:
+            while len(turns := self.pending(session)) >= self.min_turns:
+                previous = session.summary
+                start = time.perf_counter()
+                try:
+                    summary = await self.openai_service.summarize(previous, turns, self.max_words, self.timeout)
+                except Exception as e:
+                    self.failures += 1
+                    logger.warning(f"Summary update for {session.client_id} failed: {e}")
+                    return
+                self.update_seconds += time.perf_counter() - start
+                # History cleared (or reloaded) while we waited: drop this update
+                if session.summary != previous or not any(entry is turns[-1] for entry in session.history):
+                    return
+                session.summary = summary
+                session.summary_through = turns[-1]['timestamp']
+                self.updates += 1
+                self.turns_folded += len(turns)
+        finally:
+            self._running.pop(session.client_id, None)
+
+    async def close(self):
+        tasks = list(self._running.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def get_stats(self) -> Dict:
+        return {
+            'recent_turns': self.openai_service.recent_turns,
+            'max_words': self.max_words,
+            'updates': self.updates,
+            'turns_folded': self.turns_folded,
+            'failures': self.failures,
+            'running': len(self._running),
+            'avg_update_ms': round(self.update_seconds / self.updates * 1000, 1) if self.updates else 0.0
+        }
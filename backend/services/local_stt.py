@@ -0,0 +1,317 @@
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Sequence, Tuple
+import json
+import logging
+import math
+import threading
+import time
+
+import numpy as np
+
+from ..utils.audio_processor import resample
+from .stt_engines import STTEngine
+
+logger = logging.getLogger(__name__)
+
+# (pcm_data, sample_rate, final)
+STTRequest = Tuple[bytes, int, bool]
+STTResult = Tuple[Optional[str], float]
+
+MODEL_SAMPLE_RATE = 16000
+
+
+def pcm_to_float(pcm_data: bytes, sample_rate: int, target_rate: int = MODEL_SAMPLE_RATE) -> np.ndarray:
+    """16-bit PCM to float32 in [-1, 1] at target_rate (linear resampling)"""
+    samples = np.frombuffer(pcm_data, dtype='<i2').astype(np.float32) / 32768.0
+    return resample(samples, sample_rate, target_rate)
+
+
+class _Pending:
+    __slots__ = ('request', 'result', 'error', 'done')
+
+    def __init__(self, request):
+        self.request = request
+        self.result = None
+        self.error: Optional[BaseException] = None
+        self.done = threading.Event()
+
+
+class MicroBatcher:
+    """
+    Groups concurrent blocking calls into batches for one model.
+    Callers (transcription pool threads) block in submit(); a single
+    batching thread waits up to window_ms after the first request for up
+    to max_batch requests, runs them through fn in one call and hands each
+    caller its result. Batches can't exceed the number of pool workers.
+    """
+
+    def __init__(
+        self,
+        fn: Callable[[List], List],
+        max_batch: int = 4,
+        window_ms: float = 10,
+        name: str = "stt-batcher"
+    ):
+        self.fn = fn
+        self.max_batch = max_batch
+        self.window = window_ms / 1000
+        self.name = name
+        self._pending: Deque[_Pending] = deque()
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+
+        # Metrics
+        self.batches = 0
+        self.requests = 0
+        self.max_batch_seen = 0
+
+    def submit(self, request):
+        pending = _Pending(request)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError(f"{self.name} is closed")
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+            self._pending.append(pending)
+            self._cond.notify()
+
+        pending.done.wait()
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def _next_batch(self) -> List[_Pending]:
+        with self._cond:
+            while not self._pending and not self._closed:
+                self._cond.wait()
+            if not self._pending:
+                return []
+
+            # Give other in-flight requests a moment to join the batch
+            deadline = time.monotonic() + self.window
+            while len(self._pending) < self.max_batch and not self._closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            size = min(self.max_batch, len(self._pending))
+            return [self._pending.popleft() for _ in range(size)]
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                return
+            self.batches += 1
+            self.requests += len(batch)
+            self.max_batch_seen = max(self.max_batch_seen, len(batch))
+            try:
+                results = self.fn([pending.request for pending in batch])
+            except Exception as e:
+                for pending in batch:
+                    pending.error = e
+            else:
+                for pending, result in zip(batch, results):
+                    pending.result = result
+            finally:
+                for pending in batch:
+                    pending.done.set()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def get_stats(self) -> Dict:
+        return {
+            'batches': self.batches,
+            'requests': self.requests,
+            'avg_batch': round(self.requests / self.batches, 2) if self.batches else 0.0,
+            'max_batch': self.max_batch_seen
+        }
+
+
+class LocalSTTEngine(STTEngine):
+    """
+    Base for on-device engines: the model is loaded once (load()) and
+    shared by every connection, warmed up at startup, and concurrent
+    utterances are recognized together when batch_size > 1.
+    Subclasses implement _load() and transcribe_batch().
+    """
+
+    def __init__(self, batch_size: int = 4, batch_window_ms: float = 10):
+        self.batch_size = batch_size
+        self._batcher = (
+            MicroBatcher(self.transcribe_batch, batch_size, batch_window_ms, name=f"{self.name}-batcher")
+            if batch_size > 1 else None
+        )
+        self._load_lock = threading.Lock()
+        self.model = None
+        self.load_seconds = 0.0
+        self.calls = 0
+        self.audio_seconds = 0.0
+        self.busy_seconds = 0.0
+
+    def _load(self):
+        raise NotImplementedError
+
+    def transcribe_batch(self, requests: Sequence[STTRequest]) -> List[STTResult]:
+        raise NotImplementedError
+
+    def load(self):
+        """Load the model once; safe to call from several threads"""
+        with self._load_lock:
+            if self.model is not None:
+                return
+            start = time.perf_counter()
+            self.model = self._load()
+            self.load_seconds = time.perf_counter() - start
+            logger.info(f"Loaded {self.name} STT model in {self.load_seconds:.2f}s")
+
+    def warmup(self):
+        """Load the model and run one inference so the first utterance isn't slow"""
+        self.load()
+        start = time.perf_counter()
+        silence = bytes(2 * MODEL_SAMPLE_RATE)
+        self.transcribe_batch([(silence, MODEL_SAMPLE_RATE, True)])
+        logger.info(f"{self.name} STT warm-up took {time.perf_counter() - start:.2f}s")
+
+    def transcribe(self, pcm_data: bytes, sample_rate: int, final: bool = False):
+        if not pcm_data:
+            return None, 0.0
+        self.load()
+        start = time.perf_counter()
+        request = (pcm_data, sample_rate, final)
+        if self._batcher is not None:
+            result = self._batcher.submit(request)
+        else:
+            result = self.transcribe_batch([request])[0]
+        self.calls += 1
+        self.audio_seconds += len(pcm_data) / (2 * sample_rate)
+        self.busy_seconds += time.perf_counter() - start
+        return result
+
+    def close(self):
+        if self._batcher is not None:
+            self._batcher.close()
+
+    def get_stats(self) -> Dict:
+        stats = {
+            **super().get_stats(),
+            'loaded': self.model is not None,
+            'load_seconds': round(self.load_seconds, 3),
+            'calls': self.calls,
+            'audio_seconds': round(self.audio_seconds, 2),
+            # < 1 means faster than real time (per call, including batching waits)
+            'real_time_factor': round(self.busy_seconds / self.audio_seconds, 3) if self.audio_seconds else 0.0
+        }
+        if self._batcher is not None:
+            stats['batching'] = self._batcher.get_stats()
+        return stats
+
+
+class WhisperSTTEngine(LocalSTTEngine):
+    """
+    OpenAI Whisper on CPU (`pip install openai-whisper`).
+    Concurrent utterances are padded to 30s log-mel windows and decoded as
+    one batch; longer utterances are truncated. Re-decodes the whole
+    utterance per call, so partials are requested less often.
+    """
+
+    name = "whisper"
+    min_partial_interval_ms = 800
+
+    def __init__(
+        self,
+        model_name: str = "base.en",
+        language: Optional[str] = "en",
+        batch_size: int = 4,
+        batch_window_ms: float = 10,
+        no_speech_threshold: float = 0.6
+    ):
+        super().__init__(batch_size, batch_window_ms)
+        self.model_name = model_name
+        self.language = language
+        self.no_speech_threshold = no_speech_threshold
+        self._options = None
+
+    def _load(self):
+        try:
+            import whisper
+        except ImportError:
+            raise RuntimeError("STT engine 'whisper' requires the openai-whisper package")
+
+        model = whisper.load_model(self.model_name, device="cpu")
+        self._whisper = whisper
+        self._options = whisper.DecodingOptions(
+            language=self.language,
+            fp16=False,
+            without_timestamps=True
+        )
+        return model
+
+    def transcribe_batch(self, requests: Sequence[STTRequest]) -> List[STTResult]:
+        whisper = self._whisper
+        mels = whisper.torch.stack([
+            whisper.log_mel_spectrogram(
+                whisper.pad_or_trim(pcm_to_float(pcm, rate)),
+                n_mels=self.model.dims.n_mels
+            )
+            for pcm, rate, _ in requests
+        ])
+        decoded = whisper.decode(self.model, mels, self._options)
+
+        results = []
+        for (_, _, final), result in zip(requests, decoded):
+            text = result.text.strip()
+            if not text or result.no_speech_prob > self.no_speech_threshold:
+                results.append((None, 0.0))
+                continue
+            confidence = min(1.0, math.exp(result.avg_logprob))
+            results.append((text, confidence if final else confidence * 0.8))
+        return results
+
+
+class VoskSTTEngine(LocalSTTEngine):
+    """
+    Vosk/Kaldi on CPU (`pip install vosk`, plus a model directory).
+    The model is shared; each utterance gets a cheap recognizer. Kaldi
+    decoding is sequential per stream and releases the GIL, so utterances
+    run in parallel on the transcription pool instead of being batched.
+    """
+
+    name = "vosk"
+    min_partial_interval_ms = 200
+
+    def __init__(self, model_path: str, batch_size: int = 1, batch_window_ms: float = 10):
+        super().__init__(batch_size, batch_window_ms)
+        self.model_path = model_path
+
+    def _load(self):
+        try:
+            import vosk
+        except ImportError:
+            raise RuntimeError("STT engine 'vosk' requires the vosk package")
+
+        vosk.SetLogLevel(-1)
+        self._vosk = vosk
+        return vosk.Model(self.model_path)
+
+    def transcribe_batch(self, requests: Sequence[STTRequest]) -> List[STTResult]:
+        return [self._recognize(pcm, rate, final) for pcm, rate, final in requests]
+
+    def _recognize(self, pcm_data: bytes, sample_rate: int, final: bool) -> STTResult:
+        recognizer = self._vosk.KaldiRecognizer(self.model, sample_rate)
+        recognizer.SetWords(True)
+        recognizer.AcceptWaveform(pcm_data)
+        result = json.loads(recognizer.FinalResult())
+
+        text = result.get('text', '').strip()
+        if not text:
+            return None, 0.0
+        words = result.get('result') or []
+        confidence = sum(word['conf'] for word in words) / len(words) if words else 0.85
+        return text, confidence if final else confidence * 0.8
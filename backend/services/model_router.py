@@ -0,0 +1,274 @@
+import asyncio
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Optional, Sequence, Tuple, TypeVar
+import logging
+import re
+import time
+
+from .resilience import RetryBudget
+from .tracing import LatencyHistogram
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+
+class ModelTier:
+    """One model in the routing ladder, with its recent latencies"""
+
+    def __init__(self, index: int, model: str, window: int = 50):
+        self.index = index
+        self.model = model
+        self.recent: Deque[float] = deque(maxlen=window)
+        self.histogram = LatencyHistogram()
+        self.skipped = 0
+        self.requests = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def record(self, seconds: float):
+        self.recent.append(seconds)
+        self.histogram.record(seconds)
+
+    def recent_percentile(self, p: float) -> float:
+        if not self.recent:
+            return 0.0
+        ordered = sorted(self.recent)
+        return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+    def get_stats(self) -> Dict:
+        return {
+            'model': self.model,
+            'requests': self.requests,
+            'timeouts': self.timeouts,
+            'errors': self.errors,
+            'hedges': self.hedges,
+            'hedge_wins': self.hedge_wins,
+            'recent_p50_ms': round(self.recent_percentile(0.50) * 1000, 1),
+            'recent_p95_ms': round(self.recent_percentile(0.95) * 1000, 1),
+            'latency': self.histogram.summary()
+        }
+
+
+class ModelRouter:
+    """
+    Picks a model tier per question.
+    Tiers are ordered fastest first. A question starts on tier 0 and moves
+    up one tier for each escalation signal: an open-ended question type
+    (or reasoning keyword) and a large prompt. An escalated tier whose
+    recent p95 would miss its budget is skipped for a faster one (every
+    probe_every'th request still goes through, so it can recover), and a
+    call that misses its budget is cancelled and retried on tier 0 within
+    what is left of the deadline. Latency is time to the first token when
+    streaming, else time to the whole completion.
+
+    A call still pending after its tier's recent hedge_percentile latency
+    is hedged: the same request is sent again and whichever answers first
+    wins, the other is cancelled. Hedges and fallbacks both spend from a
+    retry budget, so they stop when the provider is slow across the board.
+    """
+
+    def __init__(
+        self,
+        models: Sequence[str],
+        deadline: float = 5.0,
+        escalate_types: Sequence[str] = ('opinion_q', 'request_phrase_q'),
+        escalate_keywords: Sequence[str] = ('why', 'how', 'explain', 'compare', 'difference'),
+        escalate_prompt_tokens: int = 400,
+        escalated_budget: float = 0.6,
+        window: int = 50,
+        min_samples: int = 5,
+        probe_every: int = 10,
+        hedge_percentile: Optional[float] = 0.9,
+        retry_budget: Optional[RetryBudget] = None,
+        min_fallback_budget: float = 0.25
+    ):
+        if not models:
+            raise ValueError("ModelRouter needs at least one model")
+        self.tiers = [ModelTier(i, model, window) for i, model in enumerate(models)]
+        self.deadline = deadline
+        self.escalate_types = frozenset(escalate_types)
+        self._keywords = re.compile(
+            r'\b(?:' + '|'.join(re.escape(word) for word in escalate_keywords) + r')\b'
+        ) if escalate_keywords else None
+        self.escalate_prompt_tokens = escalate_prompt_tokens
+        self.escalated_budget = escalated_budget
+        self.min_samples = min_samples
+        self.probe_every = probe_every
+        self.hedge_percentile = hedge_percentile
+        self.retry_budget = retry_budget or RetryBudget()
+        # Less time than this left: a fallback couldn't produce anything, don't start one
+        self.min_fallback_budget = min_fallback_budget
+
+        # Metrics
+        self.routed: Dict[str, int] = {}
+        self.fallbacks = 0
+        self.retries = 0
+        self.demotions = 0
+
+    @property
+    def fast(self) -> ModelTier:
+        return self.tiers[0]
+
+    def budget(self, tier: ModelTier, deadline: Optional[float] = None) -> float:
+        """Seconds a tier gets before the router gives up on it"""
+        deadline = self.deadline if deadline is None else deadline
+        return deadline if tier.index == 0 else deadline * self.escalated_budget
+    
+    def hedge_delay(self, tier: ModelTier) -> Optional[float]:
+        """Seconds to wait before hedging a call on tier (None: don't hedge)"""
+        if self.hedge_percentile is None or len(tier.recent) < self.min_samples:
+            return None
+        return tier.recent_percentile(self.hedge_percentile)
+
+    def choose(
+        self,
+        question: str,
+        question_type: Optional[str] = None,
+        prompt_tokens: int = 0
+    ) -> Tuple[ModelTier, str]:
+        """Returns (tier, reason)"""
+        reasons = []
+        if question_type in self.escalate_types or (
+            self._keywords is not None and self._keywords.search(question.lower())
+        ):
+            reasons.append('question_type')
+        if prompt_tokens >= self.escalate_prompt_tokens:
+            reasons.append('context_size')
+
+        index = min(len(reasons), len(self.tiers) - 1)
+        reason = '+'.join(reasons) if index else 'default'
+
+        # Latency feedback: step down while the tier is missing its budget
+        while index > 0:
+            tier = self.tiers[index]
+            if len(tier.recent) < self.min_samples or tier.recent_percentile(0.95) < self.budget(tier):
+                break
+            tier.skipped += 1
+            if tier.skipped >= self.probe_every:
+                tier.skipped = 0
+                reason = 'probe'
+                break
+            index -= 1
+            self.demotions += 1
+            reason = 'slow_p95'
+
+        self.routed[reason] = self.routed.get(reason, 0) + 1
+        return self.tiers[index], reason
+
+    async def run(
+        self,
+        tier: ModelTier,
+        call: Callable[[str], Awaitable[T]],
+        deadline: Optional[float] = None,
+        discard: Optional[Callable[[T], Awaitable[None]]] = None
+    ) -> T:
+        """
+        Run call(model) on a tier under its budget, falling back to tier 0
+        on a miss (or retrying tier 0 once after an error), within what is
+        left of the deadline and as far as the retry budget allows; with
+        less than min_fallback_budget left, the miss is raised instead. deadline overrides the
+        router's own (e.g. what is left of the request's budget);
+        discard(result) releases the result of a hedge that lost the race.
+        Raises asyncio.TimeoutError if tier 0 misses the deadline.
+        """
+        deadline = self.deadline if deadline is None else deadline
+        start = time.perf_counter()
+        self.retry_budget.deposit()
+        try:
+            return await self._attempt(tier, call, self.budget(tier, deadline), discard)
+        except Exception as e:
+            remaining = deadline - (time.perf_counter() - start)
+            if tier.index == 0 and isinstance(e, asyncio.TimeoutError):
+                raise
+            if remaining < self.min_fallback_budget or not self.retry_budget.spend():
+                raise
+            if tier.index == 0:
+                self.retries += 1
+            else:
+                self.fallbacks += 1
+            logger.warning(
+                f"{tier.model} {'missed its deadline' if isinstance(e, asyncio.TimeoutError) else f'failed: {e}'}, "
+                f"{'retrying' if tier.index == 0 else 'falling back to'} {self.fast.model} ({remaining:.2f}s left)"
+            )
+            return await self._attempt(self.fast, call, remaining, discard)
+
+    async def _attempt(
+        self,
+        tier: ModelTier,
+        call: Callable[[str], Awaitable[T]],
+        budget: float,
+        discard: Optional[Callable[[T], Awaitable[None]]] = None
+    ) -> T:
+        tier.requests += 1
+        start = time.perf_counter()
+        delay = self.hedge_delay(tier)
+        try:
+            if delay is None or delay >= budget:
+                result = await asyncio.wait_for(call(tier.model), budget)
+            else:
+                result = await asyncio.wait_for(self._hedged(tier, call, delay, discard), budget)
+        except asyncio.TimeoutError:
+            tier.timeouts += 1
+            # A timeout counts as the whole budget, which always reads as a miss
+            tier.record(budget)
+            raise
+        except Exception:
+            tier.errors += 1
+            raise
+        tier.record(time.perf_counter() - start)
+        return result
+
+    async def _hedged(
+        self,
+        tier: ModelTier,
+        call: Callable[[str], Awaitable[T]],
+        delay: float,
+        discard: Optional[Callable[[T], Awaitable[None]]]
+    ) -> T:
+        """The first successful result of call(model) and, after delay, a second copy of it"""
+        tasks = [asyncio.ensure_future(call(tier.model))]
+        winner = None
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done and self.retry_budget.spend():
+                tier.hedges += 1
+                tasks.append(asyncio.ensure_future(call(tier.model)))
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        winner = task
+                        break
+                if winner is not None:
+                    break
+            if winner is None:
+                # Every copy failed: report the first one's error
+                return tasks[0].result()
+            if winner is not tasks[0]:
+                tier.hedge_wins += 1
+            return winner.result()
+        finally:
+            for task in tasks:
+                if task is winner:
+                    continue
+                if not task.done():
+                    task.cancel()
+                elif discard is not None and not task.cancelled() and task.exception() is None:
+                    asyncio.ensure_future(discard(task.result()))
+
+    def get_stats(self) -> Dict:
+        return {
+            'deadline_s': self.deadline,
+            'escalated_budget_s': round(self.deadline * self.escalated_budget, 3),
+            'routed': dict(self.routed),
+            'fallbacks': self.fallbacks,
+            'retries': self.retries,
+            'demotions': self.demotions,
+            'hedge_percentile': self.hedge_percentile,
+            'retry_budget': self.retry_budget.get_stats(),
+            'tiers': [tier.get_stats() for tier in self.tiers]
+        }
@@ -1,59 +1,262 @@
 import asyncio
-from openai import AsyncOpenAI
-from typing import Optional
+from openai import AsyncOpenAI, AsyncStream
+import httpx
+from typing import AsyncIterator, List, Optional, Tuple
 import logging
 import time
 
+from .context_index import estimate_tokens
+from .model_router import ModelRouter, ModelTier
+from .request_coalescer import RequestCoalescer
+from .resilience import CircuitBreaker, CircuitOpenError
+from .response_cache import ResponseCache
+
 logger = logging.getLogger(__name__)
 
+FALLBACK_ANSWER = "Sorry couldn't get that"
+TRAILING_PUNCTUATION = '.,!?;:'
+
+# Identical on every request (the word limit goes in the user message), so
+# providers that cache prompt prefixes can reuse it
+SYSTEM_MESSAGE = {
+    "role": "system",
+    "content": (
+        "You're a helpful assistant whispering answers into someone's ear. "
+        "Give ONLY the direct answer, within the word limit given with the question. "
+        "No explanations, no preamble, no punctuation at the end. "
+        "Just the essential information, like you're helping a friend cheat on a quiz."
+    )
+}
+
+
+async def _stream_text(first_text: str, stream: AsyncStream) -> AsyncIterator[str]:
+    """The text already read by _open_stream, then the rest of the stream"""
+    yield first_text
+    async for chunk in stream:
+        if chunk.choices:
+            yield chunk.choices[0].delta.content or ""
+
+
+class ResponseLimiter:
+    """
+    Applies the word limit and trailing-punctuation rule to a streamed answer.
+    feed() returns only text that can no longer change: trailing punctuation
+    is held back until more words follow, and the stream is marked done as
+    soon as max_words complete words have arrived.
+    """
+    
+    def __init__(self, max_words: int):
+        self.max_words = max_words
+        self.done = False
+        self._raw = ""
+        self._emitted = ""
+    
+    @property
+    def text(self) -> str:
+        return self._emitted
+    
+    def _emit(self, target: str) -> str:
+        if not target.startswith(self._emitted):
+            return ""
+        delta = target[len(self._emitted):]
+        self._emitted = target
+        return delta
+    
+    def feed(self, delta: str) -> str:
+        if self.done or not delta:
+            return ""
+        
+        self._raw += delta
+        words = self._raw.split()
+        complete = words if self._raw[-1].isspace() else words[:-1]
+        
+        if len(complete) >= self.max_words:
+            self.done = True
+            return self._emit(' '.join(complete[:self.max_words]).rstrip(TRAILING_PUNCTUATION))
+        
+        return self._emit(' '.join(words).rstrip(TRAILING_PUNCTUATION))
+    
+    def finish(self) -> str:
+        """Flush whatever is left once the upstream stream ends"""
+        if self.done:
+            return ""
+        self.done = True
+        words = self._raw.split()[:self.max_words]
+        return self._emit(' '.join(words).rstrip(TRAILING_PUNCTUATION))
+
+
 class OpenAIService:
     """
     Generates ultra-short AI responses for passive earbud assistance.
     Optimized for brevity and natural speech.
     """
     
-    def __init__(self, api_key: str):
-        self.client = AsyncOpenAI(api_key=api_key)
+    def __init__(
+        self,
+        api_key: str,
+        base_url: Optional[str] = None,
+        cache: Optional[ResponseCache] = None,
+        http_client: Optional[httpx.AsyncClient] = None,
+        router: Optional[ModelRouter] = None,
+        recent_turns: int = 5,
+        prompt_cache_key: Optional[str] = None,
+        coalescer: Optional[RequestCoalescer] = None,
+        breaker: Optional[CircuitBreaker] = None
+    ):
+        # No SDK retries: the router retries within the deadline and the retry budget
+        self.client = AsyncOpenAI(api_key=api_key, base_url=base_url, http_client=http_client, max_retries=0)
+        self.cache = cache
+        self.router = router or ModelRouter(["gpt-4"])
+        # Concurrent identical requests share one upstream call
+        self.coalescer = coalescer or RequestCoalescer()
+        # Fails fast (with a degraded answer) while the provider keeps failing
+        self.breaker = breaker or CircuitBreaker('openai')
+        self.degraded = 0
+        # Sent with answer requests so the provider routes them to the same prompt cache
+        self._answer_options = {'prompt_cache_key': prompt_cache_key} if prompt_cache_key else {}
+        # Exchanges quoted verbatim in contextual prompts (older ones only via the summary)
+        self.recent_turns = recent_turns
         self.conversation_context = []
+    
+    async def warmup(self, timeout: float = 3.0):
+        """
+        Open a pooled connection (DNS, TCP, TLS) ahead of the first question.
+        Any HTTP response will do; failures are only logged.
+        """
+        start_time = time.time()
+        try:
+            await asyncio.wait_for(self.client.with_options(max_retries=0).models.list(), timeout)
+        except Exception as e:
+            logger.debug(f"OpenAI warmup request failed: {e}")
+        logger.info(f"OpenAI connection warmed in {time.time() - start_time:.2f}s")
+    
+    async def close(self):
+        await self.client.close()
+    
+    def _cached(self, question: str, cache_context: str, max_words: int) -> Optional[str]:
+        if self.cache is None:
+            return None
+        answer = self.cache.get(question, cache_context, max_words)
+        if answer is not None:
+            logger.info(f"Cache hit for '{question}': '{answer}'")
+        return answer
+    
+    def _degraded(self, question: str, cache_context: str, max_words: int, error: Exception) -> str:
+        """The answer to give when the upstream failed: a stale cached one if there is one"""
+        if isinstance(error, CircuitOpenError):
+            logger.warning(f"Skipping OpenAI for '{question}': {error}")
+        else:
+            logger.error(f"OpenAI API error: {error!r}")
+        self.degraded += 1
+        stale = self.cache.get_stale(question, cache_context, max_words) if self.cache is not None else None
+        return stale or FALLBACK_ANSWER
+    
+    def _store(self, question: str, cache_context: str, answer: str, max_words: int):
+        if self.cache is not None and answer and answer != FALLBACK_ANSWER:
+            self.cache.put(question, cache_context, answer, max_words)
+    
+    def _build_messages(self, question: str, context: str, max_words: int) -> List[dict]:
+        # Stable parts first: the fixed system prompt, then context, then the question
+        user_prompt = f"{question}\n\nAnswer in {max_words} words or less."
+        if context:
+            user_prompt = f"Context: {context}\n\nQuestion: {user_prompt}"
         
+        return [SYSTEM_MESSAGE, {"role": "user", "content": user_prompt}]
+    
+    @staticmethod
+    def _request_key(messages: List[dict], max_words: int, question_type: Optional[str]) -> Tuple:
+        return (question_type, max_words, *(message['content'] for message in messages))
+    
+    def _route(self, question: str, question_type: Optional[str], messages: List[dict]) -> ModelTier:
+        prompt_tokens = estimate_tokens(''.join(message['content'] for message in messages))
+        tier, reason = self.router.choose(question, question_type, prompt_tokens)
+        logger.debug(f"Routing '{question}' to {tier.model} ({reason}, ~{prompt_tokens} prompt tokens)")
+        return tier
+    
+    async def _open_stream(self, model: str, messages: List[dict]) -> Tuple[AsyncStream, str]:
+        """
+        Start a streamed completion and read up to its first text delta, so
+        the router's budget covers time to first token. Returns the open
+        stream and that first text ("" if the stream ended without any).
+        """
+        stream = await self.client.chat.completions.create(
+            model=model,
+            messages=messages,
+            max_tokens=30,
+            temperature=0.3,
+            presence_penalty=0.0,
+            frequency_penalty=0.0,
+            stream=True,
+            **self._answer_options
+        )
+        try:
+            # anext() rather than async for: abandoning the stream's own
+            # iterator would close the response once it is collected
+            while (chunk := await anext(stream, None)) is not None:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    return stream, chunk.choices[0].delta.content
+        except BaseException:
+            # Timed out or cancelled by the router: drop the connection
+            await stream.close()
+            raise
+        await stream.close()
+        return stream, ""
+    
     async def generate_short_response(
         self,
         question: str,
         context: str = "",
-        max_words: int = 15
+        max_words: int = 15,
+        cache_context: Optional[str] = None,
+        question_type: Optional[str] = None,
+        deadline: Optional[float] = None
     ) -> str:
         """
         Generate an extremely short, natural response.
         Perfect for whispered earbud delivery.
+        cache_context keys the answer cache (defaults to context);
+        question_type (from QuestionDetector) feeds model routing;
+        deadline is the seconds left for the model (default response_timeout).
+        Concurrent calls with the same prompt share one upstream request.
         """
+        cache_context = context if cache_context is None else cache_context
+        cached = self._cached(question, cache_context, max_words)
+        if cached is not None:
+            return cached
+        
+        messages = self._build_messages(question, context, max_words)
+        return await self.coalescer.call(
+            self._request_key(messages, max_words, question_type),
+            lambda: self._generate(question, messages, max_words, cache_context, question_type, deadline)
+        )
+    
+    async def _generate(
+        self,
+        question: str,
+        messages: List[dict],
+        max_words: int,
+        cache_context: str,
+        question_type: Optional[str],
+        deadline: Optional[float]
+    ) -> str:
         start_time = time.time()
+        tier = self._route(question, question_type, messages)
         
         try:
-            # Ultra-concise system prompt
-            system_prompt = (
-                f"You're a helpful assistant whispering answers into someone's ear. "
-                f"Give ONLY the direct answer in {max_words} words or less. "
-                f"No explanations, no preamble, no punctuation at the end. "
-                f"Just the essential information, like you're helping a friend cheat on a quiz."
-            )
-            
-            # Build user prompt
-            user_prompt = question
-            if context:
-                user_prompt = f"Context: {context[:200]}\n\nQuestion: {question}"
-            
-            # Call OpenAI
-            response = await self.client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                max_tokens=30,  # Very short
-                temperature=0.3,  # Low temp for consistency
-                presence_penalty=0.0,
-                frequency_penalty=0.0
-            )
+            # Call OpenAI on the routed model, falling back within the deadline
+            response = await self.breaker.call(lambda: self.router.run(
+                tier,
+                lambda model: self.client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    max_tokens=30,  # Very short
+                    temperature=0.3,  # Low temp for consistency
+                    presence_penalty=0.0,
+                    frequency_penalty=0.0,
+                    **self._answer_options
+                ),
+                deadline
+            ))
             
             answer = response.choices[0].message.content.strip()
             
@@ -72,36 +275,212 @@ class OpenAIService:
                 f"'{answer}' ({len(words)} words)"
             )
             
+            self._store(question, cache_context, answer, max_words)
             return answer
             
         except Exception as e:
-            logger.error(f"OpenAI API error: {e}")
-            return "Sorry couldn't get that"
+            return self._degraded(question, cache_context, max_words, e)
+    
+    async def stream_short_response(
+        self,
+        question: str,
+        context: str = "",
+        max_words: int = 15,
+        cache_context: Optional[str] = None,
+        question_type: Optional[str] = None,
+        deadline: Optional[float] = None
+    ) -> AsyncIterator[str]:
+        """
+        Stream the short response as text deltas.
+        The word limit and punctuation rules are applied as tokens arrive,
+        and the upstream stream is closed as soon as the limit is reached.
+        A cached answer is yielded as a single delta; a stream already in
+        flight for the same prompt is replayed and followed instead of
+        starting another.
+        """
+        cache_context = context if cache_context is None else cache_context
+        cached = self._cached(question, cache_context, max_words)
+        if cached is not None:
+            yield cached
+            return
+        
+        messages = self._build_messages(question, context, max_words)
+        async for delta in self.coalescer.stream(
+            self._request_key(messages, max_words, question_type),
+            lambda: self._stream(question, messages, max_words, cache_context, question_type, deadline)
+        ):
+            yield delta
+    
+    async def _stream(
+        self,
+        question: str,
+        messages: List[dict],
+        max_words: int,
+        cache_context: str,
+        question_type: Optional[str],
+        deadline: Optional[float]
+    ) -> AsyncIterator[str]:
+        start_time = time.time()
+        first_delta_time = None
+        limiter = ResponseLimiter(max_words)
+        tier = self._route(question, question_type, messages)
+        deadline = self.router.deadline if deadline is None else deadline
+        expires = asyncio.get_running_loop().time() + deadline
+        
+        try:
+            # The routed model must produce its first token within its budget;
+            # a hedged stream that loses is closed
+            stream, first_text = await self.breaker.call(lambda: self.router.run(
+                tier,
+                lambda model: self._open_stream(model, messages),
+                deadline,
+                discard=lambda opened: opened[0].close()
+            ))
+            
+            # The rest must arrive before the deadline too. Only the reads
+            # are timed, never the consumer between deltas.
+            texts = _stream_text(first_text, stream)
+            try:
+                while True:
+                    async with asyncio.timeout_at(expires):
+                        text = await anext(texts, None)
+                    if text is None:
+                        break
+                    delta = limiter.feed(text)
+                    if delta:
+                        if first_delta_time is None:
+                            first_delta_time = time.time()
+                        yield delta
+                    if limiter.done:
+                        break
+            except Exception:
+                # A stream that fails or stalls mid-answer counts against the circuit too
+                self.breaker.record_failure()
+                raise
+            finally:
+                await stream.close()
+            
+            delta = limiter.finish()
+            if delta:
+                if first_delta_time is None:
+                    first_delta_time = time.time()
+                yield delta
+            
+        except Exception as e:
+            answer = self._degraded(question, cache_context, max_words, e)
+            if not limiter.text:
+                yield answer
+            return
+        
+        processing_time = time.time() - start_time
+        first_delta = (first_delta_time - start_time) if first_delta_time else processing_time
+        logger.info(
+            f"Streamed response in {processing_time:.2f}s "
+            f"(first delta {first_delta:.2f}s): '{limiter.text}'"
+        )
+        self._store(question, cache_context, limiter.text, max_words)
     
     async def generate_contextual_response(
         self,
         question: str,
         conversation_history: list,
-        user_context: str = ""
+        user_context: str = "",
+        question_type: Optional[str] = None,
+        summary: str = "",
+        deadline: Optional[float] = None
     ) -> str:
         """
         Generate response with conversation history awareness.
+        summary is the rolling summary of exchanges older than the last
+        recent_turns, which are quoted verbatim. The answer cache is keyed
+        on the whole context, so a cached answer is only reused for the
+        same uploaded context, summary and recent turns.
         """
-        # Build context from recent conversation
-        recent_history = conversation_history[-5:]  # Last 5 exchanges
+        return await self.generate_short_response(
+            question,
+            context=self._build_context(conversation_history, user_context, summary),
+            max_words=15,
+            question_type=question_type,
+            deadline=deadline
+        )
+    
+    def stream_contextual_response(
+        self,
+        question: str,
+        conversation_history: list,
+        user_context: str = "",
+        question_type: Optional[str] = None,
+        summary: str = "",
+        deadline: Optional[float] = None
+    ) -> AsyncIterator[str]:
+        """Streaming variant of generate_contextual_response"""
+        return self.stream_short_response(
+            question,
+            context=self._build_context(conversation_history, user_context, summary),
+            max_words=15,
+            question_type=question_type,
+            deadline=deadline
+        )
+    
+    def estimate_prompt_tokens(
+        self,
+        question: str,
+        conversation_history: list,
+        user_context: str = "",
+        summary: str = ""
+    ) -> int:
+        """Rough prompt size of a contextual request (~4 characters per token)"""
+        context = self._build_context(conversation_history, user_context, summary)
+        messages = self._build_messages(question, context, 15)
+        return estimate_tokens(''.join(message['content'] for message in messages))
+    
+    def _build_context(self, conversation_history: list, user_context: str = "", summary: str = "") -> str:
+        # Build context from the summary and the most recent exchanges
+        recent_history = conversation_history[-self.recent_turns:] if self.recent_turns > 0 else []
         context_text = "\n".join([
             f"Q: {entry['question']}\nA: {entry['answer']}"
             for entry in recent_history
         ])
         
+        if summary:
+            context_text = f"Earlier: {summary}\n{context_text}".rstrip()
+        
         if user_context:
             context_text = f"{user_context}\n\n{context_text}"
         
-        return await self.generate_short_response(
-            question,
-            context=context_text,
-            max_words=15
-        )
+        return context_text
+    
+    async def summarize(
+        self,
+        previous: str,
+        exchanges: List[dict],
+        max_words: int = 60,
+        timeout: float = 10.0
+    ) -> str:
+        """
+        Fold exchanges into a running conversation summary of at most
+        max_words, on the fastest model tier. Raises on failure so the
+        caller can keep the previous summary.
+        """
+        transcript = "\n".join(f"Q: {entry['question']}\nA: {entry['answer']}" for entry in exchanges)
+        messages = [
+            {"role": "system", "content": (
+                f"You keep a running summary of a conversation for an assistant. "
+                f"Merge the new exchanges into the summary in {max_words} words or less. "
+                f"Keep names, numbers, decisions and open questions; drop small talk."
+            )},
+            {"role": "user", "content": f"Summary so far: {previous or '(empty)'}\n\nNew exchanges:\n{transcript}"}
+        ]
+        response = await self.breaker.call(lambda: asyncio.wait_for(self.client.chat.completions.create(
+            model=self.router.fast.model,
+            messages=messages,
+            max_tokens=max_words * 2,
+            temperature=0.0
+        ), timeout))
+        summary = (response.choices[0].message.content or "").split()
+        if not summary:
+            raise ValueError("Empty summary")
+        return ' '.join(summary[:max_words])
     
     def add_to_conversation(self, question: str, answer: str):
         """Store conversation for context awareness"""
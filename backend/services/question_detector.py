@@ -27,6 +27,29 @@ class QuestionDetector:
             'tell me', 'let me know', 'do you know', 'any idea',
             'wondering if', 'wondering about', 'do you think'
         ]
+        
+        # Words that count as a question opener at the start of a segment
+        self.question_starters = frozenset(self.question_words + self.question_auxiliaries)
+        
+        self._compile()
+    
+    def _compile(self):
+        """Build the regexes used by detect() once, up front"""
+        # Common speech connectors that start a new segment
+        self._connector_split = re.compile(r'\b(?:also|and|so|but|then|hey|hello)\b')
+        
+        # One alternation covers the later checks; the named group that
+        # matched tells which check fired
+        starters = '|'.join(self.question_auxiliaries + self.question_words)
+        pronouns = r'(?:you|i|we|it|they|he|she|this|that)'
+        phrases = '|'.join(re.escape(phrase) for phrase in self.request_phrases)
+        self._combined = re.compile(
+            rf'(?P<regex_pattern_q>\b(?:{starters})\s+{pronouns}\b)'
+            rf'|(?P<request_phrase_q>{phrases})'
+            rf'|(?P<opinion_q>you think|your opinion)'
+        )
+        
+        self._filler = re.compile(r'(?:um|uh|hmm|ah|oh|well)')
 
     def detect(self, text: str) -> Tuple[bool, float, str]:
         """
@@ -36,51 +59,36 @@ class QuestionDetector:
         if not text or len(text.strip()) < 5:
             return False, 0.0, 'none'
         
-        text_clean = text.lower().strip()
-        
         # 1. Check for explicit question mark
         if '?' in text:
             return True, 0.98, 'explicit_q'
-            
+        
+        text_clean = text.lower().strip()
+        
         # 2. Check for "Do you think", "What is", etc. at the start of any segment
-        # We split by common speech connectors
-        segments = re.split(r'\b(also|and|so|but|then|hey|hello)\b', text_clean)
+        starters = self.question_starters
+        for segment in self._connector_split.split(text_clean):
+            words = segment.split(None, 3)
+            if len(words) >= 3 and words[0] in starters:
+                return True, 0.90, 'segment_start_q'
         
-        for segment in segments:
-            seg = segment.strip()
-            if not seg: continue
-            
-            words = seg.split()
-            if not words: continue
-            
-            # Check if segment starts with a question word or auxiliary
-            if words[0] in self.question_words or words[0] in self.question_auxiliaries:
-                if len(words) >= 3:
-                    return True, 0.90, 'segment_start_q'
-                    
-        # 3. Aggressive Regex search for [Aux/Word] + [Pronoun/Subject]
-        # Example patterns: "do you", "is it", "how can", "should i"
-        pronouns = r'\b(you|i|we|it|they|he|she|this|that)\b'
-        aux_pattern = r'\b(' + '|'.join(self.question_auxiliaries + self.question_words) + r')\b'
+        # 3-5. Single scan for [Aux/Word] + [Pronoun] ("do you", "is it"),
+        # request phrases and opinion fallbacks; the pronoun pattern wins
+        found = None
+        for match in self._combined.finditer(text_clean):
+            kind = match.lastgroup
+            if kind == 'regex_pattern_q':
+                return True, 0.85, 'regex_pattern_q'
+            if kind == 'request_phrase_q' or found is None:
+                found = kind
         
-        # Pattern: [aux/word] followed immediately or shortly by a pronoun
-        match = re.search(aux_pattern + r'\s+' + pronouns, text_clean)
-        if match:
-            # Check if it's "do you", "is it" etc.
-            return True, 0.85, 'regex_pattern_q'
-            
-        # 4. Request phrases search
-        for phrase in self.request_phrases:
-            if phrase in text_clean:
-                return True, 0.80, 'request_phrase_q'
-                
-        # 5. Fallback: Check for common question starters even if not at segment start
-        # e.g., "... you think it is a good idea ..."
-        if "you think" in text_clean or "your opinion" in text_clean:
+        if found == 'request_phrase_q':
+            return True, 0.80, 'request_phrase_q'
+        if found == 'opinion_q':
             return True, 0.75, 'opinion_q'
-
+        
         return False, 0.2, 'statement'
-
+    
     def extract_question(self, text: str) -> str:
         """
         No-op for now - in continuous speech, usually better 
@@ -90,6 +98,5 @@ class QuestionDetector:
 
     def filter_context_noise(self, text: str) -> bool:
         """Filter out conversational filler."""
-        fillers = [r'^um', r'^uh', r'^hmm', r'^ah', r'^oh', r'^well']
         text_lower = text.lower().strip()
-        return any(re.match(f, text_lower) for f in fillers) and len(text_lower.split()) < 3
\ No newline at end of file
+        return self._filler.match(text_lower) is not None and len(text_lower.split()) < 3
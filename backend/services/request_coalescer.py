@@ -0,0 +1,120 @@
+from typing import AsyncIterator, Awaitable, Callable, Dict, Hashable, List, Optional, TypeVar
+import asyncio
+
+T = TypeVar('T')
+
+
+class _SharedCall:
+    """One upstream call and the number of requests waiting on it"""
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class _SharedStream:
+    """
+    One upstream stream, pumped by its own task. Deltas are buffered so a
+    request joining late replays what it missed and then follows live.
+    """
+
+    def __init__(self, source: AsyncIterator[str]):
+        self.deltas: List[str] = []
+        self.done = False
+        self.error: Optional[Exception] = None
+        self.waiters = 0
+        self._changed = asyncio.Event()
+        self.task = asyncio.create_task(self._pump(source))
+
+    async def _pump(self, source: AsyncIterator[str]):
+        try:
+            async for delta in source:
+                self.deltas.append(delta)
+                self._changed.set()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done = True
+            self._changed.set()
+
+    async def replay(self) -> AsyncIterator[str]:
+        sent = 0
+        while True:
+            if sent < len(self.deltas):
+                sent += 1
+                yield self.deltas[sent - 1]
+            elif self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            else:
+                self._changed.clear()
+                await self._changed.wait()
+
+
+class RequestCoalescer:
+    """
+    Shares one upstream call between concurrent identical requests.
+    The first request for a key starts the call; requests with the same
+    key arriving before it finishes wait on it instead of starting their
+    own, and all get the same result (or exception). A call is cancelled
+    only once every request waiting on it has gone. Finished calls are
+    forgotten immediately: this is not a cache.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, _SharedCall] = {}
+        self._streams: Dict[Hashable, _SharedStream] = {}
+
+        # Metrics
+        self.requests = 0
+        self.calls_saved = 0  # requests that joined a call already in flight
+        self.abandoned = 0
+
+    def _join(self, shared):
+        shared.waiters += 1
+        if shared.waiters > 1:
+            self.calls_saved += 1
+
+    def _leave(self, shared, table: Dict, key: Hashable):
+        shared.waiters -= 1
+        if shared.waiters == 0 and not shared.task.done():
+            # Nobody wants the answer any more
+            shared.task.cancel()
+            self.abandoned += 1
+        if shared.waiters == 0 and table.get(key) is shared:
+            del table[key]
+
+    async def call(self, key: Hashable, factory: Callable[[], Awaitable[T]]) -> T:
+        """Await factory(), or the identical call already in flight"""
+        self.requests += 1
+        shared = self._calls.get(key)
+        if shared is None or shared.task.done():
+            shared = self._calls[key] = _SharedCall(asyncio.ensure_future(factory()))
+        self._join(shared)
+        try:
+            return await asyncio.shield(shared.task)
+        finally:
+            self._leave(shared, self._calls, key)
+
+    async def stream(self, key: Hashable, factory: Callable[[], AsyncIterator[str]]) -> AsyncIterator[str]:
+        """Iterate factory(), or replay and follow the identical stream already in flight"""
+        self.requests += 1
+        shared = self._streams.get(key)
+        if shared is None or shared.done:
+            shared = self._streams[key] = _SharedStream(factory())
+        self._join(shared)
+        try:
+            async for delta in shared.replay():
+                yield delta
+        finally:
+            self._leave(shared, self._streams, key)
+
+    def get_stats(self) -> Dict:
+        return {
+            'requests': self.requests,
+            'calls_saved': self.calls_saved,
+            'coalescing_rate': round(self.calls_saved / self.requests, 3) if self.requests else 0.0,
+            'abandoned': self.abandoned,
+            'in_flight': len(self._calls) + len(self._streams)
+        }
@@ -0,0 +1,200 @@
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+
+class Deadline:
+    """
+    The time left for one request, split across its stages in order.
+    A stage may use its own share of the total plus whatever the stages
+    before it left unused; time reserved for later stages is never
+    handed out early, and the last stage gets everything that remains.
+    """
+
+    def __init__(self, budget: "StageBudget", started: Optional[float] = None):
+        self.budget = budget
+        self.started = started if started is not None else time.perf_counter()
+
+    def remaining(self) -> float:
+        return self.budget.total - (time.perf_counter() - self.started)
+
+    def stage(self, name: str, floor: float = 0.0) -> float:
+        """Seconds stage name may take from now (at least floor)"""
+        return max(self.remaining() - self.budget.reserved_after(name), floor)
+
+    def finish(self, name: str) -> bool:
+        """Call when stage name ends; counts it as missed (and returns True) if it ran late"""
+        if self.remaining() - self.budget.reserved_after(name) < 0:
+            self.budget.miss(name)
+            return True
+        return False
+
+
+class StageBudget:
+    """
+    An end-to-end budget (e.g. response_timeout) and each stage's share of
+    it, in pipeline order. Counts the requests that overran a stage.
+    """
+
+    def __init__(self, total: float, shares: Dict[str, float]):
+        if abs(sum(shares.values()) - 1.0) > 1e-6:
+            raise ValueError(f"Stage shares must add up to 1, got {shares}")
+        self.total = total
+        self.shares = dict(shares)
+        self._reserved: Dict[str, float] = {}
+        later = 0.0
+        for name in reversed(list(self.shares)):
+            self._reserved[name] = later * total
+            later += self.shares[name]
+
+        # Metrics
+        self.started = 0
+        self.missed: Dict[str, int] = {name: 0 for name in self.shares}
+
+    def share(self, name: str) -> float:
+        """Seconds stage name gets when earlier stages used all of theirs"""
+        return self.shares[name] * self.total
+
+    def reserved_after(self, name: str) -> float:
+        return self._reserved[name]
+
+    def start(self, started: Optional[float] = None) -> Deadline:
+        self.started += 1
+        return Deadline(self, started)
+
+    def miss(self, name: str):
+        self.missed[name] += 1
+
+    def get_stats(self) -> Dict:
+        return {
+            'total_s': self.total,
+            'stages': {
+                name: {'share_s': round(self.share(name), 3), 'missed': self.missed[name]}
+                for name in self.shares
+            },
+            'requests': self.started
+        }
+
+
+class RetryBudget:
+    """
+    Caps retries and hedged requests at a fraction of all requests.
+    Every request deposits ratio of a token (up to max_tokens) and every
+    retry spends a whole one, so a slow or failing provider never sees
+    more than (1 + ratio) times the normal load from us.
+    """
+
+    def __init__(self, ratio: float = 0.1, max_tokens: float = 10):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+
+        # Metrics
+        self.spent = 0
+        self.denied = 0
+
+    def deposit(self):
+        self.tokens = min(self.tokens + self.ratio, self.max_tokens)
+
+    def spend(self) -> bool:
+        if self.tokens < 1:
+            self.denied += 1
+            return False
+        self.tokens -= 1
+        self.spent += 1
+        return True
+
+    def get_stats(self) -> Dict:
+        return {
+            'ratio': self.ratio,
+            'tokens': round(self.tokens, 2),
+            'spent': self.spent,
+            'denied': self.denied
+        }
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling upstream while the circuit is open"""
+
+
+class CircuitBreaker:
+    """
+    Stops calling a failing upstream.
+    After failure_threshold consecutive failures the circuit opens and
+    calls fail immediately with CircuitOpenError. After reset_timeout
+    seconds one trial call is let through (half open): success closes
+    the circuit, failure opens it for another reset_timeout.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 10.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_running = False
+
+        # Metrics
+        self.opened = 0
+        self.rejected = 0
+
+    def allow(self) -> bool:
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = self.HALF_OPEN
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.HALF_OPEN and not self._trial_running:
+            self._trial_running = True
+            return True
+        self.rejected += 1
+        return False
+
+    def record_success(self):
+        self._trial_running = False
+        self.failures = 0
+        if self.state != self.CLOSED:
+            logger.info(f"Circuit {self.name} closed")
+        self.state = self.CLOSED
+
+    def record_failure(self):
+        self._trial_running = False
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.opened += 1
+                logger.warning(f"Circuit {self.name} opened after {self.failures} failures")
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    async def call(self, factory: Callable[[], Awaitable[T]]) -> T:
+        """Await factory() if the circuit allows it, else raise CircuitOpenError"""
+        if not self.allow():
+            raise CircuitOpenError(f"Circuit {self.name} is open")
+        try:
+            result = await factory()
+        except Exception:
+            self.record_failure()
+            raise
+        except BaseException:
+            # Cancelled: says nothing about upstream health
+            self._trial_running = False
+            raise
+        self.record_success()
+        return result
+
+    def get_stats(self) -> Dict:
+        return {
+            'state': self.state,
+            'consecutive_failures': self.failures,
+            'opened': self.opened,
+            'rejected': self.rejected
+        }
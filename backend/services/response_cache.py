@@ -0,0 +1,190 @@
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set, Tuple
+import hashlib
+import logging
+import re
+import time
+
+logger = logging.getLogger(__name__)
+
+# (context fingerprint, max_words, normalized question)
+CacheKey = Tuple[str, int, str]
+
+
+class ResponseCache:
+    """
+    Answer cache in front of OpenAIService.
+    Exact tier: normalized question + context fingerprint.
+    Fuzzy tier: token-set (Jaccard) similarity against cached questions that
+    were answered with the same context. A fuzzy match may add or drop
+    filler words, but not a negation ("should I not buy..."), and the words
+    both questions share must come in the same order ("is A bigger than B"
+    never matches "is B bigger than A"). Entries expire by TTL and the
+    least recently used ones are evicted past max_entries. Expired entries
+    stay until evicted or replaced, so get_stale() can still answer when
+    the upstream is down.
+    """
+
+    _strip_pattern = re.compile(r"[^a-z0-9' ]+")
+    _space_pattern = re.compile(r"\s+")
+    _negations = frozenset("no not never nor none nothing nobody nowhere neither cannot without".split())
+
+    def __init__(
+        self,
+        max_entries: int = 512,
+        ttl_seconds: float = 3600,
+        fuzzy_threshold: float = 0.8
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.fuzzy_threshold = fuzzy_threshold
+
+        self._entries: "OrderedDict[CacheKey, Tuple[str, float, frozenset]]" = OrderedDict()
+        self._token_index: Dict[str, Set[CacheKey]] = {}
+
+        self.exact_hits = 0
+        self.fuzzy_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.stale_hits = 0
+
+    @classmethod
+    def normalize(cls, text: str) -> str:
+        text = cls._strip_pattern.sub(' ', text.lower())
+        return cls._space_pattern.sub(' ', text).strip()
+
+    @staticmethod
+    def fingerprint(context: str) -> str:
+        if not context:
+            return ""
+        return hashlib.blake2b(context.encode('utf-8'), digest_size=8).hexdigest()
+
+    def get(self, question: str, context: str = "", max_words: int = 15) -> Optional[str]:
+        """Return a cached answer or None"""
+        normalized = self.normalize(question)
+        if not normalized:
+            return None
+        fingerprint = self.fingerprint(context)
+        now = time.monotonic()
+
+        key = (fingerprint, max_words, normalized)
+        entry = self._entries.get(key)
+        if entry is not None:
+            if now - entry[1] <= self.ttl_seconds:
+                self._entries.move_to_end(key)
+                self.exact_hits += 1
+                return entry[0]
+
+        match = self._fuzzy_lookup(fingerprint, max_words, normalized.split(), now)
+        if match is not None:
+            self._entries.move_to_end(match)
+            self.fuzzy_hits += 1
+            logger.debug(f"Fuzzy cache hit: '{normalized}' ~ '{match[2]}'")
+            return self._entries[match][0]
+
+        self.misses += 1
+        return None
+
+    def _fuzzy_lookup(
+        self,
+        fingerprint: str,
+        max_words: int,
+        words: List[str],
+        now: float
+    ) -> Optional[CacheKey]:
+        tokens = frozenset(words)
+        # Count shared tokens per candidate via the inverted index
+        overlap: Dict[CacheKey, int] = {}
+        for token in tokens:
+            for key in self._token_index.get(token, ()):
+                if key[0] == fingerprint and key[1] == max_words:
+                    overlap[key] = overlap.get(key, 0) + 1
+
+        best_key, best_score = None, self.fuzzy_threshold
+        for key, shared in overlap.items():
+            candidate_tokens = self._entries[key][2]
+            score = shared / (len(tokens) + len(candidate_tokens) - shared)
+            if (
+                score >= best_score
+                and now - self._entries[key][1] <= self.ttl_seconds
+                and self._same_meaning(words, tokens, key[2].split(), candidate_tokens)
+            ):
+                best_key, best_score = key, score
+        return best_key
+
+    @classmethod
+    def _is_negation(cls, token: str) -> bool:
+        return token in cls._negations or token.endswith("n't")
+
+    @classmethod
+    def _same_meaning(
+        cls,
+        words: List[str],
+        tokens: frozenset,
+        other_words: List[str],
+        other_tokens: frozenset
+    ) -> bool:
+        if any(cls._is_negation(token) for token in tokens ^ other_tokens):
+            return False
+        shared = tokens & other_tokens
+        return [word for word in words if word in shared] == [word for word in other_words if word in shared]
+
+    def get_stale(self, question: str, context: str = "", max_words: int = 15) -> Optional[str]:
+        """An exact-match answer even if expired (a fallback when no fresh one can be had)"""
+        entry = self._entries.get((self.fingerprint(context), max_words, self.normalize(question)))
+        if entry is None:
+            return None
+        self.stale_hits += 1
+        return entry[0]
+
+    def put(self, question: str, context: str, answer: str, max_words: int = 15):
+        normalized = self.normalize(question)
+        if not normalized or not answer:
+            return
+
+        key = (self.fingerprint(context), max_words, normalized)
+        if key in self._entries:
+            self._remove(key)
+
+        tokens = frozenset(normalized.split())
+        self._entries[key] = (answer, time.monotonic(), tokens)
+        for token in tokens:
+            self._token_index.setdefault(token, set()).add(key)
+
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def _remove(self, key: CacheKey):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for token in entry[2]:
+            keys = self._token_index.get(token)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._token_index[token]
+
+    def invalidate(self):
+        """Drop everything (DELETE /api/cache); context changes need no flush, they change the key"""
+        if self._entries:
+            self.invalidations += 1
+        self._entries.clear()
+        self._token_index.clear()
+
+    def get_stats(self) -> Dict:
+        hits = self.exact_hits + self.fuzzy_hits
+        lookups = hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'exact_hits': self.exact_hits,
+            'fuzzy_hits': self.fuzzy_hits,
+            'misses': self.misses,
+            'hit_rate': hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+            'stale_hits': self.stale_hits
+        }
@@ -0,0 +1,630 @@
+from collections import OrderedDict
+from functools import partial
+from typing import Awaitable, Callable, Dict, List, Optional
+import asyncio
+import json
+import logging
+import time
+import uuid
+
+from .context_manager import ContextManager
+from .conversation_log import ConversationLog
+from .state_store import StateStore
+
+logger = logging.getLogger(__name__)
+
+# Rough per-entry overhead of a history dict beyond its strings
+_HISTORY_ENTRY_OVERHEAD = 240
+
+# Pub-sub channel for session changes made by other workers
+SESSION_CHANNEL = "sessions"
+
+# Called with (kind, entry) when a session's history changes
+HistoryListener = Callable[[str, Optional[Dict]], None]
+# Called with (client_id, worker_id) when another worker opens a connection
+AttachListener = Callable[[str, str], None]
+
+
+class Session:
+    """
+    Per-client state: conversation history, its rolling summary and
+    uploaded context. Lives across reconnects of the same client_id until
+    evicted. The summary (see ConversationMemory) covers exchanges up to
+    summary_through; it is kept per worker and rebuilt after a reload.
+    """
+
+    def __init__(self, client_id: str, context: ContextManager, max_history: int = 20):
+        self.client_id = client_id
+        self.context = context
+        self.max_history = max_history
+        self.history: List[Dict] = []
+        self.summary = ""
+        self.summary_through = 0.0  # timestamp of the last exchange in the summary
+        self.connections = 0
+        self.created = time.time()
+        self.last_active = time.monotonic()
+        # Set while applying state from the store, so it isn't written back
+        self.syncing = False
+        # Store key of each uploaded document, by context id (replicated sessions only)
+        self.document_keys: Dict[int, str] = {}
+        # This session's share of the registry's running memory total
+        self.counted_bytes = 0
+        self._listeners: List[HistoryListener] = []
+
+    def touch(self):
+        self.last_active = time.monotonic()
+
+    def on_change(self, callback: HistoryListener):
+        """Register a callback fired when history is added to or cleared"""
+        self._listeners.append(callback)
+
+    def add_exchange(self, question: str, answer: str):
+        """Store a Q/A pair for context awareness (keeps the last max_history)"""
+        entry = {
+            'question': question,
+            'answer': answer,
+            'timestamp': time.time()
+        }
+        self.append_entry(entry)
+        for callback in self._listeners:
+            callback('exchange', entry)
+
+    def append_entry(self, entry: Dict):
+        self.history.append(entry)
+        if len(self.history) > self.max_history:
+            del self.history[:-self.max_history]
+
+    def forget_summary(self):
+        self.summary = ""
+        self.summary_through = 0.0
+
+    def clear_history(self):
+        self.history = []
+        self.forget_summary()
+        for callback in self._listeners:
+            callback('history_cleared', None)
+
+    def clear(self):
+        """Clear this client's history and context"""
+        self.clear_history()
+        self.context.clear_all()
+
+    def memory_estimate(self) -> int:
+        """Approximate bytes held by this session"""
+        history = sum(
+            len(entry['question']) + len(entry['answer']) + _HISTORY_ENTRY_OVERHEAD
+            for entry in self.history
+        )
+        return history + len(self.summary) + self.context.memory_estimate()
+
+    def get_summary(self) -> Dict:
+        context = self.context.get_summary()
+        return {
+            'client_id': self.client_id,
+            'connected': self.connections > 0,
+            'idle_seconds': round(time.monotonic() - self.last_active, 1),
+            'history_length': len(self.history),
+            'summary_words': len(self.summary.split()),
+            'contexts': context['total_contexts'],
+            'passages': context['total_passages'],
+            'memory_bytes': self.memory_estimate()
+        }
+
+
+class SessionRegistry:
+    """
+    Sessions keyed by client_id, kept in least-recently-active order.
+    Sessions without an open connection are evicted once idle for
+    idle_timeout seconds, or oldest first when the session count or total
+    memory exceeds its cap. A session over max_session_bytes drops its
+    oldest uploaded contexts. The memory total is kept as a running sum,
+    brought up to date with a session's estimate whenever its history or
+    context changes (a new rolling summary counts from the next change).
+
+    With a shared store (e.g. Redis), this registry is a per-worker cache:
+    history and uploaded context are written behind to the store, other
+    workers are told about each change over pub-sub, and a session missing
+    locally is loaded from the store, so any worker can serve any
+    client_id. Each uploaded document is its own key, listed in order
+    under session:<client_id>:contexts, so an upload or removal copies
+    only that document; encoding, decoding and indexing it run off the
+    event loop. Open connections are recorded as conn:<client_id> keys.
+
+    With a conversation log, every exchange (and history clear) is also
+    appended to it, and a session created after a restart starts from the
+    client's latest logged exchanges.
+    """
+
+    def __init__(
+        self,
+        idle_timeout: float = 1800,
+        max_sessions: int = 1000,
+        max_session_bytes: int = 32 * 1024 * 1024,
+        max_total_bytes: int = 512 * 1024 * 1024,
+        max_history: int = 20,
+        sweep_interval: float = 60,
+        passage_words: int = 60,
+        top_k: int = 8,
+        token_budget: int = 400,
+        store: Optional[StateStore] = None,
+        worker_id: str = "local",
+        store_ttl: float = 86400,
+        presence_ttl: float = 60,
+        log: Optional[ConversationLog] = None
+    ):
+        self.idle_timeout = idle_timeout
+        self.max_sessions = max_sessions
+        self.max_session_bytes = max_session_bytes
+        self.max_total_bytes = max_total_bytes
+        self.max_history = max_history
+        self.sweep_interval = sweep_interval
+        self.passage_words = passage_words
+        self.top_k = top_k
+        self.token_budget = token_budget
+
+        self.store = store
+        # Only a store other processes can see needs a copy of every session
+        self.replicate = store is not None and store.shared
+        self.worker_id = worker_id
+        self.store_ttl = store_ttl
+        self.presence_ttl = presence_ttl
+        self.log = log
+        self.attach_listeners: List[AttachListener] = []
+
+        self.sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._memory_bytes = 0
+        self._last_sweep = time.monotonic()
+        self._writes: asyncio.Queue = asyncio.Queue()
+        self._tasks: List[asyncio.Task] = []
+
+        self.created = 0
+        self.evicted_idle = 0
+        self.evicted_over_cap = 0
+        self.contexts_trimmed = 0
+        self.loaded = 0
+        self.remote_events = 0
+        self.write_errors = 0
+
+    def __len__(self) -> int:
+        return len(self.sessions)
+
+    def __contains__(self, client_id: str) -> bool:
+        return client_id in self.sessions
+
+    def get(self, client_id: str) -> Session:
+        """Return the client's session, creating it if needed"""
+        session = self.sessions.get(client_id)
+        if session is None:
+            session = self._create(client_id)
+        else:
+            self.sessions.move_to_end(client_id)
+        session.touch()
+
+        if time.monotonic() - self._last_sweep >= self.sweep_interval:
+            self.sweep()
+        return session
+
+    def peek(self, client_id: str) -> Optional[Session]:
+        """Return the session without creating it or marking it active"""
+        return self.sessions.get(client_id)
+
+    async def load(self, client_id: str) -> Session:
+        """
+        Like get(), but a session this worker doesn't hold yet is first
+        loaded from the shared store, or else its history from the
+        conversation log (if there is one).
+        """
+        if client_id not in self.sessions and (self.replicate or self.log is not None):
+            history = documents = None
+            try:
+                if self.replicate:
+                    entries, manifest = await asyncio.gather(
+                        self.store.range(f"session:{client_id}:history"),
+                        self.store.get(f"session:{client_id}:contexts")
+                    )
+                    history = [json.loads(entry) for entry in entries]
+                    keys = json.loads(manifest or '[]')
+                    documents = await self._read_documents(client_id, keys)
+                else:
+                    history = await self.log.recent(client_id, self.max_history)
+            except Exception as e:
+                logger.warning(f"Could not load session {client_id}: {e}")
+            # Another request may have created it while we waited
+            if history is not None and client_id not in self.sessions:
+                session = self._create(client_id)
+                self._apply(session, history)
+                self.loaded += 1
+                for key, document in (documents or {}).items():
+                    await self._index_document(session, key, document)
+        return self.get(client_id)
+
+    def _create(self, client_id: str) -> Session:
+        context = ContextManager(
+            passage_words=self.passage_words,
+            top_k=self.top_k,
+            token_budget=self.token_budget
+        )
+        session = Session(client_id, context, self.max_history)
+        context.on_change(lambda kind, entry: self._context_changed(session, kind, entry))
+        session.on_change(lambda kind, entry: self._history_changed(session, kind, entry))
+        self.sessions[client_id] = session
+        self.created += 1
+        self._evict_over_count(keep=client_id)
+        logger.info(f"Created session for {client_id} ({len(self.sessions)} active)")
+        return session
+
+    async def attach(self, client_id: str) -> Session:
+        """Mark a connection open; attached sessions are never evicted"""
+        session = await self.load(client_id)
+        session.connections += 1
+        if self.store is not None:
+            self._queue_write(
+                lambda: self.store.set(f"conn:{client_id}", self.worker_id, self.presence_ttl),
+                {'type': 'attached', 'client_id': client_id}
+            )
+        return session
+
+    def detach(self, client_id: str):
+        session = self.sessions.get(client_id)
+        if session is not None:
+            session.connections = max(0, session.connections - 1)
+            session.touch()
+            if session.connections == 0 and self.store is not None:
+                self._queue_write(lambda: self._release(client_id))
+
+    async def _release(self, client_id: str):
+        # Leave the key alone if the client has since connected to another worker
+        if await self.store.get(f"conn:{client_id}") == self.worker_id:
+            await self.store.delete(f"conn:{client_id}")
+
+    async def remove(self, client_id: str) -> bool:
+        """Drop a session here, from the store and on every other worker"""
+        removed = self._drop(client_id) is not None
+        if self.log is not None:
+            self.log.append_clear(client_id)
+        if self.replicate:
+            try:
+                keys = json.loads(await self.store.get(f"session:{client_id}:contexts") or '[]')
+                removed = await self.store.delete(
+                    f"session:{client_id}:history", f"session:{client_id}:contexts",
+                    *[self._document_key(client_id, key) for key in keys]
+                ) > 0 or removed
+                await self._publish({'type': 'removed', 'client_id': client_id})
+            except Exception as e:
+                logger.warning(f"Could not remove session {client_id} from the state store: {e}")
+        return removed
+
+    async def connected_clients(self) -> Dict[str, str]:
+        """client_id -> worker_id for every open connection the store knows about"""
+        if self.store is None:
+            return {}
+        client_ids = [key.split(':', 1)[1] for key in await self.store.keys("conn:*")]
+        workers = await asyncio.gather(*[self.store.get(f"conn:{client_id}") for client_id in client_ids])
+        return {client_id: worker for client_id, worker in zip(client_ids, workers) if worker is not None}
+
+    def on_remote_attach(self, callback: AttachListener):
+        """Register a callback fired when another worker opens a connection for a client_id"""
+        if callback not in self.attach_listeners:
+            self.attach_listeners.append(callback)
+
+    # Shared store
+
+    async def start(self):
+        """Subscribe to other workers' changes and start the write-behind and presence tasks"""
+        if self.store is None or self._tasks:
+            return
+        await self.store.subscribe(SESSION_CHANNEL, self._on_event)
+        self._tasks = [
+            asyncio.create_task(self._run_writes()),
+            asyncio.create_task(self._run_presence())
+        ]
+
+    async def stop(self, timeout: float = 2.0):
+        """Flush pending writes and release this worker's connection keys"""
+        if not self._tasks:
+            return
+        for client_id, session in self.sessions.items():
+            if session.connections:
+                self._queue_write(lambda client_id=client_id: self._release(client_id))
+        try:
+            await asyncio.wait_for(self._writes.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Dropped {self._writes.qsize()} unwritten session changes")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def _queue_write(self, write: Callable[[], Awaitable], event: Optional[Dict] = None):
+        # Writes go out in order on one task, each followed by its event
+        self._writes.put_nowait((write, event))
+
+    async def _run_writes(self):
+        while True:
+            write, event = await self._writes.get()
+            try:
+                await write()
+                if event is not None:
+                    await self._publish(event)
+            except Exception as e:
+                self.write_errors += 1
+                logger.warning(f"State store write failed: {e}")
+            finally:
+                self._writes.task_done()
+
+    async def _run_presence(self):
+        # Refresh connection keys so a crashed worker's connections expire
+        while True:
+            await asyncio.sleep(self.presence_ttl / 3)
+            attached = [client_id for client_id, session in self.sessions.items() if session.connections]
+            try:
+                await asyncio.gather(*[
+                    self.store.set(f"conn:{client_id}", self.worker_id, self.presence_ttl)
+                    for client_id in attached
+                ])
+            except Exception as e:
+                logger.warning(f"Could not refresh connection keys: {e}")
+
+    async def _publish(self, event: Dict):
+        await self.store.publish(SESSION_CHANNEL, json.dumps({**event, 'origin': self.worker_id}))
+
+    def _history_changed(self, session: Session, kind: str, entry: Optional[Dict]):
+        self._recount(session)
+        if session.syncing:
+            return
+        if self.log is not None:
+            if kind == 'exchange':
+                self.log.append(session.client_id, entry['question'], entry['answer'], entry['timestamp'])
+            else:
+                self.log.append_clear(session.client_id)
+        if not self.replicate:
+            return
+        key = f"session:{session.client_id}:history"
+        event = {'type': kind, 'client_id': session.client_id, 'entry': entry}
+        if kind == 'exchange':
+            value = json.dumps(entry)
+            self._queue_write(lambda: self.store.push(key, value, self.max_history, self.store_ttl), event)
+        else:
+            self._queue_write(lambda: self.store.delete(key), event)
+
+    @staticmethod
+    def _document_key(client_id: str, key: str) -> str:
+        return f"session:{client_id}:context:{key}"
+
+    def _write_document(self, session: Session, entry: Dict):
+        client_id = session.client_id
+        key = session.document_keys[entry['id']] = uuid.uuid4().hex
+        document = {
+            'source': entry['source'],
+            'metadata': entry['metadata'],
+            'content': session.context.documents[entry['id']]
+        }
+        manifest = json.dumps(list(session.document_keys.values()))
+
+        async def write():
+            # A multi-megabyte upload takes a while to encode: keep it off the loop
+            loop = asyncio.get_running_loop()
+            value = await loop.run_in_executor(None, partial(json.dumps, document, default=str))
+            await self.store.set(self._document_key(client_id, key), value, self.store_ttl)
+            await self.store.set(f"session:{client_id}:contexts", manifest, self.store_ttl)
+
+        self._queue_write(write, {'type': 'context_added', 'client_id': client_id, 'document': key})
+
+    def _delete_documents(self, session: Session, keys: List[str], event: Dict):
+        client_id = session.client_id
+        manifest = json.dumps(list(session.document_keys.values()))
+
+        async def write():
+            if keys:
+                await self.store.delete(*[self._document_key(client_id, key) for key in keys])
+            await self.store.set(f"session:{client_id}:contexts", manifest, self.store_ttl)
+
+        self._queue_write(write, event)
+
+    async def _read_documents(self, client_id: str, keys: List[str]) -> Dict[str, Dict]:
+        """Fetch and decode stored documents (decoded off the loop); missing ones are skipped"""
+        values = await asyncio.gather(*[self.store.get(self._document_key(client_id, key)) for key in keys])
+        loop = asyncio.get_running_loop()
+        documents = {}
+        for key, value in zip(keys, values):
+            if value is not None:
+                documents[key] = await loop.run_in_executor(None, json.loads, value)
+        return documents
+
+    async def _index_document(self, session: Session, key: str, document: Dict):
+        """Add a document another worker uploaded, without writing it back"""
+        ingest = session.context.begin_context(document['source'], document.get('metadata') or {})
+        # Known key: the 'added' notification on finish() is recognised as remote
+        session.document_keys[ingest.context_id] = key
+        try:
+            await ingest.feed_document(document['content'])
+        except BaseException:
+            ingest.abort()
+            session.document_keys.pop(ingest.context_id, None)
+            raise
+        if session.document_keys.get(ingest.context_id) != key:
+            # Removed or cleared by its owner while we were indexing it
+            ingest.abort()
+            return
+        ingest.finish()
+
+    async def _fetch_document(self, session: Session, key: str):
+        try:
+            documents = await self._read_documents(session.client_id, [key])
+        except Exception as e:
+            logger.warning(f"Could not load context for {session.client_id}: {e}")
+            return
+        if key in documents and key not in session.document_keys.values():
+            await self._index_document(session, key, documents[key])
+
+    def _remove_document(self, session: Session, key: str):
+        for context_id, document_key in list(session.document_keys.items()):
+            if document_key == key:
+                del session.document_keys[context_id]
+                session.syncing = True
+                try:
+                    session.context.remove_context(context_id)
+                finally:
+                    session.syncing = False
+
+    def _apply(self, session: Session, history: Optional[List[Dict]] = None, clear_contexts: bool = False):
+        """Replace a session's state with what the store holds, without writing it back"""
+        session.syncing = True
+        try:
+            if history is not None:
+                session.history = history[-self.max_history:]
+                if not session.history:
+                    session.forget_summary()
+            if clear_contexts:
+                session.document_keys.clear()
+                session.context.clear_all()
+        finally:
+            session.syncing = False
+        self._recount(session)
+
+    def _on_event(self, message: str):
+        event = json.loads(message)
+        if event.get('origin') == self.worker_id:
+            return
+        self.remote_events += 1
+        client_id, kind = event['client_id'], event['type']
+
+        if kind == 'attached':
+            for callback in self.attach_listeners:
+                callback(client_id, event['origin'])
+            return
+
+        session = self.sessions.get(client_id)
+        if session is None:
+            return
+        if kind == 'exchange':
+            session.append_entry(event['entry'])
+            self._recount(session)
+        elif kind == 'history_cleared':
+            session.history = []
+            session.forget_summary()
+            self._recount(session)
+        elif session.connections == 0:
+            # Reloaded from the store on next use
+            self._drop(client_id)
+        elif kind == 'context_added':
+            asyncio.create_task(self._fetch_document(session, event['document']))
+        elif kind == 'context_removed':
+            self._remove_document(session, event['document'])
+        elif kind == 'context_cleared':
+            self._apply(session, clear_contexts=True)
+        elif kind == 'removed':
+            self._apply(session, history=[], clear_contexts=True)
+
+    def _context_changed(self, session: Session, kind: str, entry: Optional[Dict]):
+        if self.replicate and not session.syncing:
+            if kind == 'added' and entry['id'] not in session.document_keys:
+                self._write_document(session, entry)
+            elif kind == 'removed':
+                self._forget_document(session, entry)
+            elif kind == 'cleared':
+                keys = list(session.document_keys.values())
+                session.document_keys.clear()
+                self._delete_documents(session, keys, {'type': 'context_cleared', 'client_id': session.client_id})
+
+        # Drop the oldest uploads until the session fits its cap again
+        while len(session.context.contexts) > 1 and session.memory_estimate() > self.max_session_bytes:
+            dropped = session.context.remove_context(session.context.contexts[0]['id'], notify=False)
+            self.contexts_trimmed += 1
+            logger.warning(
+                f"Session {session.client_id} over {self.max_session_bytes} bytes, "
+                f"dropped context from {dropped['source']}"
+            )
+            if self.replicate:
+                self._forget_document(session, dropped)
+        self._recount(session)
+        self._evict_over_memory(keep=session.client_id)
+
+    def _forget_document(self, session: Session, entry: Dict):
+        key = session.document_keys.pop(entry['id'], None)
+        if key is not None:
+            self._delete_documents(
+                session, [key], {'type': 'context_removed', 'client_id': session.client_id, 'document': key}
+            )
+
+    def _evictable(self, keep: Optional[str] = None) -> List[str]:
+        # Least recently active first
+        return [
+            client_id for client_id, session in self.sessions.items()
+            if session.connections == 0 and client_id != keep
+        ]
+
+    def _evict_over_count(self, keep: Optional[str] = None):
+        excess = len(self.sessions) - self.max_sessions
+        if excess <= 0:
+            return
+        for client_id in self._evictable(keep)[:excess]:
+            self._drop(client_id)
+            self.evicted_over_cap += 1
+
+    def _evict_over_memory(self, keep: Optional[str] = None):
+        if self._memory_bytes <= self.max_total_bytes:
+            return
+        for client_id in self._evictable(keep):
+            self._drop(client_id)
+            self.evicted_over_cap += 1
+            logger.info(f"Evicted session {client_id} (total memory over cap)")
+            if self._memory_bytes <= self.max_total_bytes:
+                break
+
+    def sweep(self) -> int:
+        """Evict sessions idle longer than idle_timeout; returns the count"""
+        self._last_sweep = now = time.monotonic()
+        expired = [
+            client_id for client_id in self._evictable()
+            if now - self.sessions[client_id].last_active > self.idle_timeout
+        ]
+        for client_id in expired:
+            self._drop(client_id)
+        self.evicted_idle += len(expired)
+        if expired:
+            logger.info(f"Evicted {len(expired)} idle sessions")
+        return len(expired)
+
+    def _recount(self, session: Session):
+        """Bring the running memory total up to date with one session"""
+        if self.sessions.get(session.client_id) is not session:
+            return
+        estimate = session.memory_estimate()
+        self._memory_bytes += estimate - session.counted_bytes
+        session.counted_bytes = estimate
+
+    def _drop(self, client_id: str) -> Optional[Session]:
+        session = self.sessions.pop(client_id, None)
+        if session is not None:
+            self._memory_bytes -= session.counted_bytes
+        return session
+
+    def memory_estimate(self) -> int:
+        return self._memory_bytes
+
+    def get_stats(self, include_sessions: bool = True) -> Dict:
+        stats = {
+            'sessions': len(self.sessions),
+            'connected': sum(1 for session in self.sessions.values() if session.connections),
+            'memory_bytes': self.memory_estimate(),
+            'max_session_bytes': self.max_session_bytes,
+            'max_total_bytes': self.max_total_bytes,
+            'created': self.created,
+            'evicted_idle': self.evicted_idle,
+            'evicted_over_cap': self.evicted_over_cap,
+            'contexts_trimmed': self.contexts_trimmed,
+            'store': {
+                'worker_id': self.worker_id,
+                'replicated': self.replicate,
+                'loaded': self.loaded,
+                'remote_events': self.remote_events,
+                'pending_writes': self._writes.qsize(),
+                'write_errors': self.write_errors,
+                **(self.store.get_stats() if self.store is not None else {})
+            },
+            'log': self.log.get_stats() if self.log is not None else None
+        }
+        if include_sessions:
+            stats['per_session'] = [session.get_summary() for session in self.sessions.values()]
+        return stats
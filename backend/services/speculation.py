@@ -0,0 +1,252 @@
+from typing import AsyncIterator, Dict, List, Optional
+import asyncio
+import logging
+import time
+
+from .context_index import estimate_tokens
+from .openai_service import OpenAIService
+from .question_detector import QuestionDetector
+from .response_cache import ResponseCache
+
+logger = logging.getLogger(__name__)
+
+
+class Speculation:
+    """
+    One answer generated ahead of the final transcript.
+    Deltas are buffered as they arrive so a kept speculation can be
+    replayed to the client and then followed live.
+    """
+
+    def __init__(
+        self,
+        openai_service: OpenAIService,
+        question: str,
+        history: list,
+        context: str,
+        prompt_tokens: int,
+        question_type: Optional[str] = None,
+        summary: str = "",
+        deadline: Optional[float] = None
+    ):
+        self.question = question
+        self.normalized = ResponseCache.normalize(question)
+        self.prompt_tokens = prompt_tokens
+        self.deltas: List[str] = []
+        self.started = time.monotonic()
+        self.first_delta_at: Optional[float] = None
+        self.done_at: Optional[float] = None
+        self._changed = asyncio.Event()
+        self.task = asyncio.create_task(
+            self._run(openai_service, question, history, context, question_type, summary, deadline)
+        )
+
+    async def _run(
+        self,
+        openai_service: OpenAIService,
+        question: str,
+        history: list,
+        context: str,
+        question_type: Optional[str],
+        summary: str,
+        deadline: Optional[float]
+    ):
+        try:
+            async for delta in openai_service.stream_contextual_response(
+                question=question,
+                conversation_history=history,
+                user_context=context,
+                question_type=question_type,
+                summary=summary,
+                deadline=deadline
+            ):
+                if self.first_delta_at is None:
+                    self.first_delta_at = time.monotonic()
+                self.deltas.append(delta)
+                self._changed.set()
+        finally:
+            self.done_at = time.monotonic()
+            self._changed.set()
+
+    @property
+    def done(self) -> bool:
+        return self.done_at is not None
+
+    @property
+    def text(self) -> str:
+        return ''.join(self.deltas)
+
+    def completion_tokens(self) -> int:
+        return estimate_tokens(self.text)
+
+    async def stream(self) -> AsyncIterator[str]:
+        """Buffered deltas first, then live ones until the answer is complete"""
+        sent = 0
+        while True:
+            if sent < len(self.deltas):
+                sent += 1
+                yield self.deltas[sent - 1]
+                continue
+            if self.done:
+                return
+            self._changed.clear()
+            await self._changed.wait()
+
+    async def answer(self) -> str:
+        await asyncio.shield(self.task)
+        return self.text
+
+    def cancel(self):
+        if not self.done:
+            self.task.cancel()
+
+
+class SpeculativeResponder:
+    """
+    Starts answering while the speaker is still talking.
+    A partial transcript that QuestionDetector already scores at
+    min_confidence or above starts a cancellable request; a newer partial
+    with different wording restarts it. The final transcript keeps the
+    speculation when it matches the speculated text (allowing up to
+    max_extra_words trailing words), otherwise it is cancelled and the
+    caller answers normally. A kept speculation is tracked until it
+    completes, so an answer superseded or disconnected while using it
+    can still stop it (cancel_kept). Speculative requests get timeout
+    seconds, like an answer's model call.
+    """
+
+    def __init__(
+        self,
+        openai_service: OpenAIService,
+        question_detector: QuestionDetector,
+        min_confidence: float = 0.85,
+        min_words: int = 3,
+        max_extra_words: int = 0,
+        timeout: Optional[float] = None
+    ):
+        self.openai_service = openai_service
+        self.question_detector = question_detector
+        self.min_confidence = min_confidence
+        self.min_words = min_words
+        self.max_extra_words = max_extra_words
+        self.timeout = timeout
+        self._active: Dict[str, Speculation] = {}
+        # Taken by an answer and still running
+        self._kept: Dict[str, Speculation] = {}
+
+        # Metrics
+        self.started = 0
+        self.kept = 0
+        self.cancelled = 0
+        self.kept_cancelled = 0
+        self.latency_saved_ms = 0.0
+        self.first_delta_saved_ms = 0.0
+        self.wasted_prompt_tokens = 0
+        self.wasted_completion_tokens = 0
+
+    def consider(self, client_id: str, partial: str, session) -> Optional[Speculation]:
+        """Start or restart a speculation for a partial transcript if it looks like a question"""
+        if len(partial.split()) < self.min_words:
+            return None
+        normalized = ResponseCache.normalize(partial)
+        current = self._active.get(client_id)
+        if current is not None and current.normalized == normalized:
+            return current
+
+        is_question, confidence, q_type = self.question_detector.detect(partial)
+        if not is_question or confidence < self.min_confidence:
+            return current
+
+        if current is not None:
+            self._discard(current)
+
+        context = session.context.get_relevant_context(partial)
+        history = list(session.history)
+        speculation = Speculation(
+            self.openai_service,
+            partial,
+            history,
+            context,
+            self.openai_service.estimate_prompt_tokens(partial, history, context, session.summary),
+            q_type,
+            session.summary,
+            self.timeout
+        )
+        self._active[client_id] = speculation
+        self.started += 1
+        logger.debug(f"Speculating for {client_id} ({confidence:.2f}): {partial}")
+        return speculation
+
+    def take(self, client_id: str, final: str) -> Optional[Speculation]:
+        """Return the speculation if the final transcript matches it, else cancel it"""
+        speculation = self._active.pop(client_id, None)
+        if speculation is None:
+            return None
+
+        final_words = ResponseCache.normalize(final).split()
+        speculated_words = speculation.normalized.split()
+        extra = len(final_words) - len(speculated_words)
+        if final_words[:len(speculated_words)] != speculated_words or not 0 <= extra <= self.max_extra_words:
+            logger.debug(f"Speculation missed for {client_id}: '{speculation.question}' vs '{final}'")
+            self._discard(speculation)
+            return None
+
+        self.kept += 1
+        final_at = time.monotonic()
+        self._kept[client_id] = speculation
+        speculation.task.add_done_callback(lambda _: self._record_hit(speculation, final_at))
+        speculation.task.add_done_callback(lambda _: self._release(client_id, speculation))
+        logger.info(
+            f"Speculation kept for {client_id}, "
+            f"started {(final_at - speculation.started) * 1000:.0f}ms before the final"
+        )
+        return speculation
+
+    def _record_hit(self, speculation: Speculation, final_at: float):
+        done_at = speculation.done_at or final_at
+        self.latency_saved_ms += (min(final_at, done_at) - speculation.started) * 1000
+        first_at = speculation.first_delta_at or done_at
+        self.first_delta_saved_ms += (min(final_at, first_at) - speculation.started) * 1000
+
+    def _release(self, client_id: str, speculation: Speculation):
+        if self._kept.get(client_id) is speculation:
+            del self._kept[client_id]
+
+    def cancel(self, client_id: str):
+        """Drop the speculation no final transcript has taken yet"""
+        speculation = self._active.pop(client_id, None)
+        if speculation is not None:
+            self._discard(speculation)
+
+    def cancel_kept(self, client_id: str):
+        """Stop the speculation an answer was using, when that answer is cancelled"""
+        speculation = self._kept.pop(client_id, None)
+        if speculation is not None and not speculation.done:
+            speculation.cancel()
+            self.kept_cancelled += 1
+
+    def _discard(self, speculation: Speculation):
+        speculation.cancel()
+        self.cancelled += 1
+        self.wasted_prompt_tokens += speculation.prompt_tokens
+        self.wasted_completion_tokens += speculation.completion_tokens()
+
+    def get_stats(self) -> Dict:
+        return {
+            'active': len(self._active),
+            'started': self.started,
+            'kept': self.kept,
+            'cancelled': self.cancelled,
+            'kept_cancelled': self.kept_cancelled,
+            'hit_rate': self.kept / self.started if self.started else 0.0,
+            'latency_saved_ms': {
+                'total': round(self.latency_saved_ms, 1),
+                'avg': round(self.latency_saved_ms / self.kept, 1) if self.kept else 0.0,
+                'first_delta_avg': round(self.first_delta_saved_ms / self.kept, 1) if self.kept else 0.0
+            },
+            'wasted_tokens': {
+                'prompt': self.wasted_prompt_tokens,
+                'completion': self.wasted_completion_tokens,
+                'total': self.wasted_prompt_tokens + self.wasted_completion_tokens
+            }
+        }
@@ -3,6 +3,7 @@ from typing import Optional, Tuple
 import logging
 import numpy as np
 import io
+from ..utils.audio_processor import VoiceActivityDetector, read_wav
 
 logger = logging.getLogger(__name__)
 
@@ -17,19 +18,52 @@ class SpeechProcessor:
         self.recognizer.energy_threshold = 4000  # Adjust based on environment
         self.recognizer.dynamic_energy_threshold = True
         self.recognizer.pause_threshold = 0.8  # Seconds of silence to consider end
+        self.vad = VoiceActivityDetector()
         
     def process_audio_chunk(self, audio_data: bytes) -> Tuple[Optional[str], float]:
         """
         Process audio chunk (WAV bytes) and return transcription with confidence.
+        PCM WAV is read straight into the recognizer; other containers
+        (AIFF, FLAC) go through speech_recognition's AudioFile.
         Returns: (text, confidence)
         """
+        try:
+            samples, sample_rate = read_wav(audio_data)
+        except Exception:
+            pass
+        else:
+            return self.process_pcm(samples.tobytes(), sample_rate)
+        
         try:
             # audio_data contains the full WAV file from the frontend
             audio_file = io.BytesIO(audio_data)
             
             with sr.AudioFile(audio_file) as source:
                 audio = self.recognizer.record(source)
-            
+        except Exception as e:
+            logger.error(f"Speech processing error: {e}")
+            return None, 0.0
+        
+        return self._recognize(audio)
+    
+    def process_pcm(
+        self,
+        pcm_data: bytes,
+        sample_rate: int,
+        sample_width: int = 2
+    ) -> Tuple[Optional[str], float]:
+        """
+        Transcribe raw little-endian PCM without a WAV container.
+        Returns: (text, confidence)
+        """
+        if not pcm_data:
+            return None, 0.0
+        
+        audio = sr.AudioData(pcm_data, sample_rate, sample_width)
+        return self._recognize(audio)
+    
+    def _recognize(self, audio: sr.AudioData) -> Tuple[Optional[str], float]:
+        try:
             # Use Google Speech Recognition
             text = self.recognizer.recognize_google(audio, show_all=False)
             
@@ -73,33 +107,20 @@ class SpeechProcessor:
     
     def is_speech_detected(self, audio_data: np.ndarray) -> bool:
         """
-        Simple voice activity detection (VAD).
+        Voice activity detection (VAD) over a whole buffer.
         Returns True if speech-like audio is detected.
         """
         if audio_data.size == 0:
             return False
-        # Calculate energy
-        energy = np.abs(audio_data).mean()
-        
-        # Simple threshold-based detection
-        return energy > 0.01
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-        
\ No newline at end of file
+        return self.vad.contains_speech(audio_data)
+    
+    def wav_has_speech(self, audio_data: bytes) -> bool:
+        """
+        Cheap pre-check before sending a WAV payload to STT.
+        Payloads that can't be decoded here are passed through.
+        """
+        try:
+            samples, _ = read_wav(audio_data)
+        except Exception:
+            return True
+        return self.is_speech_detected(samples)
@@ -0,0 +1,385 @@
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+import asyncio
+import fnmatch
+import logging
+import time
+
+from ..utils.resp import RespError, as_text, encode_command, read_reply
+
+logger = logging.getLogger(__name__)
+
+# Called with each message published on a subscribed channel
+MessageCallback = Callable[[str], None]
+
+
+class StateStore:
+    """
+    Key/value, list and pub-sub interface for state shared between
+    workers. Values and messages are strings; keys and channels are
+    namespaced by the store. Subscribers receive their own worker's
+    messages too, so callers tag messages with their origin.
+    """
+
+    name = "base"
+    # Whether other processes see this store (and so whether sessions are copied into it)
+    shared = False
+
+    async def connect(self):
+        """Open connections (a no-op for in-process stores)"""
+
+    async def close(self):
+        """Release connections and subscriptions"""
+
+    async def get(self, key: str) -> Optional[str]:
+        raise NotImplementedError
+
+    async def set(self, key: str, value: str, ttl: Optional[float] = None):
+        raise NotImplementedError
+
+    async def delete(self, *keys: str) -> int:
+        raise NotImplementedError
+
+    async def push(self, key: str, value: str, max_len: int, ttl: Optional[float] = None):
+        """Append to a list, keeping only its newest max_len items"""
+        raise NotImplementedError
+
+    async def range(self, key: str) -> List[str]:
+        """Every item of a list, oldest first"""
+        raise NotImplementedError
+
+    async def expire(self, key: str, ttl: float):
+        raise NotImplementedError
+
+    async def keys(self, pattern: str) -> List[str]:
+        """Keys matching a glob pattern (debugging and stats only)"""
+        raise NotImplementedError
+
+    async def publish(self, channel: str, message: str) -> int:
+        """Returns the number of subscribers that received it"""
+        raise NotImplementedError
+
+    async def subscribe(self, channel: str, callback: MessageCallback):
+        raise NotImplementedError
+
+    def get_stats(self) -> Dict:
+        return {'backend': self.name}
+
+
+class MemoryStateStore(StateStore):
+    """
+    Single-process store: plain dicts and in-loop pub-sub.
+    Enough for one worker; state is lost on restart.
+    """
+
+    name = "memory"
+    shared = False
+
+    def __init__(self):
+        self._values: Dict[str, object] = {}
+        self._expires: Dict[str, float] = {}
+        self._callbacks: Dict[str, List[MessageCallback]] = {}
+        self.published = 0
+
+    def _live(self, key: str) -> bool:
+        expires = self._expires.get(key)
+        if expires is not None and expires <= time.monotonic():
+            self._values.pop(key, None)
+            del self._expires[key]
+        return key in self._values
+
+    def _set_ttl(self, key: str, ttl: Optional[float]):
+        if ttl is None:
+            self._expires.pop(key, None)
+        else:
+            self._expires[key] = time.monotonic() + ttl
+
+    async def get(self, key: str) -> Optional[str]:
+        if not self._live(key):
+            return None
+        value = self._values[key]
+        return value if isinstance(value, str) else None
+
+    async def set(self, key: str, value: str, ttl: Optional[float] = None):
+        self._values[key] = value
+        self._set_ttl(key, ttl)
+
+    async def delete(self, *keys: str) -> int:
+        removed = 0
+        for key in keys:
+            if self._live(key):
+                del self._values[key]
+                self._expires.pop(key, None)
+                removed += 1
+        return removed
+
+    async def push(self, key: str, value: str, max_len: int, ttl: Optional[float] = None):
+        items = self._values.get(key) if self._live(key) else None
+        if not isinstance(items, deque):
+            items = self._values[key] = deque()
+        items.append(value)
+        while len(items) > max_len:
+            items.popleft()
+        if ttl is not None:
+            self._set_ttl(key, ttl)
+
+    async def range(self, key: str) -> List[str]:
+        items = self._values.get(key) if self._live(key) else None
+        return list(items) if isinstance(items, deque) else []
+
+    async def expire(self, key: str, ttl: float):
+        if self._live(key):
+            self._set_ttl(key, ttl)
+
+    async def keys(self, pattern: str) -> List[str]:
+        return [key for key in list(self._values) if self._live(key) and fnmatch.fnmatchcase(key, pattern)]
+
+    async def publish(self, channel: str, message: str) -> int:
+        # Delivered on a later loop iteration, like a message from the network
+        callbacks = self._callbacks.get(channel, [])
+        loop = asyncio.get_running_loop()
+        for callback in callbacks:
+            loop.call_soon(callback, message)
+        self.published += 1
+        return len(callbacks)
+
+    async def subscribe(self, channel: str, callback: MessageCallback):
+        self._callbacks.setdefault(channel, []).append(callback)
+
+    async def close(self):
+        self._callbacks.clear()
+
+    def get_stats(self) -> Dict:
+        return {
+            'backend': self.name,
+            'keys': sum(1 for key in list(self._values) if self._live(key)),
+            'published': self.published
+        }
+
+
+class RedisStateStore(StateStore):
+    """
+    Store backed by Redis (or anything speaking RESP, such as
+    benchmarks/mock_redis.py), so several workers or hosts share sessions
+    and events.
+    Commands are pipelined over one connection: each call writes its
+    command and awaits its reply in order, so concurrent callers never
+    wait on each other's round trips. Subscriptions use a second
+    connection that reconnects and resubscribes on failure.
+    """
+
+    name = "redis"
+    shared = True
+
+    def __init__(self, url: str = "redis://127.0.0.1:6379/0", prefix: str = "earbud:", connect_timeout: float = 3.0):
+        parsed = urlparse(url)
+        if parsed.scheme not in ('redis', ''):
+            raise ValueError(f"Unsupported state store URL: {url}")
+        self.host = parsed.hostname or '127.0.0.1'
+        self.port = parsed.port or 6379
+        self.db = int(parsed.path.lstrip('/') or 0)
+        self.password = parsed.password
+        self.prefix = prefix
+        self.connect_timeout = connect_timeout
+
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._reader_task: Optional[asyncio.Task] = None
+        self._pending: Deque[asyncio.Future] = deque()
+        self._connect_lock: Optional[asyncio.Lock] = None
+
+        self._callbacks: Dict[str, List[MessageCallback]] = {}
+        self._subscriber_task: Optional[asyncio.Task] = None
+        self._subscriber_writer: Optional[asyncio.StreamWriter] = None
+        self._subscribed: Optional[asyncio.Event] = None
+
+        # Metrics
+        self.commands = 0
+        self.errors = 0
+        self.connects = 0
+        self.messages_received = 0
+
+    def _key(self, key: str) -> str:
+        return self.prefix + key
+
+    async def _open(self) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(self.host, self.port), self.connect_timeout)
+        handshake = []
+        if self.password:
+            handshake.append(('AUTH', self.password))
+        if self.db:
+            handshake.append(('SELECT', self.db))
+        for command in handshake:
+            writer.write(encode_command(*command))
+            reply = await read_reply(reader)
+            if isinstance(reply, RespError):
+                writer.close()
+                raise reply
+        self.connects += 1
+        return reader, writer
+
+    async def connect(self):
+        if self._connect_lock is None:
+            self._connect_lock = asyncio.Lock()
+        async with self._connect_lock:
+            if self._writer is not None:
+                return
+            self._reader, self._writer = await self._open()
+            self._reader_task = asyncio.create_task(self._read_replies(self._reader))
+            logger.info(f"State store connected to {self.host}:{self.port}/{self.db}")
+
+    async def _read_replies(self, reader: asyncio.StreamReader):
+        error: Exception = ConnectionError("State store connection closed")
+        try:
+            while True:
+                reply = await read_reply(reader)
+                future = self._pending.popleft()
+                # A cancelled caller leaves its future behind to keep replies in order
+                if future.done():
+                    continue
+                if isinstance(reply, RespError):
+                    future.set_exception(reply)
+                else:
+                    future.set_result(reply)
+        except asyncio.CancelledError:
+            raise
+        except (ConnectionError, OSError, asyncio.IncompleteReadError) as e:
+            logger.warning(f"State store connection lost: {e}")
+            error = ConnectionError(f"State store connection lost: {e}")
+        finally:
+            self._drop(error)
+
+    def _drop(self, error: Exception):
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = self._writer = None
+        while self._pending:
+            future = self._pending.popleft()
+            if not future.done():
+                future.set_exception(error)
+
+    async def execute(self, *args):
+        """Send one command and return its reply (bulk strings as bytes)"""
+        if self._writer is None:
+            await self.connect()
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append(future)
+        self._writer.write(encode_command(*args))
+        self.commands += 1
+        try:
+            return await future
+        except (RespError, ConnectionError):
+            self.errors += 1
+            raise
+
+    async def get(self, key: str) -> Optional[str]:
+        return as_text(await self.execute('GET', self._key(key)))
+
+    async def set(self, key: str, value: str, ttl: Optional[float] = None):
+        if ttl is None:
+            await self.execute('SET', self._key(key), value)
+        else:
+            await self.execute('SET', self._key(key), value, 'PX', int(ttl * 1000))
+
+    async def delete(self, *keys: str) -> int:
+        if not keys:
+            return 0
+        return await self.execute('DEL', *[self._key(key) for key in keys])
+
+    async def push(self, key: str, value: str, max_len: int, ttl: Optional[float] = None):
+        # Queued back to back on the pipeline, so no other command lands in between
+        key = self._key(key)
+        commands = [self.execute('RPUSH', key, value), self.execute('LTRIM', key, -max_len, -1)]
+        if ttl is not None:
+            commands.append(self.execute('PEXPIRE', key, int(ttl * 1000)))
+        await asyncio.gather(*commands)
+
+    async def range(self, key: str) -> List[str]:
+        return [as_text(item) for item in await self.execute('LRANGE', self._key(key), 0, -1)]
+
+    async def expire(self, key: str, ttl: float):
+        await self.execute('PEXPIRE', self._key(key), int(ttl * 1000))
+
+    async def keys(self, pattern: str) -> List[str]:
+        keys = await self.execute('KEYS', self._key(pattern))
+        return [as_text(key)[len(self.prefix):] for key in keys]
+
+    async def publish(self, channel: str, message: str) -> int:
+        return await self.execute('PUBLISH', self._key(channel), message)
+
+    async def subscribe(self, channel: str, callback: MessageCallback):
+        first = channel not in self._callbacks
+        self._callbacks.setdefault(channel, []).append(callback)
+        if self._subscriber_task is None:
+            self._subscribed = asyncio.Event()
+            self._subscriber_task = asyncio.create_task(self._run_subscriber())
+            # Don't return before messages can arrive
+            await asyncio.wait_for(self._subscribed.wait(), self.connect_timeout)
+        elif first and self._subscriber_writer is not None:
+            self._subscriber_writer.write(encode_command('SUBSCRIBE', self._key(channel)))
+
+    async def _run_subscriber(self):
+        while True:
+            writer = None
+            try:
+                reader, writer = await self._open()
+                self._subscriber_writer = writer
+                writer.write(encode_command('SUBSCRIBE', *[self._key(channel) for channel in self._callbacks]))
+                while True:
+                    reply = await read_reply(reader)
+                    if not isinstance(reply, list) or not reply:
+                        continue
+                    kind = as_text(reply[0])
+                    if kind == 'subscribe':
+                        self._subscribed.set()
+                    elif kind == 'message':
+                        self._dispatch(as_text(reply[1])[len(self.prefix):], as_text(reply[2]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"State store subscriber disconnected: {e}; reconnecting")
+            finally:
+                self._subscriber_writer = None
+                if writer is not None:
+                    writer.close()
+            await asyncio.sleep(1.0)
+
+    def _dispatch(self, channel: str, message: str):
+        self.messages_received += 1
+        for callback in self._callbacks.get(channel, ()):
+            try:
+                callback(message)
+            except Exception as e:
+                logger.error(f"State store subscriber for {channel} failed: {e}")
+
+    async def close(self):
+        tasks = [task for task in (self._reader_task, self._subscriber_task) if task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._reader_task = self._subscriber_task = None
+        self._drop(ConnectionError("State store closed"))
+        self._callbacks.clear()
+
+    def get_stats(self) -> Dict:
+        return {
+            'backend': self.name,
+            'server': f"{self.host}:{self.port}/{self.db}",
+            'connected': self._writer is not None,
+            'subscribed': self._subscriber_writer is not None,
+            'commands': self.commands,
+            'errors': self.errors,
+            'connects': self.connects,
+            'in_flight': len(self._pending),
+            'messages_received': self.messages_received
+        }
+
+
+def create_state_store(backend: str, url: Optional[str] = None, prefix: str = "earbud:") -> StateStore:
+    """Build the configured shared-state backend"""
+    if backend == "memory":
+        return MemoryStateStore()
+    if backend == "redis":
+        return RedisStateStore(url or "redis://127.0.0.1:6379/0", prefix=prefix)
+    raise ValueError(f"Unknown state backend: {backend}")
@@ -0,0 +1,160 @@
+import asyncio
+from typing import Awaitable, Callable, Optional
+import logging
+
+from .stt_engines import STTEngine
+from .transcription_executor import TranscriptionExecutor, TranscriptionQueueFull
+from ..utils.ring_buffer import PCMRingBuffer
+
+logger = logging.getLogger(__name__)
+
+# on_transcript(text, confidence, is_final)
+TranscriptCallback = Callable[[str, float, bool], Awaitable[None]]
+# on_final_submitted(future) - takes over a queued final transcription
+FinalCallback = Callable[[asyncio.Future], Awaitable[None]]
+
+
+class StreamingTranscriber:
+    """
+    Per-connection streaming STT stage.
+    Keeps the current utterance in a ring buffer, requests partial
+    transcriptions in the background as audio arrives and a final one
+    when the utterance ends. With on_final_submitted, the final is handed
+    off as a pending future instead of being awaited here.
+    """
+
+    def __init__(
+        self,
+        client_id: str,
+        engine: STTEngine,
+        executor: TranscriptionExecutor,
+        on_transcript: TranscriptCallback,
+        sample_rate: int = 16000,
+        max_seconds: float = 15.0,
+        partial_interval_ms: int = 300,
+        on_final_submitted: Optional[FinalCallback] = None
+    ):
+        self.client_id = client_id
+        self.engine = engine
+        self.executor = executor
+        self.on_transcript = on_transcript
+        self.on_final_submitted = on_final_submitted
+        self.sample_rate = sample_rate
+
+        self._ring = PCMRingBuffer(int(max_seconds * sample_rate * 2))
+        self._partial_interval_ms = max(partial_interval_ms, engine.min_partial_interval_ms)
+        self._utterance_start = 0
+        self._last_partial_at = 0
+        self._utterance_id = 0
+        self._partial_task: Optional[asyncio.Task] = None
+        self._last_partial_text: Optional[str] = None
+
+        self.expected_sequence: Optional[int] = None
+        self.frames_received = 0
+        self.frames_missing = 0
+
+    @property
+    def utterance_bytes(self) -> int:
+        return self._ring.total_written - self._utterance_start
+
+    def _bytes_for_ms(self, ms: int) -> int:
+        return int(self.sample_rate * ms / 1000) * 2
+
+    def track_sequence(self, sequence: int) -> int:
+        """Count frames and sequence gaps (frames dropped in transit); returns the gap"""
+        missing = 0
+        if self.expected_sequence is not None and sequence != self.expected_sequence:
+            missing = (sequence - self.expected_sequence) & 0xFFFFFFFF
+            self.frames_missing += missing
+            logger.debug(f"Frame sequence gap for {self.client_id}: expected {self.expected_sequence}, got {sequence}")
+        self.expected_sequence = (sequence + 1) & 0xFFFFFFFF
+        self.frames_received += 1
+        return missing
+
+    async def feed(
+        self,
+        pcm_data,
+        sample_rate: int,
+        end_of_utterance: bool = False
+    ):
+        """
+        Append PCM for the current utterance.
+        Raises TranscriptionQueueFull if the final transcription can't be queued.
+        """
+        if sample_rate != self.sample_rate:
+            # A rate change mid-utterance can't be mixed into the same buffer
+            if self.utterance_bytes:
+                await self.finish_utterance()
+            self.sample_rate = sample_rate
+
+        self._ring.write(pcm_data)
+
+        if end_of_utterance or self.utterance_bytes >= self._ring.capacity:
+            await self.finish_utterance()
+            return
+
+        self._maybe_request_partial()
+
+    def _maybe_request_partial(self):
+        if not self.engine.supports_partials:
+            return
+        if self._partial_task is not None and not self._partial_task.done():
+            return
+        if self._ring.total_written - self._last_partial_at < self._bytes_for_ms(self._partial_interval_ms):
+            return
+
+        self._last_partial_at = self._ring.total_written
+        pcm = self._ring.read_since(self._utterance_start)
+        self._partial_task = asyncio.create_task(
+            self._run_partial(self._utterance_id, pcm, self.sample_rate)
+        )
+
+    async def _run_partial(self, utterance_id: int, pcm: bytes, sample_rate: int):
+        try:
+            text, confidence = await self.executor.submit_pcm(
+                self.client_id, self.engine, pcm, sample_rate, False
+            )
+        except TranscriptionQueueFull:
+            # Partials are best-effort; the final will still be requested
+            return
+        except Exception as e:
+            logger.error(f"Partial transcription failed for {self.client_id}: {e}")
+            return
+
+        if utterance_id != self._utterance_id or not text or text == self._last_partial_text:
+            return
+
+        self._last_partial_text = text
+        await self.on_transcript(text, confidence, False)
+
+    def _cancel_partial(self):
+        if self._partial_task is not None and not self._partial_task.done():
+            self._partial_task.cancel()
+        self._partial_task = None
+
+    async def finish_utterance(self):
+        """Transcribe the buffered utterance as final and start a new one"""
+        pcm = self._ring.read_since(self._utterance_start)
+        sample_rate = self.sample_rate
+
+        self._cancel_partial()
+        self._utterance_id += 1
+        self._utterance_start = self._ring.total_written
+        self._last_partial_at = self._ring.total_written
+        self._last_partial_text = None
+
+        if not pcm:
+            return
+
+        future = self.executor.submit_pcm(
+            self.client_id, self.engine, pcm, sample_rate, True
+        )
+        if self.on_final_submitted is not None:
+            await self.on_final_submitted(future)
+            return
+        text, confidence = await future
+        if text:
+            await self.on_transcript(text, confidence, True)
+
+    def close(self):
+        self._cancel_partial()
@@ -0,0 +1,135 @@
+from typing import Dict, Optional, Tuple
+import logging
+import math
+import time
+
+from ..utils.audio_processor import read_wav
+
+logger = logging.getLogger(__name__)
+
+
+class STTEngine:
+    """
+    Interface for speech-to-text engines used by the streaming transcriber.
+    transcribe() is blocking and runs on the transcription pool.
+    """
+
+    name = "base"
+    supports_partials = True
+    # Lower bound on how often partials are requested from this engine
+    min_partial_interval_ms = 0
+
+    def transcribe(
+        self,
+        pcm_data: bytes,
+        sample_rate: int,
+        final: bool = False
+    ) -> Tuple[Optional[str], float]:
+        """
+        Transcribe 16-bit mono PCM for the utterance so far.
+        Returns: (text, confidence)
+        """
+        raise NotImplementedError
+
+    def transcribe_wav(self, audio_data: bytes) -> Tuple[Optional[str], float]:
+        """Transcribe a complete WAV payload (audio_chunk messages, /api/voice)"""
+        try:
+            samples, sample_rate = read_wav(audio_data)
+        except Exception as e:
+            logger.error(f"Could not decode WAV for {self.name}: {e}")
+            return None, 0.0
+        return self.transcribe(samples.tobytes(), sample_rate, final=True)
+
+    def warmup(self):
+        """Load models ahead of the first request (blocking; runs off the event loop)"""
+
+    def close(self):
+        """Release engine resources"""
+
+    def get_stats(self) -> Dict:
+        return {'engine': self.name}
+
+
+class GoogleSTTEngine(STTEngine):
+    """Google Web Speech via SpeechProcessor. Every call re-recognizes the whole utterance."""
+
+    name = "google"
+    min_partial_interval_ms = 1000
+
+    def __init__(self, speech_processor):
+        self.speech_processor = speech_processor
+
+    def transcribe(self, pcm_data: bytes, sample_rate: int, final: bool = False):
+        return self.speech_processor.process_pcm(pcm_data, sample_rate)
+
+    def transcribe_wav(self, audio_data: bytes):
+        return self.speech_processor.process_audio_chunk(audio_data)
+
+
+class ScriptedSTTEngine(STTEngine):
+    """
+    Local stand-in for tests and benchmarks.
+    Reveals a fixed transcript word by word in proportion to the audio
+    duration, so partials grow as audio arrives; finals return all of it.
+    latency_ms simulates recognition time (the call blocks its worker);
+    cpu_ms simulates CPU-bound recognition by spinning for that long.
+    """
+
+    name = "scripted"
+
+    def __init__(
+        self,
+        transcript: str,
+        words_per_second: float = 2.5,
+        confidence: float = 0.9,
+        latency_ms: float = 0,
+        cpu_ms: float = 0
+    ):
+        self.words = transcript.split()
+        self.words_per_second = words_per_second
+        self.confidence = confidence
+        self.latency_ms = latency_ms
+        self.cpu_ms = cpu_ms
+
+    def transcribe(self, pcm_data: bytes, sample_rate: int, final: bool = False):
+        if not pcm_data or not self.words:
+            return None, 0.0
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        if self.cpu_ms:
+            spin_until = time.perf_counter() + self.cpu_ms / 1000
+            while time.perf_counter() < spin_until:
+                pass
+
+        if final:
+            return ' '.join(self.words), self.confidence
+
+        duration = len(pcm_data) / (2 * sample_rate)
+        count = min(len(self.words), math.ceil(duration * self.words_per_second))
+        if count == 0:
+            return None, 0.0
+        return ' '.join(self.words[:count]), self.confidence * 0.8
+
+
+def create_stt_engine(name: str, speech_processor=None, settings=None) -> STTEngine:
+    """Build the configured STT engine (local engines import their package lazily)"""
+    if name == "google":
+        return GoogleSTTEngine(speech_processor)
+    if name == "scripted":
+        return ScriptedSTTEngine(
+            settings.scripted_stt_transcript if settings else "",
+            latency_ms=settings.scripted_stt_latency_ms if settings else 0,
+            cpu_ms=settings.scripted_stt_cpu_ms if settings else 0
+        )
+    if name == "whisper":
+        from .local_stt import WhisperSTTEngine
+        return WhisperSTTEngine(
+            model_name=settings.whisper_model,
+            language=settings.stt_language or None,
+            batch_size=settings.stt_batch_size,
+            batch_window_ms=settings.stt_batch_window_ms
+        )
+    if name == "vosk":
+        from .local_stt import VoskSTTEngine
+        return VoskSTTEngine(settings.vosk_model_path)
+    raise ValueError(f"Unknown STT engine: {name}")
@@ -0,0 +1,237 @@
+from array import array
+from collections import deque
+from typing import Deque, Dict, Iterable, List, Optional, Tuple
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Pipeline stages in the order they happen
+STAGES = (
+    'receive', 'decode', 'vad', 'stt_queue', 'stt', 'noise_filter', 'detection',
+    'context', 'llm_first_token', 'llm_complete', 'send', 'total'
+)
+
+# Bucket bounds (seconds) for the Prometheus export
+EXPORT_BOUNDS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0
+)
+
+
+class LatencyHistogram:
+    """
+    HDR-style histogram of microsecond latencies with ~1% relative error.
+    Values below 128us are counted exactly; above that each power of two
+    is split into 64 linear sub-buckets, so recording is a bit_length and
+    a shift with no search, and memory is bounded (about 2k counters).
+    """
+
+    SUB_BUCKET_BITS = 7
+    SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+    HALF = SUB_BUCKETS >> 1
+    MAX_VALUE_US = (1 << 36) - 1  # ~19 hours
+
+    def __init__(self):
+        self.counts = array('Q', bytes(8 * self._index(self.MAX_VALUE_US) + 8))
+        self.count = 0
+        self.total_us = 0
+        self.max_us = 0
+
+    @classmethod
+    def _index(cls, value: int) -> int:
+        if value < cls.SUB_BUCKETS:
+            return value
+        shift = value.bit_length() - cls.SUB_BUCKET_BITS
+        return cls.SUB_BUCKETS + (shift - 1) * cls.HALF + ((value >> shift) - cls.HALF)
+
+    @classmethod
+    def _upper_bound(cls, index: int) -> int:
+        """Largest value counted in bucket index"""
+        if index < cls.SUB_BUCKETS:
+            return index
+        shift = (index - cls.SUB_BUCKETS) // cls.HALF + 1
+        sub = (index - cls.SUB_BUCKETS) % cls.HALF + cls.HALF
+        return ((sub + 1) << shift) - 1
+
+    def record(self, seconds: float):
+        value = int(seconds * 1_000_000)
+        if value < 0:
+            value = 0
+        elif value > self.MAX_VALUE_US:
+            value = self.MAX_VALUE_US
+        self.counts[self._index(value)] += 1
+        self.count += 1
+        self.total_us += value
+        if value > self.max_us:
+            self.max_us = value
+
+    def percentile(self, p: float) -> float:
+        """Latency in seconds at percentile p (0-1)"""
+        if not self.count:
+            return 0.0
+        target = max(1, int(p * self.count + 0.5))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if count:
+                seen += count
+                if seen >= target:
+                    return min(self._upper_bound(index), self.max_us) / 1_000_000
+        return self.max_us / 1_000_000
+
+    def cumulative(self, bounds: Iterable[float]) -> List[Tuple[float, int]]:
+        """(bound, count of values <= bound) for each bound in seconds"""
+        result = []
+        seen = 0
+        index = 0
+        counts = self.counts
+        for bound in bounds:
+            limit = self._index(min(int(bound * 1_000_000), self.MAX_VALUE_US))
+            while index <= limit:
+                seen += counts[index]
+                index += 1
+            result.append((bound, seen))
+        return result
+
+    def reset(self):
+        self.__init__()
+
+    def summary(self) -> Dict:
+        return {
+            'count': self.count,
+            'avg_ms': round(self.total_us / self.count / 1000, 3) if self.count else 0.0,
+            'p50_ms': round(self.percentile(0.50) * 1000, 3),
+            'p95_ms': round(self.percentile(0.95) * 1000, 3),
+            'p99_ms': round(self.percentile(0.99) * 1000, 3),
+            'max_ms': round(self.max_us / 1000, 3)
+        }
+
+
+class Span:
+    """Times one stage: `with trace.span('vad'): ...`"""
+
+    __slots__ = ('trace', 'stage', 'start')
+
+    def __init__(self, trace: "Trace", stage: str):
+        self.trace = trace
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.trace.record(self.stage, self.start, time.perf_counter())
+        return False
+
+
+class Trace:
+    """Stage spans of one request, from the first byte to the response"""
+
+    __slots__ = ('tracer', 'client_id', 'started', 'spans', 'finished')
+
+    def __init__(self, tracer: "Tracer", client_id: str, started: Optional[float] = None):
+        self.tracer = tracer
+        self.client_id = client_id
+        self.started = started if started is not None else time.perf_counter()
+        self.spans: List[Tuple[str, float, float]] = []
+        self.finished = False
+
+    def span(self, stage: str) -> Span:
+        return Span(self, stage)
+
+    def record(self, stage: str, start: float, end: float, observe: bool = True):
+        """Add a span; observe=False for marker spans, or when the stage histogram is fed elsewhere"""
+        self.spans.append((stage, start, end))
+        if observe:
+            self.tracer.record(stage, end - start)
+
+    def finish(self):
+        """Record the end-to-end time and keep the trace for /api/traces"""
+        if self.finished:
+            return
+        self.finished = True
+        now = time.perf_counter()
+        self.tracer.record('total', now - self.started)
+        self.tracer.keep(self, now)
+
+    def to_dict(self, ended: float) -> Dict:
+        return {
+            'client_id': self.client_id,
+            'total_ms': round((ended - self.started) * 1000, 3),
+            'spans': [
+                {
+                    'stage': stage,
+                    'offset_ms': round((start - self.started) * 1000, 3),
+                    'duration_ms': round((end - start) * 1000, 3)
+                }
+                for stage, start, end in self.spans
+            ]
+        }
+
+
+class Tracer:
+    """
+    Per-stage latency histograms plus the most recent request traces.
+    Recording is a dict lookup and an array increment, so it is cheap
+    enough to leave on in production.
+    """
+
+    def __init__(self, enabled: bool = True, history_size: int = 200, namespace: str = "earbud"):
+        self.enabled = enabled
+        self.namespace = namespace
+        self.histograms: Dict[str, LatencyHistogram] = {stage: LatencyHistogram() for stage in STAGES}
+        self.recent: Deque[Dict] = deque(maxlen=history_size)
+
+    def trace(self, client_id: str, started: Optional[float] = None) -> Trace:
+        return Trace(self, client_id, started)
+
+    def record(self, stage: str, seconds: float):
+        if not self.enabled:
+            return
+        histogram = self.histograms.get(stage)
+        if histogram is None:
+            histogram = self.histograms[stage] = LatencyHistogram()
+        histogram.record(seconds)
+
+    def keep(self, trace: Trace, ended: float):
+        if self.enabled:
+            self.recent.append(trace.to_dict(ended))
+
+    def reset(self):
+        for histogram in self.histograms.values():
+            histogram.reset()
+        self.recent.clear()
+
+    def get_stats(self) -> Dict:
+        return {
+            stage: histogram.summary()
+            for stage, histogram in self.histograms.items() if histogram.count
+        }
+
+    def get_traces(self, limit: int = 20) -> List[Dict]:
+        return list(self.recent)[-limit:]
+
+    def render_prometheus(self) -> str:
+        """Histograms in the Prometheus text exposition format (0.0.4)"""
+        name = f"{self.namespace}_stage_latency_seconds"
+        lines = [
+            f"# HELP {name} Latency of each question pipeline stage.",
+            f"# TYPE {name} histogram"
+        ]
+        quantiles = []
+        for stage, histogram in self.histograms.items():
+            for bound, count in histogram.cumulative(EXPORT_BOUNDS):
+                lines.append(f'{name}_bucket{{stage="{stage}",le="{bound:g}"}} {count}')
+            lines.append(f'{name}_bucket{{stage="{stage}",le="+Inf"}} {histogram.count}')
+            lines.append(f'{name}_sum{{stage="{stage}"}} {histogram.total_us / 1_000_000:.6f}')
+            lines.append(f'{name}_count{{stage="{stage}"}} {histogram.count}')
+            for q in (0.5, 0.95, 0.99):
+                quantiles.append(
+                    f'{name}_quantile{{stage="{stage}",quantile="{q:g}"}} {histogram.percentile(q):.6f}'
+                )
+
+        lines.append(f"# HELP {name}_quantile Stage latency percentiles from the HDR histograms.")
+        lines.append(f"# TYPE {name}_quantile gauge")
+        lines.extend(quantiles)
+        return '\n'.join(lines) + '\n'
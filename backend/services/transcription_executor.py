@@ -0,0 +1,304 @@
+import asyncio
+from collections import OrderedDict, deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Optional
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Per-process STT engine used when the pool runs in process mode
+_worker_engine = None
+
+
+def _init_worker(stt_engine: str):
+    """Process pool initializer - builds the configured STT engine once per worker process"""
+    global _worker_engine
+    from ..config import settings
+    from .speech_processor import SpeechProcessor
+    from .stt_engines import create_stt_engine
+    speech_processor = SpeechProcessor() if stt_engine == "google" else None
+    _worker_engine = create_stt_engine(stt_engine, speech_processor, settings)
+
+
+def _transcribe_in_worker(audio_data: bytes):
+    """Process pool entry point for WAV payloads"""
+    return _worker_engine.transcribe_wav(audio_data)
+
+
+def _transcribe_pcm_in_worker(pcm_data: bytes, sample_rate: int, final: bool):
+    """Process pool entry point for streamed PCM"""
+    return _worker_engine.transcribe(pcm_data, sample_rate, final)
+
+
+class TranscriptionQueueFull(Exception):
+    """Raised when a job cannot be queued without exceeding the configured bounds."""
+
+    def __init__(self, client_id: str, queue_depth: int, client_depth: int):
+        self.client_id = client_id
+        self.queue_depth = queue_depth
+        self.client_depth = client_depth
+        super().__init__(
+            f"Transcription queue full for {client_id} "
+            f"(total={queue_depth}, client={client_depth})"
+        )
+
+
+class _Job:
+    __slots__ = ('client_id', 'fn', 'args', 'future', 'enqueued_at')
+
+    def __init__(self, client_id: str, fn: Callable, args: tuple, future: asyncio.Future):
+        self.client_id = client_id
+        self.fn = fn
+        self.args = args
+        self.future = future
+        self.enqueued_at = time.perf_counter()
+
+
+class TranscriptionExecutor:
+    """
+    Runs blocking speech-to-text work off the event loop.
+    Jobs are queued per client and dispatched round-robin so one
+    chatty listener can't starve the others; the total queue is bounded
+    and callers get TranscriptionQueueFull instead of unbounded buffering.
+    In process mode each worker process builds its own copy of the
+    STT engine (by name, from settings) and transcriptions run on it.
+    """
+
+    def __init__(
+        self,
+        speech_processor=None,
+        stt_engine=None,
+        mode: str = "thread",
+        max_workers: int = 4,
+        max_queue_size: int = 64,
+        max_pending_per_client: int = 8,
+        tracer=None
+    ):
+        if mode not in ("thread", "process"):
+            raise ValueError(f"Unknown transcription executor mode: {mode}")
+
+        self.speech_processor = speech_processor
+        self.stt_engine = stt_engine
+        self.mode = mode
+        self.max_workers = max_workers
+        self.max_queue_size = max_queue_size
+        self.max_pending_per_client = max_pending_per_client
+        self.tracer = tracer
+
+        self._pool: Optional[Executor] = None
+        self._workers: list = []
+        self._queues: "OrderedDict[str, Deque[_Job]]" = OrderedDict()
+        self._available: Optional[asyncio.Semaphore] = None
+        self._queue_depth = 0
+        self._in_flight = 0
+
+        # Metrics
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._max_queue_depth = 0
+        self._wait_times: Deque[float] = deque(maxlen=1000)
+
+    def start(self):
+        """Start the pool ahead of the first job (must be called on the running loop)"""
+        self._ensure_started()
+
+    def _ensure_started(self):
+        """Start the pool and dispatch workers lazily on the running loop"""
+        if self._workers:
+            return
+
+        if self.mode == "process":
+            engine = self.stt_engine.name if self.stt_engine is not None else "google"
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                initializer=_init_worker,
+                initargs=(engine,)
+            )
+        else:
+            self._pool = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix="transcription"
+            )
+
+        self._available = asyncio.Semaphore(0)
+        self._workers = [
+            asyncio.create_task(self._worker_loop())
+            for _ in range(self.max_workers)
+        ]
+        logger.info(
+            f"Transcription executor started: {self.max_workers} {self.mode} workers, "
+            f"queue={self.max_queue_size}, per_client={self.max_pending_per_client}"
+        )
+
+    def client_depth(self, client_id: str) -> int:
+        """Number of jobs waiting for a client"""
+        queue = self._queues.get(client_id)
+        return len(queue) if queue else 0
+
+    def submit(self, client_id: str, fn: Callable, *args: Any) -> asyncio.Future:
+        """
+        Queue fn(*args) for a client and return a future for its result.
+        In process mode fn and args must be picklable.
+        Raises TranscriptionQueueFull when the total or per-client bound is hit.
+        """
+        self._ensure_started()
+
+        client_depth = self.client_depth(client_id)
+        if (
+            self._queue_depth >= self.max_queue_size or
+            client_depth >= self.max_pending_per_client
+        ):
+            self._rejected += 1
+            raise TranscriptionQueueFull(client_id, self._queue_depth, client_depth)
+
+        future = asyncio.get_running_loop().create_future()
+        job = _Job(client_id, fn, args, future)
+
+        queue = self._queues.get(client_id)
+        if queue is None:
+            queue = self._queues[client_id] = deque()
+        queue.append(job)
+
+        self._queue_depth += 1
+        self._submitted += 1
+        self._max_queue_depth = max(self._max_queue_depth, self._queue_depth)
+        self._available.release()
+        return future
+
+    def submit_transcription(self, client_id: str, audio_data: bytes) -> asyncio.Future:
+        """
+        Queue a WAV payload; the future resolves to (text, confidence).
+        Uses the STT engine when one is set (Google recognition otherwise).
+        """
+        if self.mode == "process":
+            return self.submit(client_id, _transcribe_in_worker, audio_data)
+        if self.stt_engine is not None:
+            return self.submit(client_id, self.stt_engine.transcribe_wav, audio_data)
+        return self.submit(client_id, self.speech_processor.process_audio_chunk, audio_data)
+
+    def submit_pcm(
+        self,
+        client_id: str,
+        engine,
+        pcm_data: bytes,
+        sample_rate: int,
+        final: bool = False
+    ) -> asyncio.Future:
+        """
+        Queue 16-bit mono PCM for engine.transcribe(); the future resolves
+        to (text, confidence). Process mode uses the workers' own engine.
+        """
+        if self.mode == "process":
+            return self.submit(client_id, _transcribe_pcm_in_worker, pcm_data, sample_rate, final)
+        return self.submit(client_id, engine.transcribe, pcm_data, sample_rate, final)
+
+    async def transcribe(self, client_id: str, audio_data: bytes):
+        """Transcribe a WAV payload through the pool. Returns (text, confidence)."""
+        return await self.submit_transcription(client_id, audio_data)
+
+    def _next_job(self) -> Optional[_Job]:
+        """Pop the next job, rotating across clients"""
+        if not self._queues:
+            return None
+
+        client_id, queue = next(iter(self._queues.items()))
+        job = queue.popleft()
+        if queue:
+            self._queues.move_to_end(client_id)
+        else:
+            del self._queues[client_id]
+        self._queue_depth -= 1
+        return job
+
+    async def _worker_loop(self):
+        loop = asyncio.get_running_loop()
+
+        while True:
+            await self._available.acquire()
+            job = self._next_job()
+            if job is None or job.future.cancelled():
+                continue
+
+            started = time.perf_counter()
+            self._wait_times.append(started - job.enqueued_at)
+            if self.tracer is not None:
+                self.tracer.record('stt_queue', started - job.enqueued_at)
+            self._in_flight += 1
+            try:
+                result = await loop.run_in_executor(self._pool, job.fn, *job.args)
+            except asyncio.CancelledError:
+                if not job.future.done():
+                    job.future.cancel()
+                raise
+            except Exception as e:
+                self._failed += 1
+                logger.error(f"Transcription job failed for {job.client_id}: {e}")
+                if not job.future.done():
+                    job.future.set_exception(e)
+            else:
+                self._completed += 1
+                if self.tracer is not None:
+                    self.tracer.record('stt', time.perf_counter() - started)
+                if not job.future.done():
+                    job.future.set_result(result)
+            finally:
+                self._in_flight -= 1
+
+    def cancel_client(self, client_id: str):
+        """Drop any queued (not yet running) jobs for a client"""
+        queue = self._queues.pop(client_id, None)
+        if not queue:
+            return
+        for job in queue:
+            job.future.cancel()
+        self._queue_depth -= len(queue)
+
+    def get_metrics(self) -> Dict:
+        """Queue depth, throughput and wait-time statistics"""
+        waits = sorted(self._wait_times)
+
+        def percentile(p: float) -> float:
+            if not waits:
+                return 0.0
+            return waits[min(len(waits) - 1, int(p * len(waits)))] * 1000
+
+        return {
+            'mode': self.mode,
+            'workers': self.max_workers,
+            'queue_depth': self._queue_depth,
+            'max_queue_depth': self._max_queue_depth,
+            'max_queue_size': self.max_queue_size,
+            'in_flight': self._in_flight,
+            'clients_waiting': len(self._queues),
+            'submitted': self._submitted,
+            'completed': self._completed,
+            'failed': self._failed,
+            'rejected': self._rejected,
+            'wait_ms': {
+                'avg': (sum(waits) / len(waits) * 1000) if waits else 0.0,
+                'p50': percentile(0.50),
+                'p95': percentile(0.95),
+                'max': waits[-1] * 1000 if waits else 0.0
+            }
+        }
+
+    async def shutdown(self):
+        """Stop workers and release the pool"""
+        for worker in self._workers:
+            worker.cancel()
+        for worker in self._workers:
+            try:
+                await worker
+            except asyncio.CancelledError:
+                pass
+        self._workers = []
+
+        for client_id in list(self._queues):
+            self.cancel_client(client_id)
+
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
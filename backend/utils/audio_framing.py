@@ -0,0 +1,121 @@
+from typing import Iterable, Iterator
+import struct
+
+# Binary audio frame layout (network byte order, 14 bytes):
+#   magic       2s  b"EA"
+#   version     B
+#   codec       B   CODEC_*
+#   flags       B   FLAG_*
+#   channels    B
+#   sequence    I   per-connection frame counter
+#   sample_rate I
+# followed by the raw codec payload.
+FRAME_MAGIC = b"EA"
+FRAME_VERSION = 1
+FRAME_HEADER = struct.Struct("!2sBBBBII")
+
+CODEC_PCM16 = 0  # little-endian signed 16-bit PCM
+CODEC_OPUS = 1
+CODEC_WAV = 2    # complete WAV file, handled like a JSON audio_chunk
+
+CODEC_NAMES = {CODEC_PCM16: "pcm16", CODEC_OPUS: "opus", CODEC_WAV: "wav"}
+
+FLAG_END_OF_UTTERANCE = 0x01
+
+# Outside WebSocket messages (e.g. an /api/voice upload), frames are
+# concatenated, each prefixed with its length as a uint32.
+FRAME_STREAM_MEDIA_TYPE = "application/x-earbud-frames"
+FRAME_LENGTH = struct.Struct("!I")
+
+
+class FrameError(ValueError):
+    """Raised for malformed binary audio frames."""
+
+
+class AudioFrame:
+    """A parsed binary frame. payload is a memoryview into the received message."""
+
+    __slots__ = ('sequence', 'codec', 'flags', 'channels', 'sample_rate', 'payload')
+
+    def __init__(
+        self,
+        sequence: int,
+        codec: int,
+        flags: int,
+        channels: int,
+        sample_rate: int,
+        payload: memoryview
+    ):
+        self.sequence = sequence
+        self.codec = codec
+        self.flags = flags
+        self.channels = channels
+        self.sample_rate = sample_rate
+        self.payload = payload
+
+    @property
+    def end_of_utterance(self) -> bool:
+        return bool(self.flags & FLAG_END_OF_UTTERANCE)
+
+
+def parse_frame(data: bytes) -> AudioFrame:
+    """Parse a binary WebSocket message without copying the payload"""
+    if len(data) < FRAME_HEADER.size:
+        raise FrameError(f"Frame too short: {len(data)} bytes")
+
+    magic, version, codec, flags, channels, sequence, sample_rate = FRAME_HEADER.unpack_from(data)
+    if magic != FRAME_MAGIC:
+        raise FrameError("Bad frame magic")
+    if version != FRAME_VERSION:
+        raise FrameError(f"Unsupported frame version: {version}")
+    if codec not in CODEC_NAMES:
+        raise FrameError(f"Unknown codec: {codec}")
+    if sample_rate == 0:
+        raise FrameError("Invalid sample rate: 0")
+
+    payload = memoryview(data)[FRAME_HEADER.size:]
+    return AudioFrame(sequence, codec, flags, channels, sample_rate, payload)
+
+
+def encode_frame(
+    payload: bytes,
+    sequence: int,
+    sample_rate: int,
+    codec: int = CODEC_PCM16,
+    flags: int = 0,
+    channels: int = 1
+) -> bytes:
+    """Build a binary frame (used by clients, tools and load generators)"""
+    header = FRAME_HEADER.pack(
+        FRAME_MAGIC, FRAME_VERSION, codec, flags, channels,
+        sequence & 0xFFFFFFFF, sample_rate
+    )
+    return header + payload
+
+
+
+def pack_frames(frames: Iterable[bytes]) -> bytes:
+    """Concatenate encoded frames into a length-prefixed frame stream"""
+    return b''.join(FRAME_LENGTH.pack(len(frame)) + frame for frame in frames)
+
+
+def is_frame_stream(data: bytes) -> bool:
+    return (
+        len(data) >= FRAME_LENGTH.size + FRAME_HEADER.size and
+        data[FRAME_LENGTH.size:FRAME_LENGTH.size + 2] == FRAME_MAGIC
+    )
+
+
+def iter_frames(data: bytes) -> Iterator[AudioFrame]:
+    """Parse a length-prefixed frame stream; payloads are views into data"""
+    view = memoryview(data)
+    offset = 0
+    while offset < len(view):
+        if offset + FRAME_LENGTH.size > len(view):
+            raise FrameError("Truncated frame length")
+        (size,) = FRAME_LENGTH.unpack_from(view, offset)
+        offset += FRAME_LENGTH.size
+        if offset + size > len(view):
+            raise FrameError("Truncated frame")
+        yield parse_frame(view[offset:offset + size])
+        offset += size
@@ -0,0 +1,278 @@
+from collections import deque
+from typing import List, NamedTuple, Optional, Tuple
+import io
+import logging
+import wave
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class VADSegment(NamedTuple):
+    """Speech audio to forward to STT; end_of_utterance marks an endpoint after it."""
+    audio: np.ndarray
+    end_of_utterance: bool
+
+
+def to_float(samples: np.ndarray) -> np.ndarray:
+    """Scale integer PCM to float32 in [-1, 1]; float input is passed through"""
+    if samples.dtype.kind == 'f':
+        return samples.astype(np.float32, copy=False)
+    scale = float(np.iinfo(samples.dtype).max) + 1.0
+    return samples.astype(np.float32) / scale
+
+
+def frame_features(samples: np.ndarray, frame_length: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Short-time energy and zero-crossing rate for every whole frame.
+    Computed in one batched pass over a (frames, frame_length) view.
+    """
+    count = len(samples) // frame_length
+    if count == 0:
+        empty = np.empty(0, dtype=np.float32)
+        return empty, empty
+
+    frames = to_float(samples[:count * frame_length]).reshape(count, frame_length)
+    energy = np.einsum('ij,ij->i', frames, frames) / frame_length
+    signs = np.signbit(frames)
+    zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / (frame_length - 1)
+    return energy, zcr.astype(np.float32)
+
+
+def read_wav(audio_data: bytes) -> Tuple[np.ndarray, int]:
+    """Decode a mono 16-bit WAV payload. Returns (int16 samples, sample_rate)."""
+    with wave.open(io.BytesIO(audio_data), 'rb') as wav:
+        if wav.getsampwidth() != 2:
+            raise ValueError(f"Unsupported sample width: {wav.getsampwidth()}")
+        frames = wav.readframes(wav.getnframes())
+        samples = np.frombuffer(frames, dtype='<i2')
+        channels = wav.getnchannels()
+        if channels > 1:
+            samples = samples.reshape(-1, channels).mean(axis=1).astype(np.int16)
+        return samples, wav.getframerate()
+
+
+def pcm_to_wav(samples: np.ndarray, sample_rate: int) -> bytes:
+    """Wrap mono int16 samples in a WAV container"""
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(samples.astype('<i2', copy=False).tobytes())
+    return buffer.getvalue()
+
+
+def to_mono(samples: np.ndarray, channels: int) -> np.ndarray:
+    """Average interleaved channels; mono input is returned as-is (no copy)"""
+    if channels <= 1:
+        return samples
+    usable = len(samples) - len(samples) % channels
+    mixed = samples[:usable].reshape(-1, channels).mean(axis=1)
+    return mixed.astype(samples.dtype) if samples.dtype.kind != 'f' else mixed.astype(np.float32)
+
+
+class StreamingResampler:
+    """
+    Linear-interpolation resampler for a stream of frames.
+    The last input sample and the fractional position of the next output
+    sample carry over between calls, so frame boundaries line up exactly;
+    each frame is interpolated in one vectorized pass. There is no
+    anti-aliasing filter, which is acceptable for speech going to VAD/STT.
+    """
+
+    def __init__(self, source_rate: int, target_rate: int):
+        if source_rate <= 0 or target_rate <= 0:
+            raise ValueError(f"Invalid sample rates: {source_rate} -> {target_rate}")
+        self.source_rate = source_rate
+        self.target_rate = target_rate
+        self.step = source_rate / target_rate
+        self._last: Optional[float] = None
+        self._position = 0.0  # next output position, relative to self._last
+
+    def process(self, samples: np.ndarray) -> np.ndarray:
+        """Resample one frame; output keeps the input dtype"""
+        if samples.size == 0:
+            return samples
+        if self._last is None:
+            source = samples.astype(np.float32)
+        else:
+            source = np.empty(samples.size + 1, dtype=np.float32)
+            source[0] = self._last
+            source[1:] = samples
+
+        end = source.size - 1
+        position = self._position
+        count = int((end - position) // self.step) + 1 if position <= end else 0
+        positions = position + np.arange(count) * self.step
+        resampled = np.interp(positions, np.arange(source.size), source)
+
+        self._last = float(source[-1])
+        self._position = position + count * self.step - end
+
+        if samples.dtype.kind == 'f':
+            return resampled.astype(samples.dtype)
+        info = np.iinfo(samples.dtype)
+        return np.clip(np.rint(resampled), info.min, info.max).astype(samples.dtype)
+
+
+def resample(samples: np.ndarray, source_rate: int, target_rate: int) -> np.ndarray:
+    """One-shot resample; returns the input unchanged when the rates match"""
+    if source_rate == target_rate:
+        return samples
+    return StreamingResampler(source_rate, target_rate).process(samples)
+
+
+class VoiceActivityDetector:
+    """
+    Frame-level voice activity detection and endpointing.
+    A frame is speech when its energy clears an adaptive noise floor and its
+    zero-crossing rate looks voiced; an utterance starts after start_ms of
+    speech (with pre-roll) and ends after hangover_ms of silence.
+    """
+
+    def __init__(
+        self,
+        sample_rate: int = 16000,
+        frame_ms: int = 20,
+        energy_ratio: float = 3.0,
+        min_energy: float = 1e-5,
+        max_zcr: float = 0.35,
+        start_ms: int = 60,
+        hangover_ms: int = 500,
+        preroll_ms: int = 200,
+        max_utterance_ms: int = 15000
+    ):
+        self.sample_rate = sample_rate
+        self.frame_ms = frame_ms
+        self.frame_length = int(sample_rate * frame_ms / 1000)
+        self.energy_ratio = energy_ratio
+        self.min_energy = min_energy
+        self.max_zcr = max_zcr
+        self.start_frames = max(1, start_ms // frame_ms)
+        self.hangover_frames = max(1, hangover_ms // frame_ms)
+        self.max_utterance_frames = max(1, max_utterance_ms // frame_ms)
+
+        self.noise_floor: Optional[float] = None
+        self.in_speech = False
+        self._speech_run = 0
+        self._silence_run = 0
+        self._utterance_frames = 0
+        self._preroll: deque = deque(maxlen=max(self.start_frames, preroll_ms // frame_ms))
+        self._carry = np.empty(0, dtype=np.int16)
+
+        self.frames_processed = 0
+        self.speech_frames = 0
+
+    def _classify(self, energy: float, zcr: float) -> bool:
+        """Speech decision for one frame; updates the noise floor on non-speech"""
+        if self.noise_floor is None:
+            self.noise_floor = max(energy, self.min_energy / self.energy_ratio)
+
+        threshold = max(self.noise_floor * self.energy_ratio, self.min_energy)
+        # Loud frames count regardless of ZCR; moderate ones must look voiced
+        is_speech = energy > threshold * 4 or (energy > threshold and zcr < self.max_zcr)
+
+        # Drop quickly towards quieter frames, rise slowly (very slowly
+        # during speech) so stationary noise is eventually absorbed
+        if energy < self.noise_floor:
+            rate = 0.5
+        elif is_speech:
+            rate = 0.005
+        else:
+            rate = 0.05
+        self.noise_floor += (energy - self.noise_floor) * rate
+        self.noise_floor = max(self.noise_floor, self.min_energy / self.energy_ratio)
+        return is_speech
+
+    def contains_speech(self, samples: np.ndarray) -> bool:
+        """One-shot check: does any run of start_ms look like speech?"""
+        energy, zcr = frame_features(samples, self.frame_length)
+        if energy.size == 0:
+            return False
+
+        # Estimate the floor from the quietest frames of this buffer
+        floor = max(float(np.percentile(energy, 10)), self.min_energy / self.energy_ratio)
+        threshold = max(floor * self.energy_ratio, self.min_energy)
+        speech = (energy > threshold * 4) | ((energy > threshold) & (zcr < self.max_zcr))
+        if self.start_frames == 1:
+            return bool(speech.any())
+        runs = np.convolve(speech.astype(np.int8), np.ones(self.start_frames, dtype=np.int8), 'valid')
+        return bool((runs >= self.start_frames).any())
+
+    def process(self, samples: np.ndarray) -> List[VADSegment]:
+        """
+        Feed int16 samples; returns the speech segments to forward.
+        Silence outside utterances is dropped.
+        """
+        if self._carry.size:
+            samples = np.concatenate((self._carry, samples))
+
+        frame_length = self.frame_length
+        count = len(samples) // frame_length
+        self._carry = samples[count * frame_length:].copy()
+        if count == 0:
+            return []
+
+        energy, zcr = frame_features(samples, frame_length)
+        self.frames_processed += count
+
+        segments: List[VADSegment] = []
+        parts: List[np.ndarray] = []
+        run_start = 0
+
+        for i in range(count):
+            is_speech = self._classify(float(energy[i]), float(zcr[i]))
+            if is_speech:
+                self.speech_frames += 1
+
+            if not self.in_speech:
+                self._preroll.append(samples[i * frame_length:(i + 1) * frame_length].copy())
+                self._speech_run = self._speech_run + 1 if is_speech else 0
+                if self._speech_run >= self.start_frames:
+                    self.in_speech = True
+                    self._silence_run = 0
+                    self._utterance_frames = len(self._preroll)
+                    parts = list(self._preroll)
+                    self._preroll.clear()
+                    run_start = i + 1
+                continue
+
+            self._utterance_frames += 1
+            self._silence_run = 0 if is_speech else self._silence_run + 1
+
+            if (
+                self._silence_run >= self.hangover_frames or
+                self._utterance_frames >= self.max_utterance_frames
+            ):
+                parts.append(samples[run_start * frame_length:(i + 1) * frame_length])
+                segments.append(VADSegment(_join(parts), True))
+                parts = []
+                self.in_speech = False
+                self._speech_run = 0
+
+        if self.in_speech:
+            parts.append(samples[run_start * frame_length:count * frame_length])
+            segments.append(VADSegment(_join(parts), False))
+
+        return segments
+
+    def flush(self) -> List[VADSegment]:
+        """Force an endpoint (e.g. the client signalled end of utterance)"""
+        self._carry = np.empty(0, dtype=np.int16)
+        self._speech_run = 0
+        if not self.in_speech:
+            self._preroll.clear()
+            return []
+        self.in_speech = False
+        return [VADSegment(np.empty(0, dtype=np.int16), True)]
+
+
+def _join(parts: List[np.ndarray]) -> np.ndarray:
+    parts = [p for p in parts if p.size]
+    if not parts:
+        return np.empty(0, dtype=np.int16)
+    if len(parts) == 1:
+        return parts[0]
+    return np.concatenate(parts)
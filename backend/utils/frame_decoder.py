@@ -0,0 +1,60 @@
+from typing import Optional
+import numpy as np
+
+from .audio_framing import CODEC_NAMES, CODEC_OPUS, CODEC_PCM16, AudioFrame, FrameError, iter_frames
+from .audio_processor import StreamingResampler, to_mono
+from .opus_codec import OpusStreamDecoder
+
+
+class FrameDecoder:
+    """
+    Per-stream decoder from binary audio frames to mono int16 at
+    target_rate. PCM payloads stay views into the message unless they need
+    downmixing or resampling; Opus packets are decoded incrementally
+    (straight at target_rate when libopus supports it).
+    """
+
+    def __init__(self, target_rate: int = 16000):
+        self.target_rate = target_rate
+        self.opus: Optional[OpusStreamDecoder] = None
+        self._resampler: Optional[StreamingResampler] = None
+        self.bytes_in = 0
+
+    def decode(self, frame: AudioFrame, lost: int = 0) -> np.ndarray:
+        """Decode one PCM16 or Opus frame; lost counts frames missing before it"""
+        self.bytes_in += len(frame.payload)
+        if frame.codec == CODEC_PCM16:
+            samples = np.frombuffer(frame.payload, dtype='<i2')
+            rate = frame.sample_rate
+        elif frame.codec == CODEC_OPUS:
+            if self.opus is None or self.opus.channels != frame.channels:
+                self.opus = OpusStreamDecoder(self.target_rate, frame.channels)
+            samples = self.opus.decode(frame.payload, lost)
+            rate = self.opus.decode_rate
+        else:
+            raise FrameError(f"Unsupported codec: {CODEC_NAMES[frame.codec]}")
+
+        samples = to_mono(samples, frame.channels)
+        if rate == self.target_rate:
+            return samples
+        if self._resampler is None or self._resampler.source_rate != rate:
+            self._resampler = StreamingResampler(rate, self.target_rate)
+        return self._resampler.process(samples)
+
+    def get_stats(self) -> dict:
+        stats = {'bytes_in': self.bytes_in}
+        if self.opus is not None:
+            stats['opus'] = self.opus.get_stats()
+        return stats
+
+
+def decode_frame_stream(data: bytes, target_rate: int = 16000) -> np.ndarray:
+    """Decode a length-prefixed frame stream (e.g. an Opus upload) to mono int16"""
+    decoder = FrameDecoder(target_rate)
+    parts = []
+    expected = None
+    for frame in iter_frames(data):
+        lost = (frame.sequence - expected) & 0xFFFFFFFF if expected is not None else 0
+        expected = (frame.sequence + 1) & 0xFFFFFFFF
+        parts.append(decoder.decode(frame, lost))
+    return np.concatenate(parts) if parts else np.empty(0, dtype=np.int16)
@@ -0,0 +1,130 @@
+from typing import Iterator, List
+import logging
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Rates libopus can encode and decode at natively
+OPUS_RATES = (8000, 12000, 16000, 24000, 48000)
+MAX_PACKET_MS = 120
+
+try:
+    import opuslib
+except ImportError:  # optional: pip install opuslib (needs the libopus shared library)
+    opuslib = None
+
+
+def opus_available() -> bool:
+    return opuslib is not None
+
+
+def _require_opuslib():
+    if opuslib is None:
+        raise RuntimeError("Opus audio requires the opuslib package and libopus")
+    return opuslib
+
+
+class OpusStreamDecoder:
+    """
+    Incremental Opus decoder for one connection.
+    Each binary frame carries one Opus packet; decoding keeps state across
+    packets. Output is interleaved int16 at decode_rate, which is the
+    requested rate when libopus supports it (else 48 kHz, resampled later).
+    A single lost packet is recovered from the next one's in-band FEC.
+    """
+
+    def __init__(self, sample_rate: int = 16000, channels: int = 1):
+        lib = _require_opuslib()
+        self.decode_rate = sample_rate if sample_rate in OPUS_RATES else 48000
+        self.channels = channels
+        self._decoder = lib.Decoder(self.decode_rate, channels)
+        self._max_frame = self.decode_rate * MAX_PACKET_MS // 1000
+        self._last_frame = self.decode_rate * 20 // 1000
+
+        # Metrics
+        self.packets = 0
+        self.recovered = 0
+        self.bytes_in = 0
+        self.samples_out = 0
+        self.decode_seconds = 0.0
+
+    def decode(self, packet, lost: int = 0) -> np.ndarray:
+        """Decode one packet; lost is the number of packets missing right before it"""
+        packet = bytes(packet)
+        start = time.perf_counter()
+        pcm: List[bytes] = []
+        try:
+            if lost == 1:
+                pcm.append(self._decoder.decode(packet, self._last_frame, decode_fec=True))
+                self.recovered += 1
+            decoded = self._decoder.decode(packet, self._max_frame)
+        except opuslib.OpusError as e:
+            raise ValueError(f"Opus decode failed: {e}") from e
+        pcm.append(decoded)
+        self.decode_seconds += time.perf_counter() - start
+
+        self._last_frame = len(decoded) // (2 * self.channels)
+        self.packets += 1
+        self.bytes_in += len(packet)
+        samples = np.frombuffer(b''.join(pcm) if len(pcm) > 1 else decoded, dtype='<i2')
+        self.samples_out += samples.size // self.channels
+        return samples
+
+    def get_stats(self) -> dict:
+        audio_seconds = self.samples_out / self.decode_rate
+        return {
+            'packets': self.packets,
+            'recovered': self.recovered,
+            'kbit_per_s': round(self.bytes_in * 8 / audio_seconds / 1000, 1) if audio_seconds else 0.0,
+            # Fraction of one core spent decoding per second of audio
+            'decode_cpu': round(self.decode_seconds / audio_seconds, 5) if audio_seconds else 0.0
+        }
+
+
+class OpusStreamEncoder:
+    """
+    Opus encoder for clients, tools and benchmarks.
+    Buffers int16 samples and emits one packet per frame_ms of audio.
+    """
+
+    def __init__(
+        self,
+        sample_rate: int = 16000,
+        channels: int = 1,
+        bitrate: int = 16000,
+        frame_ms: int = 20,
+        fec: bool = True
+    ):
+        lib = _require_opuslib()
+        if sample_rate not in OPUS_RATES:
+            raise ValueError(f"Opus can't encode at {sample_rate} Hz")
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.frame_samples = sample_rate * frame_ms // 1000
+        self._encoder = lib.Encoder(sample_rate, channels, lib.APPLICATION_VOIP)
+        self._encoder.bitrate = bitrate
+        if fec:
+            self._encoder.inband_fec = True
+            self._encoder.packet_loss_perc = 5
+        self._pending = np.empty(0, dtype=np.int16)
+
+    def encode(self, samples: np.ndarray) -> Iterator[bytes]:
+        """Yield a packet for every whole frame; the remainder waits for more audio"""
+        if self._pending.size:
+            samples = np.concatenate((self._pending, samples))
+        step = self.frame_samples * self.channels
+        count = len(samples) // step
+        for i in range(count):
+            yield self._encoder.encode(samples[i * step:(i + 1) * step].tobytes(), self.frame_samples)
+        self._pending = samples[count * step:].copy()
+
+    def flush(self) -> Iterator[bytes]:
+        """Pad the remainder with silence and encode it"""
+        if self._pending.size:
+            step = self.frame_samples * self.channels
+            padded = np.zeros(step, dtype=np.int16)
+            padded[:self._pending.size] = self._pending
+            self._pending = np.empty(0, dtype=np.int16)
+            yield self._encoder.encode(padded.tobytes(), self.frame_samples)
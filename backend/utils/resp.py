@@ -0,0 +1,82 @@
+from typing import List, Optional, Union
+import asyncio
+
+# Minimal RESP2 (Redis serialization protocol) codec: enough for the
+# state store client and the local stand-in server to talk to each other
+# and to a real Redis.
+CRLF = b"\r\n"
+
+Reply = Union[None, int, bytes, str, List["Reply"], "RespError"]
+
+
+class RespError(Exception):
+    """An error reply (-ERR ...)"""
+
+
+class SimpleString(str):
+    """A status reply (+OK), as opposed to a bulk string"""
+
+
+def encode_command(*args) -> bytes:
+    """Encode a command as an array of bulk strings"""
+    parts = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        if isinstance(arg, str):
+            arg = arg.encode()
+        elif not isinstance(arg, (bytes, bytearray, memoryview)):
+            arg = str(arg).encode()
+        parts.append(b"$%d\r\n" % len(arg))
+        parts.append(bytes(arg))
+        parts.append(CRLF)
+    return b"".join(parts)
+
+
+def encode_reply(value: Reply) -> bytes:
+    if value is None:
+        return b"$-1\r\n"
+    if isinstance(value, RespError):
+        return b"-" + str(value).encode() + CRLF
+    if isinstance(value, SimpleString):
+        return b"+" + value.encode() + CRLF
+    if isinstance(value, bool):
+        value = int(value)
+    if isinstance(value, int):
+        return b":%d\r\n" % value
+    if isinstance(value, (list, tuple)):
+        return b"*%d\r\n" % len(value) + b"".join(encode_reply(item) for item in value)
+    if isinstance(value, str):
+        value = value.encode()
+    return b"$%d\r\n" % len(value) + bytes(value) + CRLF
+
+
+async def read_reply(reader: asyncio.StreamReader) -> Reply:
+    """
+    Read one reply (or one command, which is an array of bulk strings).
+    Bulk strings come back as bytes. Raises ConnectionError at EOF.
+    """
+    line = await reader.readline()
+    if not line.endswith(CRLF):
+        raise ConnectionError("Connection closed")
+    kind, body = line[:1], line[1:-2]
+    if kind == b"+":
+        return SimpleString(body.decode())
+    if kind == b"-":
+        return RespError(body.decode())
+    if kind == b":":
+        return int(body)
+    if kind == b"$":
+        length = int(body)
+        if length < 0:
+            return None
+        data = await reader.readexactly(length + 2)
+        return data[:-2]
+    if kind == b"*":
+        count = int(body)
+        if count < 0:
+            return None
+        return [await read_reply(reader) for _ in range(count)]
+    raise ValueError(f"Unexpected RESP type byte: {kind!r}")
+
+
+def as_text(value: Optional[bytes]) -> Optional[str]:
+    return value.decode() if isinstance(value, (bytes, bytearray)) else value
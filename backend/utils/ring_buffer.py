@@ -0,0 +1,46 @@
+class PCMRingBuffer:
+    """
+    Fixed-size circular byte buffer holding the most recent PCM audio.
+    Positions are absolute byte counts since creation, so callers can
+    remember where an utterance started and read everything after it.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._buffer = bytearray(capacity)
+        self._view = memoryview(self._buffer)
+        self._write_pos = 0
+        self.total_written = 0
+
+    def write(self, data) -> None:
+        """Append any contiguous buffer, overwriting the oldest audio when full"""
+        data = memoryview(data).cast('B')
+        size = len(data)
+        self.total_written += size
+        if size >= self.capacity:
+            data = data[size - self.capacity:]
+            size = self.capacity
+
+        end = self._write_pos + size
+        if end <= self.capacity:
+            self._view[self._write_pos:end] = data
+        else:
+            first = self.capacity - self._write_pos
+            self._view[self._write_pos:] = data[:first]
+            self._view[:size - first] = data[first:]
+        self._write_pos = end % self.capacity
+
+    def available_since(self, position: int) -> int:
+        """Bytes still held in the buffer that were written after position"""
+        return max(0, min(self.total_written - position, self.capacity))
+
+    def read_since(self, position: int) -> bytes:
+        """Contiguous copy of the audio written after an absolute position"""
+        size = self.available_since(position)
+        if size == 0:
+            return b""
+
+        start = (self._write_pos - size) % self.capacity
+        if start + size <= self.capacity:
+            return bytes(self._view[start:start + size])
+        return bytes(self._view[start:]) + bytes(self._view[:self._write_pos])
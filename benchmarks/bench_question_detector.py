@@ -0,0 +1,86 @@
+"""
+Per-call cost of QuestionDetector on a corpus of transcripts.
+
+The corpus mixes questions and statements and, like the live pipeline,
+includes every growing prefix of each utterance (streaming partials).
+Pass --corpus to use your own newline-delimited transcripts.
+
+    python -m benchmarks.bench_question_detector --rounds 20
+"""
+import argparse
+import time
+from collections import Counter
+
+from backend.services.question_detector import QuestionDetector
+
+UTTERANCES = [
+    "what time is the meeting tomorrow",
+    "so I was thinking we could move the launch to next week",
+    "hey do you know where the conference room is",
+    "the weather is really nice today",
+    "um yeah",
+    "can you tell me the budget for the second quarter",
+    "and then he said the numbers were off by like ten percent",
+    "I'm wondering if we have the slides from last time",
+    "well the client wants the report by friday",
+    "is it going to rain this afternoon",
+    "let me know when you're free to talk about the roadmap",
+    "we should probably get lunch after this",
+    "who is presenting first",
+    "any idea how long the review will take",
+    "that's what I heard from the finance team",
+    "what do you think about hiring two more engineers",
+    "also how many tickets are still open in the backlog",
+    "okay great thanks everyone",
+]
+
+
+def build_corpus(utterances):
+    corpus = []
+    for utterance in utterances:
+        words = utterance.split()
+        corpus.extend(' '.join(words[:n]) for n in range(1, len(words) + 1))
+    return corpus
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rounds', type=int, default=20)
+    parser.add_argument('--corpus', help="newline-delimited transcripts")
+    args = parser.parse_args()
+
+    utterances = UTTERANCES
+    if args.corpus:
+        with open(args.corpus, encoding='utf-8') as f:
+            utterances = [line.strip() for line in f if line.strip()]
+    corpus = build_corpus(utterances)
+
+    start = time.perf_counter()
+    detector = QuestionDetector()
+    build_us = (time.perf_counter() - start) * 1e6
+
+    types = Counter(detector.detect(text)[2] for text in corpus)
+
+    detect = detector.detect
+    start = time.perf_counter()
+    for _ in range(args.rounds):
+        for text in corpus:
+            detect(text)
+    detect_us = (time.perf_counter() - start) * 1e6 / (args.rounds * len(corpus))
+
+    noise = detector.filter_context_noise
+    start = time.perf_counter()
+    for _ in range(args.rounds):
+        for text in corpus:
+            noise(text)
+    noise_us = (time.perf_counter() - start) * 1e6 / (args.rounds * len(corpus))
+
+    print(f"corpus: {len(corpus)} transcripts ({len(utterances)} utterances + partials)")
+    print(f"construction:          {build_us:8.1f} us")
+    print(f"detect():              {detect_us:8.2f} us/call")
+    print(f"filter_context_noise(): {noise_us:7.2f} us/call")
+    print("question types:", dict(types))
+
+
+if __name__ == '__main__':
+    main()
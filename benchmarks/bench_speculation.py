@@ -0,0 +1,90 @@
+"""
+Time from final transcript to complete answer, with and without speculation.
+
+Simulates a speaker: partial 'transcription' messages grow word by word
+every --partial-ms, then the final arrives. With speculation on, the
+answer is started from a confident partial before the final is sent.
+Every --miss-every'th utterance ends differently from its partials, to
+show what cancelled speculations cost.
+
+    python -m benchmarks.bench_speculation --utterances 10 --first-token-ms 400
+"""
+import argparse
+import os
+import statistics
+import time
+
+from benchmarks import mock_openai
+
+UTTERANCES = [
+    "what time is the meeting tomorrow",
+    "can you tell me the budget for the second quarter",
+    "who is presenting first at the offsite",
+    "how many tickets are still open in the backlog",
+]
+
+
+def speak(ws, client, words, final_words, partial_ms):
+    for n in range(1, len(words) + 1):
+        ws.send_json({'type': 'transcription', 'text': ' '.join(words[:n]), 'is_final': False})
+        time.sleep(partial_ms / 1000)
+
+    start = time.perf_counter()
+    ws.send_json({'type': 'transcription', 'text': ' '.join(final_words), 'is_final': True})
+    while True:
+        message = ws.receive_json()
+        if message['type'] == 'ai_response':
+            elapsed = (time.perf_counter() - start) * 1000
+            break
+    ws.send_json({'type': 'clear_history'})
+    ws.receive_json()
+    client.delete('/api/cache')
+    return elapsed
+
+
+def run(client, speculative, args):
+    from backend.config import settings
+
+    settings.speculative_responses = speculative
+    timings = []
+    with client.websocket_connect('/ws/bench-speculation') as ws:
+        ws.receive_json()  # status
+        for i in range(args.utterances):
+            words = UTTERANCES[i % len(UTTERANCES)].split()
+            final_words = words
+            if args.miss_every and i % args.miss_every == args.miss_every - 1:
+                final_words = words[:-1] + ['instead']
+            timings.append(speak(ws, client, words, final_words, args.partial_ms))
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--utterances', type=int, default=8)
+    parser.add_argument('--port', type=int, default=9101)
+    parser.add_argument('--partial-ms', type=float, default=300)
+    parser.add_argument('--miss-every', type=int, default=4)
+    parser.add_argument('--first-token-ms', type=float, default=400)
+    parser.add_argument('--token-ms', type=float, default=40)
+    args = parser.parse_args()
+
+    with mock_openai.running(args.port, first_token_ms=args.first_token_ms, token_ms=args.token_ms) as base_url:
+        os.environ['OPENAI_BASE_URL'] = base_url
+        os.environ.setdefault('OPENAI_API_KEY', 'mock')
+
+        from fastapi.testclient import TestClient
+        import main as app_module
+
+        with TestClient(app_module.app) as client:
+            print(f"{'mode':<14}{'p50':>10}{'max':>10}  (ms, final transcript -> complete answer)")
+            for speculative in (False, True):
+                timings = run(client, speculative, args)
+                print(
+                    f"{'speculative' if speculative else 'baseline':<14}"
+                    f"{statistics.median(timings):>10.1f}{max(timings):>10.1f}"
+                )
+            print("speculation stats:", client.get('/api/speculation').json())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+End-to-end time-to-first-word benchmark for streamed vs. non-streamed answers.
+
+Starts the mock OpenAI server, drives the real /ws/{client_id} endpoint
+in-process with final 'transcription' messages, and reports how long the
+client waits for the first answer text and for the complete answer.
+--tail-rate/--tail-ms make a fraction of upstream calls slow, to see
+what hedging (HEDGE_PERCENTILE, 0 disables) does to the tail.
+
+    python -m benchmarks.bench_streaming --requests 20 --first-token-ms 400 --token-ms 40
+    python -m benchmarks.bench_streaming --requests 200 --tail-rate 0.05 --tail-ms 2000
+"""
+import argparse
+import os
+import statistics
+import time
+
+from benchmarks import mock_openai
+
+QUESTION = "what time is the meeting tomorrow"
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+
+def run(client, streaming: bool, requests: int):
+    from backend.config import settings
+
+    settings.stream_responses = streaming
+    first, total = [], []
+
+    with client.websocket_connect('/ws/bench') as ws:
+        ws.receive_json()  # status
+        for _ in range(requests):
+            start = time.perf_counter()
+            first_at = None
+            ws.send_json({'type': 'transcription', 'text': QUESTION, 'is_final': True})
+            while True:
+                message = ws.receive_json()
+                if message['type'] == 'ai_response_delta' and first_at is None:
+                    first_at = time.perf_counter()
+                if message['type'] == 'ai_response':
+                    done_at = time.perf_counter()
+                    break
+            first.append(((first_at or done_at) - start) * 1000)
+            total.append((done_at - start) * 1000)
+            ws.send_json({'type': 'clear_history'})
+            ws.receive_json()
+            # Every request should reach the model, not the answer cache
+            client.delete('/api/cache')
+
+    return first, total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=20)
+    parser.add_argument('--port', type=int, default=9100)
+    parser.add_argument('--first-token-ms', type=float, default=400)
+    parser.add_argument('--token-ms', type=float, default=40)
+    parser.add_argument('--tail-rate', type=float, default=0)
+    parser.add_argument('--tail-ms', type=float, default=0)
+    args = parser.parse_args()
+
+    with mock_openai.running(
+        args.port,
+        first_token_ms=args.first_token_ms,
+        token_ms=args.token_ms,
+        tail_rate=args.tail_rate,
+        tail_ms=args.tail_ms
+    ) as base_url:
+        os.environ['OPENAI_BASE_URL'] = base_url
+        os.environ.setdefault('OPENAI_API_KEY', 'mock')
+
+        from fastapi.testclient import TestClient
+        import main as app_module
+
+        # One client context keeps a single event loop for the shared OpenAI client
+        with TestClient(app_module.app) as client:
+            print(f"{'mode':<12}{'first p50':>12}{'first p95':>12}{'total p50':>12}{'total p95':>12}  (ms)")
+            for streaming in (False, True):
+                first, total = run(client, streaming, args.requests)
+                print(
+                    f"{'stream' if streaming else 'blocking':<12}"
+                    f"{statistics.median(first):>12.1f}{percentile(first, 0.95):>12.1f}"
+                    f"{statistics.median(total):>12.1f}{percentile(total, 0.95):>12.1f}"
+                )
+
+
+if __name__ == '__main__':
+    main()
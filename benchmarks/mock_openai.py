@@ -0,0 +1,189 @@
+"""
+Local stand-in for the OpenAI chat-completions endpoint.
+
+Serves POST /v1/chat/completions with a fixed answer, a configurable
+time-to-first-token (plus optional random jitter, a slow tail hitting a
+fraction of requests to exercise hedging, and extra delay per model name
+to exercise model routing) and per-token delay, in both
+streaming (SSE) and non-streaming modes. Point the backend at it with
+OPENAI_BASE_URL=http://127.0.0.1:<port>/v1.
+
+    python -m benchmarks.mock_openai --port 9100 --first-token-ms 400 --token-ms 40
+    python -m benchmarks.mock_openai --model-delay gpt-4=4000
+    python -m benchmarks.mock_openai --tail-rate 0.05 --tail-ms 3000
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import random
+import socket
+import subprocess
+import sys
+import time
+from typing import Dict, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+DEFAULT_ANSWER = "The meeting is at three thirty in room four."
+
+
+def _tokens(answer: str):
+    words = answer.split(' ')
+    return [words[0]] + [' ' + word for word in words[1:]]
+
+
+def create_app(
+    answer: str = DEFAULT_ANSWER,
+    first_token_ms: float = 400,
+    token_ms: float = 40,
+    jitter_ms: float = 0,
+    seed: int = 0,
+    model_delays: Optional[Dict[str, float]] = None,
+    tail_rate: float = 0,
+    tail_ms: float = 0
+) -> FastAPI:
+    app = FastAPI(title="Mock OpenAI")
+    app.state.requests = 0
+    app.state.models = {}
+    rng = random.Random(seed)
+    model_delays = model_delays or {}
+
+    def first_token_delay(model: str) -> float:
+        jitter = rng.uniform(0, jitter_ms) if jitter_ms else 0
+        tail = tail_ms if tail_rate and rng.random() < tail_rate else 0
+        return (first_token_ms + jitter + tail + model_delays.get(model, 0)) / 1000
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        model = body.get('model', 'mock')
+        created = int(time.time())
+        app.state.requests += 1
+        app.state.models[model] = app.state.models.get(model, 0) + 1
+        tokens = _tokens(answer)
+
+        if not body.get('stream'):
+            await asyncio.sleep(first_token_delay(model) + token_ms * (len(tokens) - 1) / 1000)
+            return JSONResponse({
+                'id': 'chatcmpl-mock',
+                'object': 'chat.completion',
+                'created': created,
+                'model': model,
+                'choices': [{
+                    'index': 0,
+                    'message': {'role': 'assistant', 'content': answer},
+                    'finish_reason': 'stop'
+                }],
+                'usage': {
+                    'prompt_tokens': sum(len(m.get('content', '')) for m in body.get('messages', [])) // 4,
+                    'completion_tokens': len(tokens),
+                    'total_tokens': 0
+                }
+            })
+
+        delay = first_token_delay(model)
+
+        async def events():
+            def chunk(delta: dict, finish_reason=None) -> str:
+                return 'data: ' + json.dumps({
+                    'id': 'chatcmpl-mock',
+                    'object': 'chat.completion.chunk',
+                    'created': created,
+                    'model': model,
+                    'choices': [{'index': 0, 'delta': delta, 'finish_reason': finish_reason}]
+                }) + '\n\n'
+
+            await asyncio.sleep(delay)
+            yield chunk({'role': 'assistant', 'content': ''})
+            for i, token in enumerate(tokens):
+                if i:
+                    await asyncio.sleep(token_ms / 1000)
+                yield chunk({'content': token})
+            yield chunk({}, 'stop')
+            yield 'data: [DONE]\n\n'
+
+        return StreamingResponse(events(), media_type='text/event-stream')
+
+    @app.get("/v1/stats")
+    async def stats():
+        return {'requests': app.state.requests, 'models': dict(app.state.models)}
+
+    return app
+
+
+def wait_for_port(port: int, proc: subprocess.Popen, timeout: float = 15, name: str = "Server"):
+    """Block until something accepts connections on port (or the process dies)"""
+    deadline = time.time() + timeout
+    while True:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.2).close()
+            return
+        except OSError:
+            if time.time() > deadline or proc.poll() is not None:
+                raise RuntimeError(f"{name} did not start on port {port}")
+            time.sleep(0.1)
+
+
+@contextlib.contextmanager
+def running(
+    port: int = 9100,
+    answer: str = DEFAULT_ANSWER,
+    first_token_ms: float = 400,
+    token_ms: float = 40,
+    jitter_ms: float = 0,
+    model_delays: Optional[Dict[str, float]] = None,
+    tail_rate: float = 0,
+    tail_ms: float = 0
+):
+    """Run the mock in a subprocess; yields the base URL to use as OPENAI_BASE_URL"""
+    proc = subprocess.Popen([
+        sys.executable, '-m', 'benchmarks.mock_openai',
+        '--port', str(port),
+        '--answer', answer,
+        '--first-token-ms', str(first_token_ms),
+        '--token-ms', str(token_ms),
+        '--jitter-ms', str(jitter_ms),
+        '--tail-rate', str(tail_rate),
+        '--tail-ms', str(tail_ms),
+        *[arg for model, ms in (model_delays or {}).items() for arg in ('--model-delay', f"{model}={ms}")]
+    ])
+    try:
+        wait_for_port(port, proc, name="Mock OpenAI server")
+        yield f"http://127.0.0.1:{port}/v1"
+    finally:
+        proc.terminate()
+        proc.wait(timeout=5)
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9100)
+    parser.add_argument('--answer', default=DEFAULT_ANSWER)
+    parser.add_argument('--first-token-ms', type=float, default=400)
+    parser.add_argument('--token-ms', type=float, default=40)
+    parser.add_argument('--jitter-ms', type=float, default=0, help="random extra time-to-first-token")
+    parser.add_argument('--tail-rate', type=float, default=0, help="fraction of requests that get --tail-ms extra")
+    parser.add_argument('--tail-ms', type=float, default=0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--model-delay', action='append', default=[], metavar='MODEL=MS',
+                        help="extra time-to-first-token for one model (repeatable)")
+    args = parser.parse_args()
+
+    model_delays = {}
+    for item in args.model_delay:
+        model, _, ms = item.partition('=')
+        model_delays[model] = float(ms)
+    app = create_app(
+        args.answer, args.first_token_ms, args.token_ms, args.jitter_ms, args.seed, model_delays,
+        args.tail_rate, args.tail_ms
+    )
+    uvicorn.run(app, host=args.host, port=args.port, log_level='warning')
+
+
+if __name__ == '__main__':
+    main()
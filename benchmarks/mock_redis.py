@@ -0,0 +1,270 @@
+"""
+Local Redis-compatible stand-in for multi-worker runs without a Redis
+install.
+
+Speaks RESP2 and implements the commands the state store uses (strings
+with expiry, lists, KEYS, PUBLISH/SUBSCRIBE) plus PING, DBSIZE and
+FLUSHDB. Everything lives in one dict in memory; there is no
+persistence, replication or eviction. Point the backend at it with
+STATE_BACKEND=redis STATE_URL=redis://127.0.0.1:<port>/0.
+
+    python -m benchmarks.mock_redis --port 6390
+"""
+import argparse
+import asyncio
+import contextlib
+import fnmatch
+import subprocess
+import sys
+import time
+from collections import deque
+from typing import Dict, Set
+
+from backend.utils.resp import RespError, SimpleString, encode_reply, read_reply
+from benchmarks.mock_openai import wait_for_port
+
+OK = SimpleString('OK')
+
+
+class MockRedis:
+    def __init__(self):
+        self.values: Dict[bytes, object] = {}
+        self.expires: Dict[bytes, float] = {}
+        self.channels: Dict[bytes, Set[asyncio.StreamWriter]] = {}
+        self.commands = 0
+
+    def live(self, key: bytes) -> bool:
+        expires = self.expires.get(key)
+        if expires is not None and expires <= time.monotonic():
+            self.values.pop(key, None)
+            del self.expires[key]
+        return key in self.values
+
+    def list_at(self, key: bytes, create: bool = False):
+        value = self.values.get(key) if self.live(key) else None
+        if value is None and create:
+            value = self.values[key] = deque()
+        if value is not None and not isinstance(value, deque):
+            raise RespError('WRONGTYPE Operation against a key holding the wrong kind of value')
+        return value
+
+    def expire_in(self, key: bytes, ms: int) -> int:
+        if not self.live(key):
+            return 0
+        self.expires[key] = time.monotonic() + ms / 1000
+        return 1
+
+    def execute(self, args, writer: asyncio.StreamWriter):
+        name = args[0].decode().upper()
+        handler = getattr(self, 'cmd_' + name.lower(), None)
+        if handler is None:
+            return RespError(f"ERR unknown command '{name}'")
+        self.commands += 1
+        try:
+            if name in ('SUBSCRIBE', 'UNSUBSCRIBE'):
+                return handler(writer, *args[1:])
+            return handler(*args[1:])
+        except RespError as e:
+            return e
+        except (TypeError, ValueError, IndexError):
+            return RespError(f"ERR wrong arguments for '{name}' command")
+
+    # Connection
+
+    def cmd_ping(self, message=None):
+        return message if message is not None else SimpleString('PONG')
+
+    def cmd_echo(self, message):
+        return message
+
+    def cmd_auth(self, *_):
+        return OK
+
+    def cmd_select(self, _db):
+        return OK
+
+    # Keys and strings
+
+    def cmd_get(self, key):
+        if not self.live(key):
+            return None
+        value = self.values[key]
+        if isinstance(value, deque):
+            raise RespError('WRONGTYPE Operation against a key holding the wrong kind of value')
+        return value
+
+    def cmd_set(self, key, value, *options):
+        ttl_ms = None
+        options = list(options)
+        while options:
+            flag = options.pop(0).upper()
+            if flag == b'NX' and self.live(key):
+                return None
+            if flag in (b'EX', b'PX'):
+                ttl_ms = int(options.pop(0)) * (1000 if flag == b'EX' else 1)
+        self.values[key] = value
+        self.expires.pop(key, None)
+        if ttl_ms is not None:
+            self.expire_in(key, ttl_ms)
+        return OK
+
+    def cmd_incr(self, key):
+        value = int(self.cmd_get(key) or 0) + 1
+        self.values[key] = str(value).encode()
+        return value
+
+    def cmd_del(self, *keys):
+        removed = 0
+        for key in keys:
+            if self.live(key):
+                del self.values[key]
+                self.expires.pop(key, None)
+                removed += 1
+        return removed
+
+    def cmd_exists(self, *keys):
+        return sum(1 for key in keys if self.live(key))
+
+    def cmd_expire(self, key, seconds):
+        return self.expire_in(key, int(seconds) * 1000)
+
+    def cmd_pexpire(self, key, ms):
+        return self.expire_in(key, int(ms))
+
+    def cmd_pttl(self, key):
+        if not self.live(key):
+            return -2
+        expires = self.expires.get(key)
+        return -1 if expires is None else int((expires - time.monotonic()) * 1000)
+
+    def cmd_keys(self, pattern):
+        pattern = pattern.decode()
+        return [key for key in list(self.values) if self.live(key) and fnmatch.fnmatchcase(key.decode(), pattern)]
+
+    def cmd_dbsize(self):
+        return sum(1 for key in list(self.values) if self.live(key))
+
+    def cmd_flushdb(self, *_):
+        self.values.clear()
+        self.expires.clear()
+        return OK
+
+    cmd_flushall = cmd_flushdb
+
+    # Lists
+
+    def cmd_rpush(self, key, *values):
+        items = self.list_at(key, create=True)
+        items.extend(values)
+        return len(items)
+
+    def cmd_llen(self, key):
+        items = self.list_at(key)
+        return len(items) if items is not None else 0
+
+    @staticmethod
+    def _span(length: int, start, stop):
+        start, stop = int(start), int(stop)
+        if start < 0:
+            start = max(length + start, 0)
+        if stop < 0:
+            stop = length + stop
+        return start, min(stop, length - 1)
+
+    def cmd_lrange(self, key, start, stop):
+        items = self.list_at(key)
+        if not items:
+            return []
+        start, stop = self._span(len(items), start, stop)
+        return list(items)[start:stop + 1] if start <= stop else []
+
+    def cmd_ltrim(self, key, start, stop):
+        items = self.list_at(key)
+        if items is None:
+            return OK
+        start, stop = self._span(len(items), start, stop)
+        kept = list(items)[start:stop + 1] if start <= stop else []
+        if kept:
+            self.values[key] = deque(kept)
+        else:
+            self.cmd_del(key)
+        return OK
+
+    # Pub-sub
+
+    def cmd_publish(self, channel, message):
+        subscribers = self.channels.get(channel, ())
+        payload = encode_reply([b'message', channel, message])
+        for subscriber in list(subscribers):
+            subscriber.write(payload)
+        return len(subscribers)
+
+    def _subscriptions(self, writer) -> int:
+        return sum(1 for subscribers in self.channels.values() if writer in subscribers)
+
+    def cmd_subscribe(self, writer, *channels):
+        for channel in channels:
+            self.channels.setdefault(channel, set()).add(writer)
+            writer.write(encode_reply([b'subscribe', channel, self._subscriptions(writer)]))
+        return None
+
+    def cmd_unsubscribe(self, writer, *channels):
+        for channel in channels or [c for c, s in self.channels.items() if writer in s]:
+            self.channels.get(channel, set()).discard(writer)
+            writer.write(encode_reply([b'unsubscribe', channel, self._subscriptions(writer)]))
+        return None
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                command = await read_reply(reader)
+                if not isinstance(command, list) or not command:
+                    writer.write(encode_reply(RespError('ERR expected a command array')))
+                    continue
+                if command[0].upper() == b'QUIT':
+                    writer.write(encode_reply(OK))
+                    break
+                reply = self.execute(command, writer)
+                # SUBSCRIBE/UNSUBSCRIBE write their own confirmations
+                if command[0].upper() not in (b'SUBSCRIBE', b'UNSUBSCRIBE'):
+                    writer.write(encode_reply(reply))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            for subscribers in self.channels.values():
+                subscribers.discard(writer)
+            writer.close()
+
+
+async def serve(host: str, port: int):
+    server = await asyncio.start_server(MockRedis().handle, host, port)
+    async with server:
+        await server.serve_forever()
+
+
+@contextlib.contextmanager
+def running(port: int = 6390):
+    """Run the stand-in in a subprocess; yields the URL to use as STATE_URL"""
+    proc = subprocess.Popen([sys.executable, '-m', 'benchmarks.mock_redis', '--port', str(port)])
+    try:
+        wait_for_port(port, proc, name="Mock Redis server")
+        yield f"redis://127.0.0.1:{port}/0"
+    finally:
+        proc.terminate()
+        proc.wait(timeout=5)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=6390)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
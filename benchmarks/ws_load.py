@@ -0,0 +1,295 @@
+"""
+Synthetic WebSocket load test against a real server process.
+
+Starts the mock OpenAI server and the app (uvicorn, scripted STT engine),
+then opens --clients concurrent /ws/{client_id} connections. Each client
+streams binary PCM frames at real-time pace (silence, a tone the VAD
+treats as speech, silence, then an end-of-utterance frame), waits for the
+answer, and repeats --utterances times.
+
+Reports answer throughput, p50/p95/p99 question-to-answer latency (from
+the end-of-utterance frame to 'ai_response'), time to the first answer
+delta, and server memory per connection (VmRSS growth while connected).
+--output appends one JSON line per run, tagged with the git commit, so
+results can be compared across commits.
+
+--workers runs that many uvicorn worker processes sharing sessions
+through the Redis stand-in (benchmarks/mock_redis.py); --stt-cpu-ms makes
+recognition CPU-bound so throughput is limited by cores, not by waiting.
+
+    python -m benchmarks.ws_load --clients 50 --utterances 5 --output bench-results.jsonl
+    python -m benchmarks.ws_load --workers 4 --stt-cpu-ms 40
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+import numpy as np
+from websockets.asyncio.client import connect
+
+from backend.utils.audio_framing import FLAG_END_OF_UTTERANCE, encode_frame
+from benchmarks import mock_openai, mock_redis
+
+SAMPLE_RATE = 16000
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(p * len(ordered)))] if ordered else 0.0
+
+
+def utterance_frames(frame_ms: int, speech_ms: int, silence_ms: int):
+    """PCM16 frame payloads for one utterance: silence, tone, silence"""
+    frame_samples = SAMPLE_RATE * frame_ms // 1000
+    t = np.arange(SAMPLE_RATE * speech_ms // 1000) / SAMPLE_RATE
+    tone = (np.sin(2 * np.pi * 220 * t) * 8000).astype('<i2')
+    silence = np.zeros(SAMPLE_RATE * silence_ms // 1000, dtype='<i2')
+    audio = np.concatenate([silence, tone, silence])
+    return [
+        audio[i:i + frame_samples].tobytes()
+        for i in range(0, len(audio) - frame_samples + 1, frame_samples)
+    ]
+
+
+def rss_bytes(pid: int) -> int:
+    """VmRSS of a process and all its children (uvicorn workers)"""
+    total = 0
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    total = int(line.split()[1]) * 1024
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            total += sum(rss_bytes(int(child)) for child in f.read().split())
+    except OSError:
+        pass
+    return total
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+@contextlib.contextmanager
+def app_server(port: int, env: dict, workers: int = 1):
+    """Run main:app under uvicorn in a subprocess; yields the Popen"""
+    proc = subprocess.Popen(
+        [
+            sys.executable, '-m', 'uvicorn', 'main:app', '--port', str(port), '--log-level', 'warning',
+            '--workers', str(workers)
+        ],
+        env={**os.environ, **env}
+    )
+    try:
+        mock_openai.wait_for_port(port, proc, timeout=30, name="App server")
+        yield proc
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+class LoadClient:
+    """One simulated earbud: streams utterances and times the answers"""
+
+    def __init__(self, index: int, args, frames):
+        self.client_id = f"load-{index}"
+        self.args = args
+        self.frames = frames
+        self.latencies = []
+        self.first_deltas = []
+        self.timeouts = 0
+        self.throttled = 0
+        self.sequence = 0
+
+    async def send_utterance(self, ws):
+        pace = self.args.frame_ms / 1000 / self.args.speed if self.args.speed > 0 else 0
+        next_at = time.perf_counter()
+        last = len(self.frames) - 1
+        for i, payload in enumerate(self.frames):
+            flags = FLAG_END_OF_UTTERANCE if i == last else 0
+            await ws.send(encode_frame(payload, self.sequence, SAMPLE_RATE, flags=flags))
+            self.sequence += 1
+            if pace and i != last:
+                next_at += pace
+                delay = next_at - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+        return time.perf_counter()
+
+    async def wait_for_answer(self, ws, sent_at: float):
+        first_at = None
+        while True:
+            message = json.loads(await ws.recv())
+            kind = message.get('type')
+            if kind == 'ai_response_delta' and first_at is None:
+                first_at = time.perf_counter()
+            elif kind == 'backpressure' and message.get('status') == 'queue_full':
+                self.throttled += 1
+            elif kind == 'ai_response':
+                done_at = time.perf_counter()
+                self.latencies.append(done_at - sent_at)
+                self.first_deltas.append((first_at or done_at) - sent_at)
+                return
+
+    async def run(self, url: str, connected: asyncio.Barrier, start: asyncio.Event):
+        async with connect(f"{url}/ws/{self.client_id}", max_size=None) as ws:
+            await ws.recv()  # status
+            await connected.wait()
+            await start.wait()
+            for _ in range(self.args.utterances):
+                sent_at = await self.send_utterance(ws)
+                try:
+                    await asyncio.wait_for(self.wait_for_answer(ws, sent_at), self.args.answer_timeout)
+                except asyncio.TimeoutError:
+                    self.timeouts += 1
+                await ws.send(json.dumps({'type': 'clear_history'}))
+            await connected.wait()  # hold connections open until everyone is done
+
+
+async def run_load(args, base_url: str, pid: int) -> dict:
+    frames = utterance_frames(args.frame_ms, args.speech_ms, args.silence_ms)
+    clients = [LoadClient(i, args, frames) for i in range(args.clients)]
+    connected = asyncio.Barrier(args.clients + 1)
+    start = asyncio.Event()
+
+    rss_idle = rss_bytes(pid)
+    tasks = [asyncio.create_task(client.run(base_url.replace('http', 'ws'), connected, start)) for client in clients]
+    await connected.wait()
+    rss_connected = rss_bytes(pid)
+
+    started = time.perf_counter()
+    start.set()
+    await connected.wait()
+    elapsed = time.perf_counter() - started
+    rss_peak = rss_bytes(pid)
+    await asyncio.gather(*tasks)
+
+    async with httpx.AsyncClient(base_url=base_url) as http:
+        stages = (await http.get('/api/traces', params={'limit': 0})).json()['stages']
+
+    latencies = [t * 1000 for client in clients for t in client.latencies]
+    first_deltas = [t * 1000 for client in clients for t in client.first_deltas]
+    return {
+        'answers': len(latencies),
+        'timeouts': sum(client.timeouts for client in clients),
+        'throttled': sum(client.throttled for client in clients),
+        'elapsed_s': round(elapsed, 3),
+        'answers_per_s': round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        'latency_ms': {
+            'p50': round(percentile(latencies, 0.50), 1),
+            'p95': round(percentile(latencies, 0.95), 1),
+            'p99': round(percentile(latencies, 0.99), 1),
+            'max': round(max(latencies, default=0.0), 1)
+        },
+        'first_delta_ms': {
+            'p50': round(percentile(first_deltas, 0.50), 1),
+            'p95': round(percentile(first_deltas, 0.95), 1),
+            'p99': round(percentile(first_deltas, 0.99), 1)
+        },
+        'memory': {
+            'rss_idle_mb': round(rss_idle / 2 ** 20, 1),
+            'rss_connected_mb': round(rss_connected / 2 ** 20, 1),
+            'rss_peak_mb': round(rss_peak / 2 ** 20, 1),
+            'per_connection_kb': round((rss_connected - rss_idle) / args.clients / 1024, 1),
+            'per_connection_peak_kb': round((rss_peak - rss_idle) / args.clients / 1024, 1)
+        },
+        'server_stages': stages
+    }
+
+
+def build_parser(description: str = __doc__) -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=description, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, default=20)
+    parser.add_argument('--utterances', type=int, default=3, help="questions per client")
+    parser.add_argument('--port', type=int, default=9110)
+    parser.add_argument('--mock-port', type=int, default=9111)
+    parser.add_argument('--frame-ms', type=int, default=20)
+    parser.add_argument('--speech-ms', type=int, default=1200)
+    parser.add_argument('--silence-ms', type=int, default=200)
+    parser.add_argument('--speed', type=float, default=1.0, help="audio pacing; 1 = real time, 0 = unpaced")
+    parser.add_argument('--first-token-ms', type=float, default=400)
+    parser.add_argument('--token-ms', type=float, default=40)
+    parser.add_argument('--jitter-ms', type=float, default=100)
+    parser.add_argument('--stt-latency-ms', type=float, default=50, help="simulated recognition time per call")
+    parser.add_argument('--stt-cpu-ms', type=float, default=0, help="simulated recognition CPU time per call")
+    parser.add_argument('--workers', type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument('--state', choices=['memory', 'redis'], help="state backend (default: redis with >1 worker)")
+    parser.add_argument('--redis-port', type=int, default=6392)
+    parser.add_argument('--answer-timeout', type=float, default=30)
+    parser.add_argument('--cache', action='store_true', help="keep the response cache on (every client asks the same question)")
+    parser.add_argument('--output', help="append results as a JSON line to this file")
+    return parser
+
+
+def run(args) -> dict:
+    """Start the mocks and the app with args.workers workers, run the load and return one record"""
+    state = args.state or ('redis' if args.workers > 1 else 'memory')
+    with contextlib.ExitStack() as stack:
+        openai_url = stack.enter_context(mock_openai.running(
+            args.mock_port,
+            first_token_ms=args.first_token_ms,
+            token_ms=args.token_ms,
+            jitter_ms=args.jitter_ms
+        ))
+        env = {
+            'OPENAI_BASE_URL': openai_url,
+            'OPENAI_API_KEY': os.environ.get('OPENAI_API_KEY', 'mock'),
+            'STT_ENGINE': 'scripted',
+            'SCRIPTED_STT_LATENCY_MS': str(args.stt_latency_ms),
+            'SCRIPTED_STT_CPU_MS': str(args.stt_cpu_ms),
+            'STATE_BACKEND': state
+        }
+        if state == 'redis':
+            env['STATE_URL'] = stack.enter_context(mock_redis.running(args.redis_port))
+        if not args.cache:
+            env['RESPONSE_CACHE_SIZE'] = '0'
+        proc = stack.enter_context(app_server(args.port, env, args.workers))
+        results = asyncio.run(run_load(args, f"http://127.0.0.1:{args.port}", proc.pid))
+
+    params = (
+        'clients', 'utterances', 'speed', 'first_token_ms', 'token_ms', 'jitter_ms',
+        'stt_latency_ms', 'stt_cpu_ms', 'workers', 'cache'
+    )
+    return {
+        'commit': git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'params': {**{key: getattr(args, key) for key in params}, 'state': state},
+        'results': results
+    }
+
+
+def main():
+    args = build_parser().parse_args()
+    record = run(args)
+    results = record['results']
+
+    latency, memory = results['latency_ms'], results['memory']
+    print(f"commit {record['commit']}: {args.clients} clients x {args.utterances} utterances, "
+          f"{args.workers} worker(s), {record['params']['state']} state")
+    print(f"  answers       {results['answers']} in {results['elapsed_s']}s ({results['answers_per_s']}/s), "
+          f"{results['timeouts']} timeouts, {results['throttled']} throttled")
+    print(f"  latency (ms)  p50 {latency['p50']}  p95 {latency['p95']}  p99 {latency['p99']}  max {latency['max']}")
+    print(f"  first delta   p50 {results['first_delta_ms']['p50']}  p95 {results['first_delta_ms']['p95']}")
+    print(f"  memory        {memory['rss_idle_mb']} MB idle, {memory['per_connection_kb']} KB/connection "
+          f"({memory['per_connection_peak_kb']} KB at peak)")
+
+    if args.output:
+        with open(args.output, 'a') as f:
+            f.write(json.dumps(record) + '\n')
+        print(f"  appended to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""
+Multi-worker scaling test for the WebSocket tier.
+
+Runs benchmarks.ws_load once per --worker-counts entry (uvicorn
+--workers N, sessions shared through the Redis stand-in) with CPU-bound
+simulated recognition and unpaced audio, so each run saturates its
+workers. Reports answers per second, speedup over the first run and
+scaling efficiency (speedup / worker ratio); on a machine with at least
+as many cores as workers, throughput should grow roughly linearly.
+Accepts every ws_load option.
+
+    python -m benchmarks.ws_scaling --worker-counts 1 2 4 --clients 40 --utterances 5
+"""
+import json
+import os
+
+from benchmarks import ws_load
+
+
+def main():
+    parser = ws_load.build_parser(__doc__)
+    parser.add_argument('--worker-counts', type=int, nargs='+', default=[1, 2, 4])
+    parser.set_defaults(speed=0, stt_cpu_ms=40, stt_latency_ms=0, first_token_ms=50, token_ms=5, jitter_ms=0, clients=40)
+    args = parser.parse_args()
+
+    cores = os.cpu_count() or 1
+    if max(args.worker_counts) > cores:
+        print(f"note: {cores} CPU core(s) here; runs with more workers than cores can't scale")
+
+    records = []
+    for workers in args.worker_counts:
+        args.workers = workers
+        # Same backend for every run, so only the worker count changes
+        args.state = 'redis'
+        records.append(ws_load.run(args))
+        if args.output:
+            with open(args.output, 'a') as f:
+                f.write(json.dumps(records[-1]) + '\n')
+
+    base = records[0]
+    base_rate = base['results']['answers_per_s'] or 1e-9
+    print(f"{args.clients} clients x {args.utterances} utterances, {args.stt_cpu_ms:g} ms STT CPU per call, {cores} core(s)")
+    print(f"{'workers':>8}{'answers/s':>11}{'speedup':>9}{'efficiency':>12}{'p50 ms':>9}{'p95 ms':>9}{'timeouts':>10}")
+    for record in records:
+        results = record['results']
+        workers = record['params']['workers']
+        speedup = results['answers_per_s'] / base_rate
+        efficiency = speedup / (workers / base['params']['workers'])
+        print(f"{workers:>8}{results['answers_per_s']:>11.2f}{speedup:>8.2f}x{efficiency:>11.0%}"
+              f"{results['latency_ms']['p50']:>9.1f}{results['latency_ms']['p95']:>9.1f}{results['timeouts']:>10}")
+
+
+if __name__ == '__main__':
+    main()
@@ -5,8 +5,23 @@ import json
 from datetime import datetime
 import requests
 import base64
+import io
+import sys
+import wave
+from pathlib import Path
 from audio_recorder_streamlit import audio_recorder
 
+# The frame layout is shared with the backend (streamlit only puts frontend/ on the path)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from backend.utils.audio_framing import (
+    CODEC_OPUS, FLAG_END_OF_UTTERANCE, FRAME_STREAM_MEDIA_TYPE, encode_frame, pack_frames
+)
+
+try:
+    import opuslib  # optional: uploads Opus (~16 kbit/s) instead of WAV (256 kbit/s)
+except ImportError:
+    opuslib = None
+
 # Page config
 st.set_page_config(
     page_title="AI Earbud Assistant - Passive Mode",
@@ -18,6 +33,38 @@ st.set_page_config(
 BACKEND_URL = "http://localhost:8000"
 WS_URL = "ws://localhost:8000/ws"
 
+# Opus upload settings; uploaded as a length-prefixed stream of binary frames
+OPUS_BITRATE = 16000
+OPUS_FRAME_MS = 20
+OPUS_RATES = (8000, 12000, 16000, 24000, 48000)
+
+
+def encode_opus_upload(wav_bytes):
+    """Re-encode a recorded WAV as a stream of Opus frames; None if not possible"""
+    if opuslib is None:
+        return None
+    try:
+        with wave.open(io.BytesIO(wav_bytes), 'rb') as wav:
+            channels, width, rate = wav.getnchannels(), wav.getsampwidth(), wav.getframerate()
+            pcm = wav.readframes(wav.getnframes())
+    except (wave.Error, EOFError):
+        return None
+    if width != 2 or channels > 2 or rate not in OPUS_RATES:
+        return None
+
+    encoder = opuslib.Encoder(rate, channels, opuslib.APPLICATION_VOIP)
+    encoder.bitrate = OPUS_BITRATE
+    frame_samples = rate * OPUS_FRAME_MS // 1000
+    step = frame_samples * channels * 2
+    chunks = [pcm[i:i + step] for i in range(0, len(pcm), step)]
+    frames = []
+    for sequence, chunk in enumerate(chunks):
+        packet = encoder.encode(chunk.ljust(step, b'\0'), frame_samples)
+        flags = FLAG_END_OF_UTTERANCE if sequence == len(chunks) - 1 else 0
+        frames.append(encode_frame(packet, sequence, rate, CODEC_OPUS, flags, channels))
+    return pack_frames(frames)
+
+
 # Initialize session state
 if 'conversation_history' not in st.session_state:
     st.session_state.conversation_history = []
@@ -117,8 +164,16 @@ with col1:
     if audio_bytes:
         # Send audio to backend
         with st.spinner("👂 AI is analyzing your voice..."):
-            files = {'file': ('audio.wav', audio_bytes, 'audio/wav')}
-            response = requests.post(f"{BACKEND_URL}/api/voice", files=files)
+            opus_bytes = encode_opus_upload(audio_bytes)
+            if opus_bytes:
+                files = {'file': ('audio.opus', opus_bytes, FRAME_STREAM_MEDIA_TYPE)}
+            else:
+                files = {'file': ('audio.wav', audio_bytes, 'audio/wav')}
+            response = requests.post(
+                f"{BACKEND_URL}/api/voice",
+                files=files,
+                params={"client_id": st.session_state.client_id}
+            )
             
             if response.status_code == 200:
                 data = response.json()
@@ -167,7 +222,7 @@ with col1:
         with st.spinner("Processing..."):
             response = requests.post(
                 f"{BACKEND_URL}/api/question",
-                params={"question": user_input}
+                params={"question": user_input, "client_id": st.session_state.client_id}
             )
             
             if response.status_code == 200:
@@ -235,7 +290,11 @@ with st.sidebar:
     
     if uploaded_file:
         files = {'file': uploaded_file}
-        response = requests.post(f"{BACKEND_URL}/api/context", files=files)
+        response = requests.post(
+            f"{BACKEND_URL}/api/context",
+            files=files,
+            params={"client_id": st.session_state.client_id}
+        )
         if response.status_code == 200:
             st.success(f"✅ Uploaded: {uploaded_file.name}")
     
@@ -251,12 +310,12 @@ with st.sidebar:
     # Controls
     st.subheader("🗑️ Controls")
     if st.button("Clear History", use_container_width=True):
-        requests.delete(f"{BACKEND_URL}/api/history")
+        requests.delete(f"{BACKEND_URL}/api/history", params={"client_id": st.session_state.client_id})
         st.session_state.conversation_history = []
         st.success("✅ History cleared!")
     
     if st.button("Clear Context", use_container_width=True):
-        requests.delete(f"{BACKEND_URL}/api/context")
+        requests.delete(f"{BACKEND_URL}/api/context", params={"client_id": st.session_state.client_id})
         st.success("✅ Context cleared!")
 
 # Footer
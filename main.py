@@ -1,7 +1,9 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import logging
 from backend.routes import websocket, api
+from backend.services.container import ServiceContainer
 from backend.config import settings
 
 # Configure logging
@@ -11,11 +13,24 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One set of services for both routers, built on the serving event loop
+    logger.info("🎧 AI Earbud Assistant starting in PASSIVE LISTENING mode")
+    logger.info("AI will remain SILENT unless a question is detected")
+    services = app.state.services = ServiceContainer(settings)
+    await services.startup()
+    try:
+        yield
+    finally:
+        await services.shutdown()
+
 # Create FastAPI app
 app = FastAPI(
     title="AI Earbud Assistant - Passive Listening Mode",
     description="Silent AI assistant that only speaks when questions are detected",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS middleware
@@ -40,11 +55,6 @@ async def root():
         "docs": "/docs"
     }
 
-@app.on_event("startup")
-async def startup_event():
-    logger.info("🎧 AI Earbud Assistant starting in PASSIVE LISTENING mode")
-    logger.info("AI will remain SILENT unless a question is detected")
-
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
@@ -0,0 +1,51 @@
+import pytest
+
+from backend.utils.audio_framing import (
+    CODEC_OPUS, CODEC_PCM16, FRAME_HEADER, FrameError, encode_frame, is_frame_stream,
+    iter_frames, pack_frames, parse_frame
+)
+
+
+def test_encode_parse_round_trip():
+    frame = parse_frame(encode_frame(b"\x01\x02\x03\x04", 7, 16000, CODEC_OPUS, flags=0x01, channels=2))
+    assert (frame.sequence, frame.codec, frame.channels, frame.sample_rate) == (7, CODEC_OPUS, 2, 16000)
+    assert frame.end_of_utterance
+    assert bytes(frame.payload) == b"\x01\x02\x03\x04"
+
+
+def test_payload_is_a_view_not_a_copy():
+    data = bytearray(encode_frame(b"\x00\x00", 1, 16000))
+    frame = parse_frame(data)
+    data[FRAME_HEADER.size] = 0x7f
+    assert frame.payload[0] == 0x7f
+
+
+def test_sequence_wraps_at_32_bits():
+    assert parse_frame(encode_frame(b"", 2 ** 32 + 5, 16000)).sequence == 5
+
+
+@pytest.mark.parametrize("data, message", [
+    (b"EA\x01", "too short"),
+    (b"XX" + encode_frame(b"", 0, 16000)[2:], "magic"),
+    (encode_frame(b"", 0, 16000)[:2] + b"\x09" + encode_frame(b"", 0, 16000)[3:], "version"),
+    (encode_frame(b"", 0, 16000, codec=99), "codec"),
+    (encode_frame(b"", 0, 0, CODEC_PCM16), "sample rate"),
+])
+def test_malformed_headers_raise_frame_error(data, message):
+    with pytest.raises(FrameError, match=message):
+        parse_frame(data)
+
+
+def test_frame_stream_round_trip():
+    frames = [encode_frame(bytes([i]) * 4, i, 48000, CODEC_OPUS) for i in range(3)]
+    stream = pack_frames(frames)
+    assert is_frame_stream(stream)
+    parsed = list(iter_frames(stream))
+    assert [frame.sequence for frame in parsed] == [0, 1, 2]
+    assert [bytes(frame.payload) for frame in parsed] == [bytes([i]) * 4 for i in range(3)]
+
+
+def test_truncated_frame_stream_raises():
+    stream = pack_frames([encode_frame(b"\x00" * 8, 0, 16000)])
+    with pytest.raises(FrameError, match="Truncated"):
+        list(iter_frames(stream[:-1]))
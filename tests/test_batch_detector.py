@@ -0,0 +1,60 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from backend.services.batch_detector import BatchDetector, iter_lines, parse_line
+
+
+async def lines_of(lines):
+    for line in lines:
+        yield line
+
+
+def run_stream(detector, lines, **kwargs):
+    async def collect():
+        return [result async for result in detector.stream(lines_of(lines), **kwargs)]
+    return asyncio.run(collect())
+
+
+def test_parse_line_accepts_jsonl_and_plain_text():
+    assert parse_line(1, '{"text": "What time is it?", "id": 7}\n') == (1, 7, "What time is it?")
+    assert parse_line(2, "  where is the station  ") == (2, None, "where is the station")
+    assert parse_line(3, "{not json") == (3, None, "{not json")
+    assert parse_line(4, "   \n") is None
+
+
+def test_results_follow_input_order_then_a_summary():
+    lines = ["What time does the meeting start?", "", "I went to the shop.", '{"text": "How far is Paris?", "id": "a"}']
+    results = run_stream(BatchDetector(chunk_size=2), lines)
+    records, summary = results[:-1], results[-1]
+    assert [r['line'] for r in records] == [1, 3, 4]
+    assert records[2]['id'] == "a"
+    assert records[0]['is_question'] and not records[1]['is_question']
+    assert summary['type'] == 'summary'
+    assert summary['total'] == 3
+    assert summary['questions'] == sum(r['is_question'] for r in records)
+
+
+def test_threshold_override_changes_the_response_gate():
+    lines = ["What time does the meeting start?"]
+    assert run_stream(BatchDetector(), lines, confidence_threshold=0.0)[0]['would_respond']
+    assert not run_stream(BatchDetector(), lines, confidence_threshold=1.01)[0]['would_respond']
+
+
+def test_pooled_chunks_keep_input_order():
+    lines = [f"How many items are in box {i}?" for i in range(50)]
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        detector = BatchDetector(chunk_size=4, process_threshold=8, executor=executor)
+        results = run_stream(detector, lines)
+    assert [r['line'] for r in results[:-1]] == list(range(1, 51))
+    assert results[-1]['total'] == 50
+
+
+def test_iter_lines_handles_characters_split_across_chunks():
+    async def chunks():
+        data = "café?\nnaïve\n".encode()
+        for i in range(len(data)):
+            yield data[i:i + 1]
+
+    async def collect():
+        return [line async for line in iter_lines(chunks())]
+    assert asyncio.run(collect()) == ["café?", "naïve"]
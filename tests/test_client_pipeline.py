@@ -0,0 +1,38 @@
+import asyncio
+
+from backend.services.client_pipeline import ClientPipeline
+from backend.services.resilience import StageBudget
+from backend.services.tracing import Tracer
+
+
+def test_late_transcript_is_answered_and_its_overrun_traced_as_a_span_only():
+    tracer = Tracer()
+    budget = StageBudget(0.1, {'stt': 0.2, 'llm': 0.8})
+    finals = []
+
+    async def scenario():
+        pipeline = ClientPipeline("alice", send_json=None, tracer=tracer, stage_budget=budget)
+
+        async def on_final(text, confidence, trace):
+            finals.append((text, trace))
+
+        async def nothing(*args):
+            pass
+
+        pipeline.start(nothing, on_final, nothing)
+        future = asyncio.get_running_loop().create_future()
+        await pipeline.put_transcription(future)
+        await asyncio.sleep(0.05)  # past the 20 ms stt share
+        future.set_result(("What time is it?", 0.9))
+        while not finals:
+            await asyncio.sleep(0.01)
+        await pipeline.close()
+        return pipeline
+
+    pipeline = asyncio.run(scenario())
+    assert pipeline.stt_overruns == 1
+    assert budget.missed['stt'] == 1
+    [(text, trace)] = finals
+    assert text == "What time is it?"
+    assert [stage for stage, _, _ in trace.spans] == ['stt_overrun', 'stt']
+    assert 'stt_overrun' not in tracer.histograms
@@ -0,0 +1,93 @@
+import asyncio
+
+from backend.services.context_index import BM25Index, chunk_passages
+from backend.services.context_manager import ContextManager
+
+
+def test_search_ranks_matching_passages():
+    index = BM25Index()
+    index.add_passage(0, "The invoice total is due on Friday")
+    index.add_passage(0, "Lunch is at noon in the cafeteria")
+    index.add_passage(1, "Invoice numbers start with INV")
+    results = index.search("invoice due friday")
+    assert [passage_id for passage_id, _ in results][:1] == [0]
+    assert {passage_id for passage_id, _ in results} == {0, 2}
+
+
+def test_removed_documents_are_tombstoned_out_of_results():
+    index = BM25Index()
+    for doc_id in range(4):
+        index.add_passage(doc_id, f"shared term document{doc_id}")
+    index.remove_document(1)
+    assert len(index) == 3
+    assert 1 not in {index.passage_document[p] for p, _ in index.search("shared term")}
+    assert index.documents_matching(["document1"]) == set()
+    # One tombstone of three live passages: not compacted yet
+    assert 1 in index._removed
+
+
+def test_compaction_drops_tombstones_from_postings():
+    index = BM25Index()
+    for doc_id in range(4):
+        index.add_passage(doc_id, f"shared term document{doc_id}")
+    index.remove_document(0)
+    index.remove_document(1)  # 2 removed > half of the 2 live passages
+    assert index._removed == set()
+    term_id = index.vocabulary["shared"]
+    assert list(index.postings[term_id][0]) == [2, 3]
+    assert index.vocabulary["document0"] not in index.postings
+    # Passage ids stay stable after compaction
+    assert index.add_passage(4, "shared newcomer") == 4
+    assert {index.passage_document[p] for p, _ in index.search("shared")} == {2, 3, 4}
+
+
+def recounted_bytes(index):
+    postings = sum(ids.itemsize * len(ids) * 2 for ids, _ in index.postings.values())
+    tables = (len(index.passage_lengths) + len(index.passage_document)) * 4
+    vocabulary = sum(len(token) + 60 for token in index.vocabulary)
+    return postings + tables + vocabulary + len(index._removed) * 40
+
+
+def test_memory_estimate_is_kept_up_to_date():
+    index = BM25Index()
+    for doc_id in range(4):
+        index.add_passage(doc_id, f"shared term document{doc_id} " * (doc_id + 1))
+        assert index.memory_estimate() == recounted_bytes(index)
+    index.remove_document(0)  # tombstoned
+    assert index._removed and index.memory_estimate() == recounted_bytes(index)
+    index.remove_document(1)  # compacted
+    assert not index._removed and index.memory_estimate() == recounted_bytes(index)
+    index.clear()
+    assert index.memory_estimate() == 0
+
+
+def test_chunk_passages_keeps_whole_sentences():
+    text = "One two three. Four five six. Seven eight nine."
+    assert chunk_passages(text, max_words=6) == ["One two three. Four five six.", "Seven eight nine."]
+
+
+
+def test_relevant_context_picks_the_matching_passage():
+    manager = ContextManager(passage_words=10)
+    manager.add_context("Paris is the capital of France. " * 3 + "Berlin is the capital of Germany.")
+    manager.add_context("The meeting moved to room four.")
+    assert "Berlin" in manager.get_relevant_context("capital of germany")
+    # No match: the most recent uploads, newest last
+    assert manager.get_relevant_context("zebra").endswith("The meeting moved to room four.")
+
+
+def test_feed_document_indexes_like_add_context():
+    text = "Paris is the capital of France. " * 50 + "Berlin is the capital of Germany. " * 50
+    direct = ContextManager(passage_words=20)
+    direct_entry = direct.add_context(text)
+
+    async def offloop():
+        manager = ContextManager(passage_words=20)
+        ingest = manager.begin_context()
+        await ingest.feed_document(text, batch=7)
+        return manager, ingest.finish()
+
+    manager, entry = asyncio.run(offloop())
+    assert entry['word_count'] == direct_entry['word_count']
+    assert entry['passage_count'] == direct_entry['passage_count']
+    assert manager.get_relevant_context("capital of germany") == direct.get_relevant_context("capital of germany")
@@ -0,0 +1,83 @@
+import asyncio
+
+import pytest
+
+from backend.services.conversation_log import ConversationLog, InvalidCursor
+
+
+def run_with_log(tmp_path, scenario, **kwargs):
+    async def main():
+        log = ConversationLog(str(tmp_path / "log" / "conversations.db"), **kwargs)
+        await log.open()
+        try:
+            return await scenario(log)
+        finally:
+            await log.close()
+    return asyncio.run(main())
+
+
+def test_pages_run_newest_first_and_oldest_first_within_a_page(tmp_path):
+    async def scenario(log):
+        for i in range(5):
+            log.append("alice", f"q{i}", f"a{i}", timestamp=1000 + i)
+        log.append("bob", "other", "client")
+        first = await log.page("alice", limit=2)
+        second = await log.page("alice", cursor=first['next_cursor'], limit=2)
+        last = await log.page("alice", cursor=second['next_cursor'], limit=2)
+        return first, second, last
+
+    first, second, last = run_with_log(tmp_path, scenario)
+    assert [item['question'] for item in first['items']] == ["q3", "q4"]
+    assert [item['question'] for item in second['items']] == ["q1", "q2"]
+    assert [item['question'] for item in last['items']] == ["q0"]
+    assert last['next_cursor'] is None
+
+
+def test_reads_see_appends_still_waiting_to_be_written(tmp_path):
+    async def scenario(log):
+        log.append("alice", "What time is it?", "Noon")
+        assert log.get_stats()['pending'] == 1
+        return await log.recent("alice", 10)
+
+    # A long flush interval: only the read's own flush can write the row
+    recent = run_with_log(tmp_path, scenario, flush_interval_ms=60_000)
+    assert [(entry['question'], entry['answer']) for entry in recent] == [("What time is it?", "Noon")]
+
+
+def test_clear_marker_hides_earlier_exchanges(tmp_path):
+    async def scenario(log):
+        log.append("alice", "before", "clear")
+        log.append_clear("alice")
+        log.append("alice", "after", "clear")
+        return await log.recent("alice", 10)
+
+    assert [entry['question'] for entry in run_with_log(tmp_path, scenario)] == ["after"]
+
+
+def test_time_bounds_filter_exchanges(tmp_path):
+    async def scenario(log):
+        for ts in (100, 200, 300):
+            log.append("alice", f"at {ts}", "", timestamp=ts)
+        return await log.page("alice", since=150, until=300)
+
+    assert [item['question'] for item in run_with_log(tmp_path, scenario)['items']] == ["at 200"]
+
+
+def test_rows_are_written_in_batches(tmp_path):
+    async def scenario(log):
+        for i in range(10):
+            log.append("alice", f"q{i}", "a")
+        await log.flush()
+        return log.get_stats()
+
+    stats = run_with_log(tmp_path, scenario, batch_size=100)
+    assert stats['written'] == 10
+    assert stats['batches'] == 1
+
+
+def test_foreign_cursor_is_rejected(tmp_path):
+    async def scenario(log):
+        with pytest.raises(InvalidCursor):
+            await log.page("alice", cursor="not-a-cursor")
+
+    run_with_log(tmp_path, scenario)
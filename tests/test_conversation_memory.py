@@ -0,0 +1,107 @@
+import asyncio
+
+from backend.services.context_manager import ContextManager
+from backend.services.conversation_memory import ConversationMemory
+from backend.services.session_manager import Session
+
+
+class FakeSummarizer:
+    recent_turns = 2
+
+    def __init__(self, fail=False, delay=0.0):
+        self.fail = fail
+        self.delay = delay
+        self.calls = []
+
+    async def summarize(self, previous, turns, max_words, timeout):
+        self.calls.append((previous, [entry['question'] for entry in turns]))
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("model unavailable")
+        return ' '.join(filter(None, [previous] + [entry['question'] for entry in turns]))
+
+
+def make_session(turns):
+    session = Session("alice", ContextManager())
+    for i in range(turns):
+        session.add_exchange(f"q{i}", f"a{i}")
+        # Distinct timestamps, as real exchanges are seconds apart
+        session.history[-1]['timestamp'] = float(i + 1)
+    return session
+
+
+async def settle(memory):
+    while memory._running:
+        await asyncio.gather(*memory._running.values())
+
+
+def test_turns_older_than_the_verbatim_window_are_folded():
+    summarizer = FakeSummarizer()
+    memory = ConversationMemory(summarizer)
+    session = make_session(4)
+
+    async def scenario():
+        memory.schedule(session)
+        await settle(memory)
+        # Two more turns push q2 and q3 out of the window
+        for i in (4, 5):
+            session.add_exchange(f"q{i}", f"a{i}")
+            session.history[-1]['timestamp'] = float(i + 1)
+        memory.schedule(session)
+        await settle(memory)
+
+    asyncio.run(scenario())
+    assert summarizer.calls == [("", ["q0", "q1"]), ("q0 q1", ["q2", "q3"])]
+    assert session.summary == "q0 q1 q2 q3"
+    assert session.summary_through == 4.0
+    assert memory.get_stats()['turns_folded'] == 4
+
+
+def test_nothing_to_fold_inside_the_window():
+    summarizer = FakeSummarizer()
+    memory = ConversationMemory(summarizer)
+    session = make_session(2)
+
+    async def scenario():
+        memory.schedule(session)
+        await settle(memory)
+
+    asyncio.run(scenario())
+    assert summarizer.calls == []
+    assert session.summary == ""
+
+
+def test_failed_update_keeps_the_old_summary_and_retries_the_turns():
+    summarizer = FakeSummarizer(fail=True)
+    memory = ConversationMemory(summarizer)
+    session = make_session(3)
+    session.summary = "earlier"
+
+    async def scenario():
+        memory.schedule(session)
+        await settle(memory)
+        summarizer.fail = False
+        memory.schedule(session)
+        await settle(memory)
+
+    asyncio.run(scenario())
+    assert memory.failures == 1
+    assert summarizer.calls == [("earlier", ["q0"]), ("earlier", ["q0"])]
+    assert session.summary == "earlier q0"
+
+
+def test_clearing_history_mid_update_drops_the_result():
+    summarizer = FakeSummarizer(delay=0.01)
+    memory = ConversationMemory(summarizer)
+    session = make_session(4)
+
+    async def scenario():
+        memory.schedule(session)
+        await asyncio.sleep(0)
+        session.clear_history()
+        await settle(memory)
+
+    asyncio.run(scenario())
+    assert session.summary == ""
+    assert session.summary_through == 0.0
+    assert memory.updates == 0
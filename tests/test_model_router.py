@@ -0,0 +1,122 @@
+import asyncio
+
+import pytest
+
+from backend.services.model_router import ModelRouter
+from backend.services.resilience import RetryBudget
+
+
+def warmed_router(latency=0.01, **kwargs):
+    router = ModelRouter(["fast", "big"], deadline=2.0, min_samples=3, **kwargs)
+    for tier in router.tiers:
+        for _ in range(5):
+            tier.record(latency)
+    return router
+
+
+def test_slow_call_is_hedged_and_the_hedge_wins():
+    router = warmed_router()
+    attempts = []
+
+    async def call(model):
+        attempts.append(model)
+        # First copy hangs, the hedge answers quickly
+        await asyncio.sleep(5 if len(attempts) == 1 else 0.01)
+        return f"{model}-{len(attempts)}"
+
+    async def scenario():
+        return await router.run(router.fast, call)
+
+    assert asyncio.run(scenario()) == "fast-2"
+    assert router.fast.hedges == 1
+    assert router.fast.hedge_wins == 1
+
+
+def test_losing_copy_is_cancelled():
+    router = warmed_router()
+    cancelled = []
+
+    async def call(model, count=[0]):
+        count[0] += 1
+        copy = count[0]
+        try:
+            await asyncio.sleep(0.03 if copy == 1 else 1)
+        except asyncio.CancelledError:
+            cancelled.append(copy)
+            raise
+        return f"copy{copy}"
+
+    async def scenario():
+        result = await router.run(router.fast, call)
+        await asyncio.sleep(0)
+        return result
+
+    assert asyncio.run(scenario()) == "copy1"
+    assert router.fast.hedges == 1
+    assert router.fast.hedge_wins == 0
+    assert cancelled == [2]
+
+
+def test_no_hedge_without_retry_budget():
+    router = warmed_router(retry_budget=RetryBudget(ratio=0.0, max_tokens=0))
+
+    async def call(model):
+        await asyncio.sleep(0.05)
+        return model
+
+    assert asyncio.run(router.run(router.fast, call)) == "fast"
+    assert router.fast.hedges == 0
+
+
+def test_escalated_miss_falls_back_to_tier_zero_within_the_deadline():
+    router = ModelRouter(["fast", "big"], deadline=0.5, escalated_budget=0.4, hedge_percentile=None)
+
+    async def call(model):
+        await asyncio.sleep(5 if model == "big" else 0.01)
+        return model
+
+    assert asyncio.run(router.run(router.tiers[1], call)) == "fast"
+    assert router.fallbacks == 1
+    assert router.tiers[1].timeouts == 1
+
+
+def test_no_fallback_when_too_little_time_is_left():
+    router = ModelRouter(
+        ["fast", "big"], deadline=0.3, escalated_budget=0.9, min_fallback_budget=0.25, hedge_percentile=None
+    )
+
+    async def call(model):
+        await asyncio.sleep(5)
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(router.run(router.tiers[1], call))
+    assert router.fallbacks == 0
+
+
+def test_open_questions_and_large_prompts_escalate():
+    router = ModelRouter(["fast", "mid", "big"])
+    assert router.choose("What time is it?") == (router.tiers[0], 'default')
+    assert router.choose("Why is the sky blue?") == (router.tiers[1], 'question_type')
+    tier, reason = router.choose("Explain this", prompt_tokens=1000)
+    assert (tier, reason) == (router.tiers[2], 'question_type+context_size')
+
+
+def test_slow_escalated_tier_is_skipped_and_probed():
+    router = ModelRouter(["fast", "big"], deadline=1.0, min_samples=3, probe_every=3)
+    for _ in range(3):
+        router.tiers[1].record(2.0)
+    reasons = [router.choose("Why is the sky blue?")[1] for _ in range(3)]
+    assert reasons == ['slow_p95', 'slow_p95', 'probe']
+    assert router.demotions == 2
+
+
+def test_escalated_error_falls_back_to_tier_zero():
+    router = ModelRouter(["fast", "big"])
+
+    async def call(model):
+        if model == "big":
+            raise RuntimeError("overloaded")
+        return model
+
+    assert asyncio.run(router.run(router.tiers[1], call)) == "fast"
+    assert router.tiers[1].errors == 1
@@ -0,0 +1,73 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+from backend.services.openai_service import OpenAIService
+
+
+class FakeStream:
+    """Chunks after the first token, then a stall or an error"""
+
+    def __init__(self, texts, stall=0.0, error=None):
+        self.texts = list(texts)
+        self.stall = stall
+        self.error = error
+        self.closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.texts:
+            return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=self.texts.pop(0)))])
+        if self.stall:
+            await asyncio.sleep(self.stall)
+        if self.error is not None:
+            raise self.error
+        raise StopAsyncIteration
+
+    async def close(self):
+        self.closed = True
+
+
+def make_service(stream):
+    service = OpenAIService(api_key="test")
+
+    async def open_stream(model, messages):
+        return stream, "Paris "
+
+    service._open_stream = open_stream
+    return service
+
+
+def collect(service, **kwargs):
+    async def run():
+        return [delta async for delta in service.stream_short_response("What is the capital of France?", **kwargs)]
+    return asyncio.run(run())
+
+
+def test_stream_completes_and_keeps_the_circuit_closed():
+    stream = FakeStream(["is the ", "capital."])
+    service = make_service(stream)
+    assert ''.join(collect(service)) == "Paris is the capital"
+    assert stream.closed
+    assert service.breaker.failures == 0 and service.degraded == 0
+
+
+def test_stall_after_the_first_token_is_cut_at_the_deadline():
+    stream = FakeStream(["is "], stall=5)
+    service = make_service(stream)
+    start = time.perf_counter()
+    assert collect(service, deadline=0.2) == ["Paris", " is"]
+    assert time.perf_counter() - start < 1
+    assert stream.closed
+    assert service.breaker.failures == 1
+    assert service.degraded == 1
+
+
+def test_error_after_the_first_token_counts_against_the_circuit():
+    stream = FakeStream([], error=RuntimeError("connection reset"))
+    service = make_service(stream)
+    assert collect(service) == ["Paris"]
+    assert service.breaker.failures == 1
+    assert service.degraded == 1
@@ -0,0 +1,128 @@
+import asyncio
+
+import pytest
+
+from backend.services.request_coalescer import RequestCoalescer
+
+
+def test_identical_calls_share_one_upstream_call():
+    async def scenario():
+        coalescer = RequestCoalescer()
+        calls = []
+
+        async def upstream():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "answer"
+
+        results = await asyncio.gather(*[coalescer.call("key", upstream) for _ in range(3)])
+        return coalescer, calls, results
+
+    coalescer, calls, results = asyncio.run(scenario())
+    assert results == ["answer"] * 3
+    assert len(calls) == 1
+    assert coalescer.calls_saved == 2
+    assert coalescer.get_stats()['in_flight'] == 0
+
+
+def test_call_is_cancelled_only_when_every_waiter_has_gone():
+    async def scenario():
+        coalescer = RequestCoalescer()
+        cancelled = asyncio.Event()
+
+        async def upstream():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        first = asyncio.ensure_future(coalescer.call("key", upstream))
+        second = asyncio.ensure_future(coalescer.call("key", upstream))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0.01)
+        still_running = not cancelled.is_set()
+        second.cancel()
+        await asyncio.wait_for(cancelled.wait(), 1)
+        return coalescer, still_running
+
+    coalescer, still_running = asyncio.run(scenario())
+    assert still_running
+    assert coalescer.abandoned == 1
+    assert coalescer.get_stats()['in_flight'] == 0
+
+
+def test_errors_reach_every_waiter():
+    async def scenario():
+        coalescer = RequestCoalescer()
+
+        async def upstream():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("upstream down")
+
+        return await asyncio.gather(
+            *[coalescer.call("key", upstream) for _ in range(2)], return_exceptions=True
+        )
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+def test_late_stream_joiner_replays_then_follows():
+    async def scenario():
+        coalescer = RequestCoalescer()
+        started = []
+
+        async def upstream():
+            started.append(1)
+            for word in ["one ", "two ", "three"]:
+                await asyncio.sleep(0.01)
+                yield word
+
+        async def collect(delay):
+            await asyncio.sleep(delay)
+            return ''.join([delta async for delta in coalescer.stream("key", upstream)])
+
+        return started, await asyncio.gather(collect(0), collect(0.015))
+
+    started, texts = asyncio.run(scenario())
+    assert texts == ["one two three"] * 2
+    assert len(started) == 1
+
+
+def test_abandoned_stream_is_cancelled():
+    async def scenario():
+        coalescer = RequestCoalescer()
+        closed = asyncio.Event()
+
+        async def upstream():
+            try:
+                while True:
+                    await asyncio.sleep(0.005)
+                    yield "word "
+            finally:
+                closed.set()
+
+        stream = coalescer.stream("key", upstream)
+        assert await stream.__anext__() == "word "
+        await stream.aclose()
+        await asyncio.wait_for(closed.wait(), 1)
+        return coalescer
+
+    assert asyncio.run(scenario()).abandoned == 1
+
+
+@pytest.mark.parametrize("keys", [("a", "b")])
+def test_different_keys_do_not_share(keys):
+    async def scenario():
+        coalescer = RequestCoalescer()
+
+        async def upstream():
+            await asyncio.sleep(0.01)
+            return "x"
+
+        await asyncio.gather(*[coalescer.call(key, upstream) for key in keys])
+        return coalescer
+
+    assert asyncio.run(scenario()).calls_saved == 0
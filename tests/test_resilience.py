@@ -0,0 +1,123 @@
+import asyncio
+
+import pytest
+
+from backend.services import resilience
+from backend.services.resilience import CircuitBreaker, CircuitOpenError, RetryBudget, StageBudget
+
+
+async def fail():
+    raise RuntimeError("down")
+
+
+async def succeed():
+    return "ok"
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(resilience.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_circuit_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker("llm", failure_threshold=3, reset_timeout=10)
+
+    async def scenario():
+        for _ in range(3):
+            with pytest.raises(RuntimeError):
+                await breaker.call(fail)
+        with pytest.raises(CircuitOpenError):
+            await breaker.call(succeed)
+
+    asyncio.run(scenario())
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.rejected == 1
+
+
+def test_half_open_lets_one_trial_through_and_closes_on_success(clock):
+    breaker = CircuitBreaker("llm", failure_threshold=1, reset_timeout=10)
+
+    async def scenario():
+        with pytest.raises(RuntimeError):
+            await breaker.call(fail)
+        clock[0] += 10
+        release = asyncio.Event()
+
+        async def slow_success():
+            await release.wait()
+            return "ok"
+
+        trial = asyncio.ensure_future(breaker.call(slow_success))
+        await asyncio.sleep(0)
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        # Only one trial at a time
+        with pytest.raises(CircuitOpenError):
+            await breaker.call(succeed)
+        release.set()
+        assert await trial == "ok"
+
+    asyncio.run(scenario())
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.failures == 0
+
+
+def test_half_open_failure_reopens_for_another_timeout(clock):
+    breaker = CircuitBreaker("llm", failure_threshold=1, reset_timeout=10)
+
+    async def scenario():
+        with pytest.raises(RuntimeError):
+            await breaker.call(fail)
+        clock[0] += 10
+        with pytest.raises(RuntimeError):
+            await breaker.call(fail)
+        assert breaker.state == CircuitBreaker.OPEN
+        clock[0] += 5
+        with pytest.raises(CircuitOpenError):
+            await breaker.call(succeed)
+
+    asyncio.run(scenario())
+    assert breaker.opened == 2
+
+
+def test_cancelled_trial_does_not_count_as_a_failure(clock):
+    breaker = CircuitBreaker("llm", failure_threshold=1, reset_timeout=10)
+
+    async def scenario():
+        with pytest.raises(RuntimeError):
+            await breaker.call(fail)
+        clock[0] += 10
+        trial = asyncio.ensure_future(breaker.call(lambda: asyncio.sleep(10)))
+        await asyncio.sleep(0)
+        trial.cancel()
+        await asyncio.gather(trial, return_exceptions=True)
+        # The next call is the new trial
+        assert await breaker.call(succeed) == "ok"
+
+    asyncio.run(scenario())
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_retry_budget_allows_a_fraction_of_requests():
+    budget = RetryBudget(ratio=0.25, max_tokens=1)
+    assert budget.spend()
+    assert not budget.spend()
+    for _ in range(4):
+        budget.deposit()
+    assert budget.spend()
+    assert budget.denied == 1
+
+
+def test_stage_budget_reserves_time_for_later_stages():
+    budget = StageBudget(10.0, {'stt': 0.3, 'retrieval': 0.1, 'llm': 0.6})
+    assert budget.reserved_after('stt') == pytest.approx(7.0)
+    assert budget.reserved_after('llm') == 0.0
+    deadline = budget.start()
+    assert deadline.stage('stt') == pytest.approx(3.0, abs=0.05)
+    assert deadline.stage('llm') == pytest.approx(10.0, abs=0.05)
+
+
+def test_stage_budget_shares_must_add_up():
+    with pytest.raises(ValueError):
+        StageBudget(5.0, {'stt': 0.5, 'llm': 0.6})
@@ -0,0 +1,67 @@
+from backend.services import response_cache
+from backend.services.response_cache import ResponseCache
+
+
+def test_exact_hit_is_keyed_on_context_and_word_limit():
+    cache = ResponseCache()
+    cache.put("What time is it?", "ctx", "noon", 15)
+    assert cache.get("what time is it", "ctx", 15) == "noon"
+    assert cache.get("what time is it", "other", 15) is None
+    assert cache.get("what time is it", "ctx", 5) is None
+    assert cache.exact_hits == 1
+
+
+def test_lru_eviction():
+    cache = ResponseCache(max_entries=2)
+    cache.put("first question here", "", "1")
+    cache.put("second question here", "", "2")
+    assert cache.get("first question here") == "1"  # now most recent
+    cache.put("third question here", "", "3")
+    assert cache.get("second question here") is None
+    assert cache.get("first question here") == "1"
+    assert cache.evictions == 1
+
+
+def test_ttl_expiry_leaves_a_stale_answer(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(response_cache.time, "monotonic", lambda: now[0])
+    cache = ResponseCache(ttl_seconds=10)
+    cache.put("what is the capital of france", "", "Paris")
+    now[0] += 11
+    assert cache.get("what is the capital of france") is None
+    assert cache.get("what is the capital of france paris") is None  # fuzzy skips expired entries too
+    assert cache.get_stale("what is the capital of france") == "Paris"
+
+
+def test_fuzzy_hit_on_added_filler_words():
+    cache = ResponseCache(fuzzy_threshold=0.8)
+    cache.put("what is the weather like today", "", "sunny")
+    assert cache.get("what is the weather like today please") == "sunny"
+    assert cache.fuzzy_hits == 1
+
+
+def test_fuzzy_never_flips_negation():
+    cache = ResponseCache(fuzzy_threshold=0.8)
+    cache.put("should I buy the stock", "", "yes")
+    assert cache.get("should I not buy the stock") is None
+    assert cache.get("shouldn't I buy the stock") is None
+
+
+def test_fuzzy_respects_word_order():
+    cache = ResponseCache(fuzzy_threshold=0.8)
+    cache.put("is paris bigger than london", "", "yes")
+    assert cache.get("is london bigger than paris") is None
+
+
+def test_fuzzy_is_scoped_to_the_context():
+    cache = ResponseCache(fuzzy_threshold=0.8)
+    cache.put("what is the weather like today", "ctx", "sunny")
+    assert cache.get("what is the weather like today please", "other") is None
+
+
+def test_invalidate_drops_everything():
+    cache = ResponseCache()
+    cache.put("what time is it", "", "noon")
+    cache.invalidate()
+    assert cache.get("what time is it") is None
+    assert cache.invalidations == 1
@@ -0,0 +1,32 @@
+from backend.services.openai_service import ResponseLimiter
+
+
+def feed_all(limiter, deltas):
+    return ''.join(limiter.feed(delta) for delta in deltas) + limiter.finish()
+
+
+def test_cuts_at_max_words_and_stops():
+    limiter = ResponseLimiter(3)
+    assert feed_all(limiter, ["one two ", "three four five"]) == "one two three"
+    assert limiter.done
+    assert limiter.feed(" six") == ""
+
+
+def test_never_emits_half_a_word_past_the_limit():
+    limiter = ResponseLimiter(2)
+    emitted = [limiter.feed(delta) for delta in ["Par", "is is ", "the capital"]]
+    assert ''.join(emitted) == "Paris is"
+    assert limiter.text == "Paris is"
+
+
+def test_trailing_punctuation_is_held_back_until_more_words_follow():
+    limiter = ResponseLimiter(10)
+    assert limiter.feed("It is noon.") == "It is noon"
+    assert limiter.feed(" Really") == ". Really"
+    assert limiter.finish() == ""
+    assert limiter.text == "It is noon. Really"
+
+
+def test_finish_strips_trailing_punctuation():
+    limiter = ResponseLimiter(10)
+    assert feed_all(limiter, ["Three", " thirty!"]) == "Three thirty"
@@ -0,0 +1,37 @@
+from backend.utils.ring_buffer import PCMRingBuffer
+
+
+def test_read_since_returns_audio_after_position():
+    ring = PCMRingBuffer(16)
+    ring.write(b"abcd")
+    mark = ring.total_written
+    ring.write(b"efgh")
+    assert ring.read_since(0) == b"abcdefgh"
+    assert ring.read_since(mark) == b"efgh"
+    assert ring.read_since(ring.total_written) == b""
+
+
+def test_wraparound_keeps_the_newest_bytes_in_order():
+    ring = PCMRingBuffer(8)
+    ring.write(b"012345")
+    ring.write(b"6789")
+    assert ring.total_written == 10
+    assert ring.available_since(0) == 8
+    assert ring.read_since(0) == b"23456789"
+    assert ring.read_since(7) == b"789"
+
+
+def test_write_larger_than_capacity_keeps_its_tail():
+    ring = PCMRingBuffer(4)
+    ring.write(b"ab")
+    ring.write(b"cdefgh")
+    assert ring.read_since(0) == b"efgh"
+    assert ring.total_written == 8
+
+
+def test_accepts_any_contiguous_buffer():
+    import numpy as np
+
+    ring = PCMRingBuffer(8)
+    ring.write(np.array([1, 2], dtype='<i2'))
+    assert ring.read_since(0) == b"\x01\x00\x02\x00"
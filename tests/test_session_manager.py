@@ -0,0 +1,90 @@
+import asyncio
+import time
+
+from backend.services.session_manager import SessionRegistry
+
+
+def attach(registry, client_id):
+    return asyncio.run(registry.attach(client_id))
+
+
+def test_sessions_are_isolated_per_client():
+    registry = SessionRegistry()
+    alice = attach(registry, "alice")
+    bob = attach(registry, "bob")
+    alice.add_exchange("What is the capital of France?", "Paris")
+    alice.context.add_context("The launch is on Tuesday.")
+    assert bob.history == []
+    assert bob.context.get_relevant_context("launch") == ""
+    # Reconnecting returns the same session
+    registry.detach("alice")
+    assert attach(registry, "alice") is alice
+
+
+def test_history_keeps_the_most_recent_exchanges():
+    session = SessionRegistry(max_history=2).get("alice")
+    for i in range(3):
+        session.add_exchange(f"question {i}", f"answer {i}")
+    assert [entry['question'] for entry in session.history] == ["question 1", "question 2"]
+
+
+def test_idle_sweep_spares_connected_sessions():
+    registry = SessionRegistry(idle_timeout=0)
+    attach(registry, "connected")
+    registry.get("idle")
+    time.sleep(0.01)
+    assert registry.sweep() == 1
+    assert "connected" in registry and "idle" not in registry
+
+
+def test_session_count_cap_evicts_least_recently_active():
+    registry = SessionRegistry(max_sessions=2)
+    registry.get("a")
+    registry.get("b")
+    registry.get("a")
+    registry.get("c")
+    assert list(registry.sessions) == ["a", "c"]
+    assert registry.evicted_over_cap == 1
+
+
+def test_session_over_its_cap_drops_oldest_uploads():
+    registry = SessionRegistry(max_session_bytes=8_000)
+    session = registry.get("alice")
+    for i in range(5):
+        session.context.add_context(f"Upload {i} talks about topic{i}. " * 100)
+    assert registry.contexts_trimmed > 0
+    assert session.memory_estimate() <= 8_000
+    # The newest upload survives
+    assert "topic4" in session.context.get_relevant_context("topic4")
+
+
+def test_total_memory_cap_evicts_idle_sessions_first():
+    registry = SessionRegistry(max_total_bytes=20_000)
+    registry.get("old").context.add_context("Old notes about alpha. " * 500)
+    active = attach(registry, "active")
+    active.context.add_context("Fresh notes about beta. " * 500)
+    assert "old" not in registry
+    assert "active" in registry
+    assert registry.memory_estimate() <= 20_000
+
+
+def test_running_memory_total_matches_the_sessions():
+    registry = SessionRegistry(max_session_bytes=8_000, max_total_bytes=20_000)
+
+    def summed():
+        return sum(session.memory_estimate() for session in registry.sessions.values())
+
+    alice = registry.get("alice")
+    for i in range(3):
+        alice.context.add_context(f"Upload {i} talks about topic{i}. " * 100)
+        assert registry.memory_estimate() == summed()
+    alice.add_exchange("What is on the agenda?", "Budget review")
+    assert registry.memory_estimate() == summed()
+    alice.context.remove_context(alice.context.contexts[0]['id'])
+    assert registry.memory_estimate() == summed()
+    registry.get("bob").context.add_context("Old notes about alpha. " * 500)
+    assert registry.memory_estimate() == summed()
+    alice.clear()
+    assert registry.memory_estimate() == summed()
+    asyncio.run(registry.remove("bob"))
+    assert registry.memory_estimate() == summed() == alice.memory_estimate()
@@ -0,0 +1,141 @@
+import asyncio
+from types import SimpleNamespace
+
+from backend.services.question_detector import QuestionDetector
+from backend.services.speculation import SpeculativeResponder
+
+
+class FakeOpenAI:
+    def __init__(self, deltas, delay=0.0):
+        self.deltas = deltas
+        self.delay = delay
+        self.calls = []
+        self.deadlines = []
+
+    def estimate_prompt_tokens(self, question, history, context, summary=""):
+        return 10
+
+    async def stream_contextual_response(
+        self, question, conversation_history, user_context, question_type=None, summary="", deadline=None
+    ):
+        self.calls.append(question)
+        self.deadlines.append(deadline)
+        for delta in self.deltas:
+            await asyncio.sleep(self.delay)
+            yield delta
+
+
+def make_session():
+    context = SimpleNamespace(get_relevant_context=lambda query: "")
+    return SimpleNamespace(history=[], summary="", context=context)
+
+
+def make_responder(openai_service, **kwargs):
+    return SpeculativeResponder(openai_service, QuestionDetector(), min_confidence=0.5, **kwargs)
+
+
+QUESTION = "What is the capital of France?"
+
+
+def test_matching_final_keeps_the_speculation():
+    async def scenario():
+        responder = make_responder(FakeOpenAI(["Paris", " it is."]))
+        started = responder.consider("alice", QUESTION, make_session())
+        assert started is not None
+        kept = responder.take("alice", "what is the capital of france")
+        assert kept is started
+        assert [delta async for delta in kept.stream()] == ["Paris", " it is."]
+        return responder
+
+    responder = asyncio.run(scenario())
+    assert responder.kept == 1 and responder.cancelled == 0
+
+
+def test_same_partial_does_not_restart():
+    async def scenario():
+        openai_service = FakeOpenAI(["Paris"])
+        responder = make_responder(openai_service)
+        first = responder.consider("alice", QUESTION, make_session())
+        assert responder.consider("alice", QUESTION.lower(), make_session()) is first
+        await first.answer()
+        return openai_service
+
+    assert asyncio.run(scenario()).calls == [QUESTION]
+
+
+def test_different_final_cancels_the_speculation():
+    async def scenario():
+        responder = make_responder(FakeOpenAI(["Paris"] * 50, delay=0.01))
+        speculation = responder.consider("alice", QUESTION, make_session())
+        assert responder.take("alice", "What is the capital of Germany?") is None
+        await asyncio.gather(speculation.task, return_exceptions=True)
+        assert speculation.task.cancelled()
+        return responder
+
+    responder = asyncio.run(scenario())
+    assert responder.cancelled == 1
+    assert responder.get_stats()['wasted_tokens']['prompt'] == 10
+
+
+def test_cancel_discards_the_active_speculation():
+    async def scenario():
+        responder = make_responder(FakeOpenAI(["Paris"] * 50, delay=0.01))
+        speculation = responder.consider("alice", QUESTION, make_session())
+        responder.cancel("alice")
+        await asyncio.gather(speculation.task, return_exceptions=True)
+        assert speculation.task.cancelled()
+        assert responder.take("alice", QUESTION) is None
+        return responder
+
+    assert asyncio.run(scenario()).get_stats()['active'] == 0
+
+
+def test_cancel_kept_stops_a_running_answer_but_cancel_does_not():
+    async def scenario():
+        responder = make_responder(FakeOpenAI(["Paris"] * 50, delay=0.01))
+        speculation = responder.consider("alice", QUESTION, make_session())
+        assert responder.take("alice", QUESTION) is speculation
+        # A later noise final only drops untaken speculations
+        responder.cancel("alice")
+        await asyncio.sleep(0.02)
+        assert not speculation.task.done()
+        responder.cancel_kept("alice")
+        await asyncio.gather(speculation.task, return_exceptions=True)
+        assert speculation.task.cancelled()
+        return responder
+
+    stats = asyncio.run(scenario()).get_stats()
+    assert stats['kept'] == 1
+    assert stats['kept_cancelled'] == 1
+    assert stats['cancelled'] == 0
+
+
+def test_finished_kept_speculation_is_released():
+    async def scenario():
+        responder = make_responder(FakeOpenAI(["Paris"]))
+        responder.consider("alice", QUESTION, make_session())
+        speculation = responder.take("alice", QUESTION)
+        await speculation.answer()
+        await asyncio.sleep(0)
+        responder.cancel_kept("alice")
+        return responder
+
+    assert asyncio.run(scenario()).kept_cancelled == 0
+
+
+def test_speculative_requests_get_the_answer_deadline():
+    async def scenario():
+        openai_service = FakeOpenAI(["Paris"])
+        responder = make_responder(openai_service, timeout=3.0)
+        await responder.consider("alice", QUESTION, make_session()).answer()
+        return openai_service
+
+    assert asyncio.run(scenario()).deadlines == [3.0]
+
+
+def test_statements_are_not_speculated():
+    async def scenario():
+        responder = make_responder(FakeOpenAI(["x"]))
+        return responder.consider("alice", "I went to the shop yesterday", make_session())
+
+    assert asyncio.run(scenario()) is None
@@ -0,0 +1,66 @@
+import time
+
+import pytest
+
+from backend.services.tracing import LatencyHistogram, Tracer
+
+
+@pytest.mark.parametrize("value_us", [0, 1, 127, 128, 1000, 123_456, 9_876_543])
+def test_histogram_percentiles_stay_within_one_percent(value_us):
+    histogram = LatencyHistogram()
+    histogram.record(value_us / 1_000_000)
+    reported = histogram.percentile(0.5) * 1_000_000
+    assert value_us <= round(reported) <= value_us * 1.016 + 1
+
+
+def test_histogram_percentiles_over_a_spread():
+    histogram = LatencyHistogram()
+    for ms in range(1, 101):
+        histogram.record(ms / 1000)
+    assert histogram.percentile(0.50) == pytest.approx(0.050, rel=0.02)
+    assert histogram.percentile(0.99) == pytest.approx(0.099, rel=0.02)
+    assert histogram.summary()['max_ms'] == 100.0
+    assert histogram.cumulative([0.010, 1.0]) == [(0.010, 10), (1.0, 100)]
+
+
+def test_trace_records_spans_and_finishes_once():
+    tracer = Tracer()
+    trace = tracer.trace("alice")
+    with trace.span('vad'):
+        time.sleep(0.001)
+    trace.record('stt', trace.started, trace.started + 0.25)
+    trace.record('llm_first_token', trace.started, trace.started + 0.5, observe=False)
+    trace.finish()
+    trace.finish()
+
+    stats = tracer.get_stats()
+    assert stats['vad']['count'] == 1
+    assert stats['stt']['p50_ms'] == pytest.approx(250, rel=0.02)
+    assert 'llm_first_token' not in stats
+    assert stats['total']['count'] == 1
+
+    [kept] = tracer.get_traces()
+    assert kept['client_id'] == "alice"
+    assert [span['stage'] for span in kept['spans']] == ['vad', 'stt', 'llm_first_token']
+
+
+def test_disabled_tracer_records_nothing():
+    tracer = Tracer(enabled=False)
+    trace = tracer.trace("alice")
+    with trace.span('vad'):
+        pass
+    trace.finish()
+    assert tracer.get_stats() == {}
+    assert tracer.get_traces() == []
+
+
+def test_prometheus_export_has_buckets_and_quantiles():
+    tracer = Tracer(namespace="test")
+    tracer.record('stt', 0.2)
+    text = tracer.render_prometheus()
+    assert '# TYPE test_stage_latency_seconds histogram' in text
+    assert 'test_stage_latency_seconds_bucket{stage="stt",le="0.25"} 1' in text
+    assert 'test_stage_latency_seconds_bucket{stage="stt",le="0.1"} 0' in text
+    assert 'test_stage_latency_seconds_count{stage="stt"} 1' in text
+    assert 'test_stage_latency_seconds_quantile{stage="stt",quantile="0.5"}' in text
+    assert text.endswith('\n')
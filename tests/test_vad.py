@@ -0,0 +1,63 @@
+import numpy as np
+
+from backend.utils.audio_processor import VoiceActivityDetector
+
+RATE = 16000
+
+
+def silence(ms, level=20, seed=0):
+    rng = np.random.default_rng(seed)
+    return (rng.standard_normal(RATE * ms // 1000) * level).astype(np.int16)
+
+
+def tone(ms, freq=220, amplitude=8000):
+    t = np.arange(RATE * ms // 1000) / RATE
+    return (np.sin(2 * np.pi * freq * t) * amplitude).astype(np.int16)
+
+
+def run(vad, audio, chunk_ms=20):
+    step = RATE * chunk_ms // 1000
+    segments = []
+    for start in range(0, len(audio), step):
+        segments += vad.process(audio[start:start + step])
+    return segments
+
+
+def test_silence_is_dropped():
+    vad = VoiceActivityDetector(RATE)
+    assert run(vad, silence(1000)) == []
+    assert not vad.in_speech
+
+
+def test_utterance_ends_after_hangover():
+    vad = VoiceActivityDetector(RATE, hangover_ms=300)
+    segments = run(vad, np.concatenate([silence(500), tone(600), silence(600, seed=1)]))
+    ends = [segment for segment in segments if segment.end_of_utterance]
+    assert len(ends) == 1
+    assert not vad.in_speech
+    # Speech plus pre-roll plus the hangover, nothing from the leading silence beyond the pre-roll
+    speech = sum(len(segment.audio) for segment in segments)
+    assert RATE * 0.6 <= speech <= RATE * (0.6 + 0.2 + 0.3 + 0.04)
+
+
+def test_pauses_shorter_than_hangover_do_not_split():
+    vad = VoiceActivityDetector(RATE, hangover_ms=500)
+    audio = np.concatenate([silence(300), tone(400), silence(200, seed=1), tone(400), silence(800, seed=2)])
+    ends = [segment for segment in run(vad, audio) if segment.end_of_utterance]
+    assert len(ends) == 1
+
+
+def test_max_utterance_forces_an_endpoint():
+    vad = VoiceActivityDetector(RATE, max_utterance_ms=1000)
+    segments = run(vad, np.concatenate([silence(200), tone(2500)]))
+    ends = [segment for segment in segments if segment.end_of_utterance]
+    assert len(ends) == 2
+
+
+def test_frames_split_across_chunks_are_carried_over():
+    vad = VoiceActivityDetector(RATE, hangover_ms=300)
+    audio = np.concatenate([silence(400), tone(500), silence(500, seed=1)])
+    whole = run(vad, audio, chunk_ms=1000)
+    odd = run(VoiceActivityDetector(RATE, hangover_ms=300), audio, chunk_ms=7)
+    assert sum(len(s.audio) for s in whole) == sum(len(s.audio) for s in odd)
+    assert sum(s.end_of_utterance for s in whole) == sum(s.end_of_utterance for s in odd) == 1